@@ -43,6 +43,8 @@ def setup(
     debug = False,
     log_timestamp = False,
     log_file = None,
+    hash_backend = None,
+    validation_level = None,
     ):
   # Configure logger for this module.
   bitcoin_toolset.util.module_logger.configure_module_logger(
@@ -60,4 +62,6 @@ def setup(
     debug = debug,
     log_timestamp = log_timestamp,
     log_file = log_file,
+    hash_backend = hash_backend,
+    validation_level = validation_level,
   )
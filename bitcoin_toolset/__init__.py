@@ -27,6 +27,8 @@ def setup(
     debug = False,
     log_timestamp = False,
     log_file = None,
+    hash_backend = None,
+    validation_level = None,
     ):
   # Configure logger for this module.
   util.module_logger.configure_module_logger(
@@ -38,6 +40,12 @@ def setup(
     log_file = log_file,
   )
   deb('Setup complete.')
+  # Choose the hash functions used by the package. By default, the 'hashlib' backend is used.
+  if hash_backend is not None:
+    code.hashing.set_backend(hash_backend)
+  # Choose how thoroughly data is validated. By default, the 'standard' level is used.
+  if validation_level is not None:
+    code.validation.set_level(validation_level)
   # Configure modules further down in this package.
   code.setup(
     log_level = log_level,
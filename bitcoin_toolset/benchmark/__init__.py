@@ -0,0 +1,4 @@
+# Notes:
+# - Micro-benchmarks. They are not run by the test suite.
+# - Run a benchmark as a module from the top directory of the repository, e.g.
+# python -m bitcoin_toolset.benchmark.hex_primitives
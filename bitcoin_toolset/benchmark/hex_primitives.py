@@ -0,0 +1,170 @@
+# Imports
+import argparse
+import timeit
+
+
+
+
+# Relative imports
+from .. import util
+
+
+
+
+# Shortcuts
+v = util.validate
+primitives = util.primitives
+
+
+
+
+# Notes:
+# - Compares the hex primitives in util.primitives with the implementations that they replaced (copied below, with a "legacy_" prefix).
+# - Each result is the average time per call, in nanoseconds.
+# - Example:
+# python -m bitcoin_toolset.benchmark.hex_primitives --number 100000
+
+
+
+
+hex_digits = '0123456789abcdef'
+
+
+
+
+def legacy_validate_hex(s):
+  # Character-by-character scan, as in the original validate.validate_hex.
+  v.validate_string(s)
+  if len(s) % 2 != 0:
+    raise ValueError
+  indices = [i for i in range(len(s)) if s[i] not in hex_digits]
+  if len(indices) > 0:
+    raise ValueError
+
+
+
+
+def legacy_hex_len(x):
+  legacy_validate_hex(x)
+  return len(x) // 2
+
+
+
+
+def legacy_reverse_hex_order(x):
+  legacy_validate_hex(x)
+  output = [x[i:i+2] for i in range(0, len(x), 2)]
+  output.reverse()
+  output = ''.join(output)
+  legacy_validate_hex(output)
+  return output
+
+
+
+
+def legacy_int_to_hex(n):
+  v.validate_integer(n)
+  x = hex(n)[2:]
+  if len(x) % 2 == 1:
+    x = '0' + x
+  legacy_validate_hex(x)
+  return x
+
+
+
+
+def legacy_pad_hex_le(x, n_bytes):
+  legacy_validate_hex(x)
+  v.validate_integer(n_bytes)
+  n = legacy_hex_len(x)
+  if n_bytes < n:
+    raise ValueError
+  return x + '00' * (n_bytes - n)
+
+
+
+
+def legacy_int_to_hex_le_padded(n, n_bytes):
+  return legacy_pad_hex_le(legacy_reverse_hex_order(legacy_int_to_hex(n)), n_bytes)
+
+
+
+
+def int_to_hex_le_padded(n, n_bytes):
+  return primitives.pad_hex_le(primitives.int_to_hex_le(n), n_bytes)
+
+
+
+
+def legacy_validate_hex_length_list(items, n):
+  for x in items:
+    legacy_validate_hex(x)
+    if len(x) != n * 2:
+      raise ValueError
+
+
+
+
+def build_cases():
+  txid = '10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411'
+  script_sig = '48' + 'ab' * 71 + '41' + '04' + 'cd' * 64
+  txids = [txid] * 200
+  # (name, legacy function, new function)
+  cases = [
+    ('validate_hex (4 bytes)', lambda: legacy_validate_hex('ffffffff'), lambda: primitives.validate_hex('ffffffff')),
+    ('validate_hex (32 bytes)', lambda: legacy_validate_hex(txid), lambda: primitives.validate_hex(txid)),
+    ('validate_hex (scriptSig, 139 bytes)', lambda: legacy_validate_hex(script_sig), lambda: primitives.validate_hex(script_sig)),
+    ('hex_len (32 bytes)', lambda: legacy_hex_len(txid), lambda: primitives.hex_len(txid)),
+    ('reverse_hex_order (32 bytes)', lambda: legacy_reverse_hex_order(txid), lambda: primitives.reverse_hex_order(txid)),
+    ('int_to_hex_le + pad_hex_le (8 bytes)', lambda: legacy_int_to_hex_le_padded(123456789, 8), lambda: int_to_hex_le_padded(123456789, 8)),
+    ('validate 200 txids', lambda: legacy_validate_hex_length_list(txids, 32), lambda: primitives.validate_hex_length_list(txids, 32)),
+  ]
+  return cases
+
+
+
+
+def check_cases(cases):
+  # The new functions must return the same results as the legacy ones.
+  for name, legacy, new in cases:
+    if legacy() != new():
+      msg = "Results differ for case: {}".format(name)
+      raise ValueError(msg)
+
+
+
+
+def time_call(f, number):
+  return min(timeit.repeat(f, number=number, repeat=3)) / number * 1e9
+
+
+
+
+def run(number=10000):
+  cases = build_cases()
+  check_cases(cases)
+  print('{:<40} {:>12} {:>12} {:>8}'.format('case', 'legacy (ns)', 'new (ns)', 'speedup'))
+  for name, legacy, new in cases:
+    # The list cases take much longer per call.
+    n = number // 100 if 'txids' in name else number
+    t_legacy = time_call(legacy, n)
+    t_new = time_call(new, n)
+    print('{:<40} {:>12.0f} {:>12.0f} {:>7.1f}x'.format(name, t_legacy, t_new, t_legacy / t_new))
+
+
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark the hex primitives in util.primitives.')
+  parser.add_argument(
+    '-n', '--number', type=int, default=10000,
+    help="Number of calls per case (default: %(default)s).",
+  )
+  a = parser.parse_args()
+  run(a.number)
+
+
+
+
+if __name__ == '__main__':
+  main()
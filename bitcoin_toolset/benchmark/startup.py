@@ -0,0 +1,84 @@
+# Imports
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import time
+
+
+
+
+# Notes:
+# - Measures the wall time of short commands, each run in a new Python process. For short tasks (e.g. cli.py --task get_address), this is mostly the time taken to start the interpreter and import the package.
+# - Each result is the median and the minimum wall time, in milliseconds.
+# - --max-ms: If the median time for get_address is greater than this, the benchmark exits with an error. This can be used to check that the startup time hasn't increased.
+# - Example:
+# python -m bitcoin_toolset.benchmark.startup --number 20 --max-ms 150
+
+
+
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+
+
+def build_cases():
+  python = sys.executable
+  cases = [
+    ('python (no imports)', [python, '-c', 'pass']),
+    ('import bitcoin_toolset', [python, '-c', 'import bitcoin_toolset']),
+    ('cli.py --task hello', [python, 'cli.py', '--task', 'hello']),
+    ('cli.py --task get_address', [python, 'cli.py', '--task', 'get_address', '--private-key-hex', '01']),
+  ]
+  return cases
+
+
+
+
+def time_command(command, number):
+  times = []
+  for i in range(number):
+    start = time.perf_counter()
+    subprocess.run(command, cwd=repo_dir, stdout=subprocess.DEVNULL, check=True)
+    times.append((time.perf_counter() - start) * 1000)
+  return statistics.median(times), min(times)
+
+
+
+
+def run(number=10):
+  results = {}
+  print('{:<32} {:>12} {:>12}'.format('command', 'median (ms)', 'min (ms)'))
+  for name, command in build_cases():
+    median, minimum = time_command(command, number)
+    results[name] = median
+    print('{:<32} {:>12.1f} {:>12.1f}'.format(name, median, minimum))
+  return results
+
+
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark the startup time of cli.py.')
+  parser.add_argument(
+    '-n', '--number', type=int, default=10,
+    help="Number of runs per command (default: %(default)s).",
+  )
+  parser.add_argument(
+    '--max-ms', dest='max_ms', type=float,
+    help="Exit with an error if the median time for get_address is greater than this (in milliseconds).",
+  )
+  a = parser.parse_args()
+  results = run(a.number)
+  median = results['cli.py --task get_address']
+  if a.max_ms is not None and median > a.max_ms:
+    msg = "cli.py --task get_address took {:.1f} ms (median), which is more than {:.1f} ms.".format(median, a.max_ms)
+    sys.exit(msg)
+
+
+
+
+if __name__ == '__main__':
+  main()
@@ -1,4 +1,5 @@
 # Imports
+import sys
 import logging
 
 
@@ -6,12 +7,49 @@ import logging
 
 # Relative imports
 from .. import util
-from . import hello
-from . import basic
-from . import create_transaction
-from . import transaction
-from . import transaction_input
-from . import transaction_output
+
+
+
+
+# Notes:
+# - The modules in this package are imported when they are first used (see util/lazy_import.py), so that short tasks only import the modules that they need.
+# - If you add a new module to this package, then its name must be added to this list.
+module_names = """
+hello
+hashing
+parallel
+validation
+secp256k1
+base58
+basic
+serialization
+sighash
+transaction_size
+coin_selection
+input_pool
+create_transaction
+create_transaction_batch
+transaction
+transaction_stream
+utxo_store
+aio
+transaction_input
+transaction_output
+""".split()
+lazy = util.lazy_import.LazyPackage(__name__, module_names)
+
+
+
+
+def __getattr__(name):
+  # Python 3.7+: Called when an attribute isn't found, i.e. when a module hasn't been imported yet.
+  return lazy.load(name)
+
+
+
+
+if sys.version_info < (3, 7):
+  lazy.load_all()
 
 
 
@@ -43,42 +81,10 @@ def setup(
   )
   deb('Setup complete.')
   # Configure modules further down in this package.
-  hello.setup(
-    log_level = log_level,
-    debug = debug,
-    log_timestamp = log_timestamp,
-    log_file = log_file,
-  )
-  basic.setup(
-    log_level = log_level,
-    debug = debug,
-    log_timestamp = log_timestamp,
-    log_file = log_file,
-  )
-  create_transaction.setup(
-    log_level = log_level,
-    debug = debug,
-    log_timestamp = log_timestamp,
-    log_file = log_file,
-  )
-  transaction.setup(
-    log_level = log_level,
-    debug = debug,
-    log_timestamp = log_timestamp,
-    log_file = log_file,
-  )
-  transaction_input.setup(
-    log_level = log_level,
-    debug = debug,
-    log_timestamp = log_timestamp,
-    log_file = log_file,
-  )
-  transaction_output.setup(
+  # - Modules that haven't been imported yet are configured when they are imported.
+  lazy.setup(
     log_level = log_level,
     debug = debug,
     log_timestamp = log_timestamp,
     log_file = log_file,
   )
-
-
-
@@ -0,0 +1,289 @@
+# Imports
+import logging
+import argparse
+
+
+
+
+# Relative imports
+from .. import util
+from . import parallel
+from . import hashing
+from . import validation
+from . import create_transaction as create_transaction_module
+from . import transaction
+
+
+
+
+# Shortcuts
+Namespace = argparse.Namespace
+v = util.validate
+
+
+
+
+# Set up logger for this module. By default, it produces no output.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.ERROR)
+log = logger.info
+deb = logger.debug
+
+
+
+
+def setup(
+    log_level = 'error',
+    debug = False,
+    log_timestamp = False,
+    log_file = None,
+    ):
+  # Configure logger for this module.
+  util.module_logger.configure_module_logger(
+    logger = logger,
+    logger_name = __name__,
+    log_level = log_level,
+    debug = debug,
+    log_timestamp = log_timestamp,
+    log_file = log_file,
+  )
+  deb('Setup complete.')
+
+
+
+
+# Notes:
+# - This module lets asyncio code (e.g. a broadcast service) create, sign, verify, and decode transactions without blocking its event loop.
+# - Each operation is a coroutine. The work is done in a process pool, so many transactions can be processed at the same time, while the event loop carries on with other tasks.
+# - AsyncPool:
+# -- workers: the number of worker processes (default: the number of CPUs). The ProcessPoolExecutor is created when it is first needed, and shut down by close() (or, from a coroutine, by aclose(), which doesn't block the event loop). "async with AsyncPool() as pool:" calls aclose() at the end.
+# -- executor: an existing concurrent.futures.Executor can be supplied instead. It is not shut down by close().
+# -- max_concurrency: the maximum number of operations that can be submitted to the pool at the same time (default: the number of workers). Further operations wait their turn, so a burst of requests doesn't queue up an unlimited amount of work (and data) in the pool.
+# - Cancellation: If a coroutine is cancelled (e.g. with asyncio.wait_for, or Task.cancel()), its job is removed from the pool if it hasn't started. A job that has already started can't be interrupted. It runs to completion in its worker process, and its result is discarded.
+# - The package settings (the hash backend and the validation level) are sent with each job, so that the worker processes use the same settings as the caller, however they were started.
+# - Each transaction is processed by a single worker process. Within the worker, its inputs are signed and verified serially.
+# - Only features that are available in Python 3.6 are used (e.g. asyncio.get_event_loop, not asyncio.get_running_loop).
+# - Like concurrent.futures in parallel.py, asyncio is only imported when it is used, as it takes longer to import than the rest of the package.
+
+
+
+
+# ### SECTION
+# Jobs
+# - These functions run in the worker processes. They must be defined at the top level of this module, so that they can be pickled.
+
+
+
+
+def apply_settings(settings):
+  hash_backend, validation_level = settings
+  if hashing.get_backend_name() != hash_backend:
+    hashing.set_backend(hash_backend)
+  if validation.get_level() != validation_level:
+    validation.set_level(validation_level)
+
+
+
+
+def get_settings():
+  return (hashing.get_backend_name(), validation.get_level())
+
+
+
+
+def create_transaction_job(job):
+  settings, a = job
+  apply_settings(settings)
+  return create_transaction_module.create_transaction(a)
+
+
+
+
+def sign_job(job):
+  settings, tx, private_keys_hex = job
+  apply_settings(settings)
+  return tx.sign(private_keys_hex)
+
+
+
+
+def verify_job(job):
+  settings, tx, fail_fast = job
+  apply_settings(settings)
+  return tx.verify(fail_fast=fail_fast)
+
+
+
+
+def from_hex_signed_job(job):
+  settings, tx_hex = job
+  apply_settings(settings)
+  return transaction.Transaction.from_hex_signed(tx_hex)
+
+
+
+
+# ### SECTION
+# Pool
+
+
+
+
+class AsyncPool:
+
+
+  def __init__(self, workers=None, max_concurrency=None, executor=None):
+    parallel.validate_workers(workers)
+    if max_concurrency is not None:
+      v.validate_positive_integer(max_concurrency, 'max_concurrency', 'AsyncPool')
+    self.workers = parallel.count_workers(workers)
+    self.max_concurrency = max_concurrency or self.workers
+    self.executor = executor
+    self.own_executor = executor is None
+    # The semaphore is created in the event loop that first uses it.
+    self.semaphore = None
+
+
+  def __str__(self):
+    name = self.__class__.__name__
+    s = "{}: {} workers, max_concurrency = {}".format(name, self.workers, self.max_concurrency)
+    return s
+
+
+  def get_executor(self):
+    if self.executor is None:
+      import concurrent.futures
+      self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+      log("Process pool started ({} workers).".format(self.workers))
+    return self.executor
+
+
+  async def run(self, function, job):
+    # Run function(job) in the pool, and return its result.
+    import asyncio
+    if self.semaphore is None:
+      self.semaphore = asyncio.Semaphore(self.max_concurrency)
+    async with self.semaphore:
+      loop = asyncio.get_event_loop()
+      future = loop.run_in_executor(self.get_executor(), function, job)
+      try:
+        return await future
+      except asyncio.CancelledError:
+        # Remove the job from the pool, if it hasn't started yet.
+        future.cancel()
+        deb("Job cancelled: {}".format(function.__name__))
+        raise
+
+
+  async def create_transaction(self, inputs, design, total_available_input=None, validation_level=None):
+    # Arguments: the same as for create_transaction.create_transaction.
+    a = Namespace(
+      inputs = inputs,
+      design = design,
+      total_available_input = total_available_input,
+      validation_level = validation_level,
+    )
+    return await self.run(create_transaction_job, (get_settings(), a))
+
+
+  async def sign(self, tx, private_keys_hex):
+    # Returns a new, signed Transaction.
+    return await self.run(sign_job, (get_settings(), tx, private_keys_hex))
+
+
+  async def verify(self, tx, fail_fast=False):
+    # Returns the number of invalid signatures.
+    return await self.run(verify_job, (get_settings(), tx, fail_fast))
+
+
+  async def from_hex_signed(self, tx_hex):
+    return await self.run(from_hex_signed_job, (get_settings(), tx_hex))
+
+
+  def close(self, wait=True):
+    # Shut down the process pool, if this object created it.
+    if self.own_executor and self.executor is not None:
+      self.executor.shutdown(wait=wait)
+      self.executor = None
+      log("Process pool shut down.")
+
+
+  async def __aenter__(self):
+    return self
+
+
+  async def aclose(self):
+    # Shut down the process pool without blocking the event loop. The shutdown waits for the running jobs to finish, so it is done in a thread.
+    import asyncio
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, self.close)
+
+
+  async def __aexit__(self, exc_type, exc_value, traceback):
+    await self.aclose()
+
+
+
+
+# ### SECTION
+# Default pool
+# - The module-level functions use a shared AsyncPool, which can be configured with configure().
+
+
+
+
+default_pool = None
+
+
+
+
+def configure(workers=None, max_concurrency=None, executor=None):
+  # Replace the default pool. The previous one is shut down.
+  global default_pool
+  shutdown()
+  default_pool = AsyncPool(workers=workers, max_concurrency=max_concurrency, executor=executor)
+  log("Default pool configured: {}".format(default_pool))
+  return default_pool
+
+
+
+
+def get_pool():
+  global default_pool
+  if default_pool is None:
+    default_pool = AsyncPool()
+  return default_pool
+
+
+
+
+def shutdown(wait=True):
+  global default_pool
+  if default_pool is not None:
+    default_pool.close(wait=wait)
+    default_pool = None
+
+
+
+
+async def create_transaction(inputs, design, total_available_input=None, validation_level=None):
+  return await get_pool().create_transaction(inputs, design, total_available_input, validation_level)
+
+
+
+
+async def sign(tx, private_keys_hex):
+  return await get_pool().sign(tx, private_keys_hex)
+
+
+
+
+async def verify(tx, fail_fast=False):
+  return await get_pool().verify(tx, fail_fast)
+
+
+
+
+async def from_hex_signed(tx_hex):
+  return await get_pool().from_hex_signed(tx_hex)
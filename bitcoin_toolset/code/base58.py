@@ -0,0 +1,174 @@
+# Imports
+import logging
+
+
+
+
+# Relative imports
+from .. import util
+from . import hashing
+
+
+
+
+# Shortcuts
+v = util.validate
+
+
+
+
+# Set up logger for this module. By default, it produces no output.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.ERROR)
+log = logger.info
+deb = logger.debug
+
+
+
+
+def setup(
+    log_level = 'error',
+    debug = False,
+    log_timestamp = False,
+    log_file = None,
+    ):
+  # Configure logger for this module.
+  util.module_logger.configure_module_logger(
+    logger = logger,
+    logger_name = __name__,
+    log_level = log_level,
+    debug = debug,
+    log_timestamp = log_timestamp,
+    log_file = log_file,
+  )
+  deb('Setup complete.')
+
+
+
+
+# Notes:
+# - This module implements Bitcoin's base58 and base58check encodings. It works directly with bytes.
+# - Decoding uses a 256-entry reverse lookup table (character code -> digit value), and accumulates the integer value one digit at a time (Horner's method: n = n * 58 + digit). This is linear in the length of the string.
+# - Leading zero bytes are encoded as leading '1' characters (the zero digit), one per byte.
+# - base58check: payload + first 4 bytes of double_sha256(payload), encoded in base58.
+# - Functions that end in _many accept an iterable and return a list, in the same order.
+
+
+
+
+alphabet = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+# -1 marks a character that isn't in the alphabet.
+reverse_table = [-1] * 256
+for i, c in enumerate(alphabet):
+  reverse_table[ord(c)] = i
+del i, c
+zero_digit = alphabet[0]
+checksum_length = 4
+
+
+
+
+def int_to_base58(n):
+  # Encode a non-negative integer. 0 is encoded as an empty string.
+  digits = []
+  while n > 0:
+    n, remainder = divmod(n, 58)
+    digits.append(alphabet[remainder])
+  digits.reverse()
+  return ''.join(digits)
+
+
+
+
+def base58_to_int(s):
+  n = 0
+  for i, c in enumerate(s):
+    code = ord(c)
+    value = reverse_table[code] if code < 256 else -1
+    if value < 0:
+      msg = "Invalid base58 character {} at position {} in string: {}".format(repr(c), i, s)
+      raise ValueError(msg)
+    n = n * 58 + value
+  return n
+
+
+
+
+def encode(b):
+  v.validate_bytes(b)
+  n_zeros = len(b) - len(b.lstrip(b'\x00'))
+  n = int.from_bytes(b, 'big')
+  return zero_digit * n_zeros + int_to_base58(n)
+
+
+
+
+def decode(s):
+  v.validate_string(s)
+  s2 = s.lstrip(zero_digit)
+  n_zeros = len(s) - len(s2)
+  n = base58_to_int(s2)
+  n_bytes = (n.bit_length() + 7) // 8
+  return b'\x00' * n_zeros + n.to_bytes(n_bytes, 'big')
+
+
+
+
+def checksum(b):
+  return hashing.double_sha256(b)[:checksum_length]
+
+
+
+
+def encode_check(b):
+  v.validate_bytes(b)
+  return encode(b + checksum(b))
+
+
+
+
+def decode_check(s):
+  # Returns the payload (without the checksum).
+  b = decode(s)
+  if len(b) < checksum_length:
+    msg = "Base58check string is too short to contain a checksum: {}".format(s)
+    raise ValueError(msg)
+  payload = b[:-checksum_length]
+  checksum_value = b[-checksum_length:]
+  checksum_new = checksum(payload)
+  if checksum_value != checksum_new:
+    msg = "Checksum value does not match calculated checksum."
+    msg += "\n- Input: {}".format(s)
+    msg += "\n- Input hex without checksum: {}".format(payload.hex())
+    msg += "\n- Checksum value     : {}".format(checksum_value.hex())
+    msg += "\n- Calculated checksum: {}".format(checksum_new.hex())
+    raise ValueError(msg)
+  return payload
+
+
+
+
+def encode_many(items):
+  return [encode(b) for b in items]
+
+
+
+
+def decode_many(items):
+  return [decode(s) for s in items]
+
+
+
+
+def encode_check_many(items):
+  return [encode_check(b) for b in items]
+
+
+
+
+def decode_check_many(items):
+  return [decode_check(s) for s in items]
+
+
+
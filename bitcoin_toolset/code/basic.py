@@ -1,6 +1,7 @@
 # Imports
 import logging
 import pkgutil
+from collections import OrderedDict
 
 
 
@@ -8,15 +9,19 @@ import pkgutil
 # Relative imports
 from .. import util
 from .. import submodules
+from . import hashing
+from . import base58
+from . import parallel
+from . import secp256k1
 
 
 
 
 # Shortcuts
 v = util.validate
+primitives = util.primitives
+debug_enabled = util.module_logger.debug_enabled
 ecdsa = submodules.ecdsa_python3
-ripemd160 = submodules.ripemd160_python3
-sha256 = submodules.sha256_python3
 
 
 
@@ -79,9 +84,9 @@ def setup(
 def estimate_transaction_size(n_inputs, n_outputs):
   # A standard signed transaction contains:
   # - version (4 bytes)
-  # - input_count (1-byte var_int) [1 byte if number of inputs is <= 252]
+  # - input_count (var_int) [1 byte if number of inputs is <= 252, 3 bytes if it is <= 65535]
   # - concatenated inputs (with signatures)
-  # - output_count (1-byte var_int) [1 byte if number of outputs is <= 252]
+  # - output_count (var_int) [1 byte if number of outputs is <= 252, 3 bytes if it is <= 65535]
   # - concatenated outputs
   # - block lock time (4 bytes)
   # A standard input contains:
@@ -96,9 +101,9 @@ def estimate_transaction_size(n_inputs, n_outputs):
   # - value (8 bytes)
   # - script_length (1-byte var_int)
   # - scriptPubKey (25 bytes)
-  input_count_bytes = hex_len(int_to_var_int(n_inputs))
+  input_count_bytes = var_int_size(n_inputs)
   inputs_bytes = n_inputs * (32 + 4 + 1 + 138 + 4)
-  output_count_bytes = hex_len(int_to_var_int(n_outputs))
+  output_count_bytes = var_int_size(n_outputs)
   outputs_bytes = n_outputs * (8 + 1 + 25)
   estimated_tx_size = (
     4
@@ -124,11 +129,12 @@ def signature_from_der(signature_hex):
   r_hex = pad_hex(r_hex, n_bytes=32)
   s_hex = pad_hex(s_hex, n_bytes=32)
   signature_hex = r_hex + s_hex
-  msg = "Signature decoded from DER encoding:"
-  msg += "\nsignature_hex ({} bytes) = {}".format(hex_len(signature_hex), signature_hex)
-  msg += "\nr_hex ({} bytes) = {}".format(hex_len(r_hex), r_hex)
-  msg += "\ns_hex ({} bytes) = {}".format(hex_len(s_hex), s_hex)
-  deb(msg)
+  if debug_enabled(logger):
+    msg = "Signature decoded from DER encoding:"
+    msg += "\nsignature_hex ({} bytes) = {}".format(hex_len(signature_hex), signature_hex)
+    msg += "\nr_hex ({} bytes) = {}".format(hex_len(r_hex), r_hex)
+    msg += "\ns_hex ({} bytes) = {}".format(hex_len(s_hex), s_hex)
+    deb(msg)
   return signature_hex
 
 
@@ -197,9 +203,7 @@ def script_pub_key_to_address(script_pub_key):
 
 
 def private_key_hex_to_address(private_key_hex):
-  private_key_hex = ecdsa.format_private_key_hex(private_key_hex)
-  ecdsa.validate_private_key_hex(private_key_hex)
-  public_key_hex = ecdsa.private_key_hex_to_public_key_hex(private_key_hex)
+  public_key_hex = private_key_hex_to_public_key_hex(private_key_hex)
   address = public_key_hex_to_address(public_key_hex)
   return address
 
@@ -215,10 +219,14 @@ def public_key_hex_to_address(public_key_hex):
 
 
 def public_key_hash_hex_to_address(hash_hex):
+  address = public_key_hash_cache.get(hash_hex)
+  if address is not None:
+    return address
   # Add version byte to public key hash ("00" for "main Bitcoin network").
   hash_hex_2 = "00" + hash_hex
   # Convert the public key hash to Base58Check format.
   address = hex_to_base58check(hash_hex_2)
+  public_key_hash_cache.put(hash_hex, address)
   return address
 
 
@@ -236,8 +244,7 @@ def get_public_key_hash(public_key_hex):
   # Add identification byte to public key ("04" for "uncompressed") to get an uncompressed Bitcoin public key
   public_key_hex = "04" + public_key_hex
   public_key_bytes = bytes.fromhex(public_key_hex)
-  digest_1 = sha256.digest(public_key_bytes)
-  digest_2 = ripemd160.digest(digest_1)
+  digest_2 = hashing.hash160(public_key_bytes)
   digest_2_hex = digest_2.hex()
   v.validate_hex_length(digest_2_hex, 20)
   return digest_2_hex
@@ -248,7 +255,8 @@ def get_public_key_hash(public_key_hex):
 def private_key_hex_to_public_key_hex(private_key_hex):
   private_key_hex = ecdsa.format_private_key_hex(private_key_hex)
   ecdsa.validate_private_key_hex(private_key_hex)
-  public_key_hex = ecdsa.private_key_hex_to_public_key_hex(private_key_hex)
+  # Use the precomputed generator table in secp256k1, which is much faster than the generic point multiplication in the ecdsa submodule.
+  public_key_hex = secp256k1.private_key_hex_to_public_key_hex(private_key_hex)
   return public_key_hex
 
 
@@ -276,34 +284,115 @@ def private_key_wif_to_hex(private_key_wif):
 
 
 
+def derive_addresses(private_keys_hex, workers=None, executor=None, batch_size=256):
+  # Generator. Yields one record (an OrderedDict) for each private key, in the same order as the keys:
+  # - private_key_hex, public_key_hex, address, private_key_wif
+  # Notes:
+  # - private_keys_hex can be any iterable (e.g. lines read from a file). It is consumed in batches, so a large set of keys isn't loaded into memory all at once.
+  # - Within each batch, the public keys are converted to affine coordinates together, with a single modular inversion.
+  # - If workers > 1 (or an executor is supplied), the batches are spread across multiple processes (see parallel.map_jobs). If workers is used, a single ProcessPoolExecutor is created for the whole call, and shut down at the end.
+  # - Each worker process needs the secp256k1 generator table. With the 'fork' start method (the default on Linux), the workers inherit the table that is built here. Otherwise (e.g. 'spawn'), each worker builds its own table for its first batch. The same workers are used for every round, so this happens once per worker.
+  parallel.validate_workers(workers)
+  v.validate_positive_integer(batch_size, 'batch_size', 'basic.derive_addresses')
+  serial = parallel.use_serial(2, workers, executor)
+  if not serial:
+    # Build the generator table before any worker processes are started.
+    secp256k1.get_generator_table()
+  own_executor = not serial and executor is None
+  if own_executor:
+    import concurrent.futures
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+  # Send a few batches per worker at a time, so that the records can be yielded before all the keys have been read.
+  n_batches_per_round = 1 if serial else parallel.count_workers(workers) * 4
+  batches = parallel.iterate_chunks(private_keys_hex, batch_size)
+  try:
+    for batches_in_round in parallel.iterate_chunks(batches, n_batches_per_round):
+      results = parallel.map_jobs(derive_address_batch, batches_in_round, workers, executor)
+      for records in results:
+        for record in records:
+          yield record
+  finally:
+    if own_executor:
+      executor.shutdown(wait=True)
+
+
+
+
+def derive_address_range(start_private_key_hex, count, batch_size=256):
+  # Generator. Yields a tuple (private_key_hex, public_key_hex, address) for each of the count consecutive private keys that begin at start_private_key_hex.
+  # - Each public key is found by adding G to the previous one, which is much cheaper than a scalar multiplication (see secp256k1.generator_multiply_range).
+  # - The tuples are produced lazily, so a large range can be scanned without holding it in memory.
+  start_private_key_hex = ecdsa.format_private_key_hex(start_private_key_hex)
+  ecdsa.validate_private_key_hex(start_private_key_hex)
+  k = int(start_private_key_hex, 16)
+  points = secp256k1.generator_multiply_range(k, count, batch_size)
+  for i, point in enumerate(points):
+    private_key_hex = '{:064x}'.format(k + i)
+    public_key_hex = secp256k1.point_to_public_key_hex(point)
+    address = public_key_hex_to_address(public_key_hex)
+    yield private_key_hex, public_key_hex, address
+
+
+
+
+def derive_address_batch(private_keys_hex):
+  # Returns a list of records (see derive_addresses).
+  # - This function is defined at module level so that it can be sent to worker processes.
+  formatted_keys_hex = []
+  for private_key_hex in private_keys_hex:
+    private_key_hex = ecdsa.format_private_key_hex(private_key_hex)
+    ecdsa.validate_private_key_hex(private_key_hex)
+    formatted_keys_hex.append(private_key_hex)
+  points = secp256k1.generator_multiply_many([int(x, 16) for x in formatted_keys_hex])
+  records = []
+  for private_key_hex, point in zip(formatted_keys_hex, points):
+    public_key_hex = secp256k1.point_to_public_key_hex(point)
+    record = OrderedDict()
+    record['private_key_hex'] = private_key_hex
+    record['public_key_hex'] = public_key_hex
+    record['address'] = public_key_hex_to_address(public_key_hex)
+    record['private_key_wif'] = private_key_hex_to_wif(private_key_hex)
+    records.append(record)
+  return records
+
+
+
+
 def script_sig_to_signature_hex_and_public_key_hex(script_sig):
   v.validate_hex(script_sig)
+  debug = debug_enabled(logger)
   b = script_sig[0:2]  # b = byte
   n = var_int_to_int(b)
   m = n*2+2
   signature_hex = script_sig[2:m]
-  deb("signature_hex (DER-encoded, 1-byte hash type appended) ({} bytes): {}".format(hex_len(signature_hex), signature_hex))
+  if debug:
+    deb("signature_hex (DER-encoded, 1-byte hash type appended) ({} bytes): {}".format(hex_len(signature_hex), signature_hex))
   b = script_sig[m:m+2]
   n2 = var_int_to_int(b)
   m2 = m+2 + n2*2
   public_key_hex = script_sig[m+2:m2]
-  deb("public_key_hex ({} bytes): {}".format(hex_len(public_key_hex), public_key_hex))
+  if debug:
+    deb("public_key_hex ({} bytes): {}".format(hex_len(public_key_hex), public_key_hex))
   # Check that last byte of signature is "01" (hash_type SIGHASH_ALL as a single byte) and remove it.
   b = signature_hex[-2:]
-  msg = "1-byte hash type appended to signature_hex = {}".format(b)
-  deb(msg)
+  if debug:
+    msg = "1-byte hash type appended to signature_hex = {}".format(b)
+    deb(msg)
   if b != '01':
     raise ValueError
   signature_hex = signature_hex[:-2]
-  deb("signature_hex (DER-encoded) ({} bytes): {}".format(hex_len(signature_hex), signature_hex))
+  if debug:
+    deb("signature_hex (DER-encoded) ({} bytes): {}".format(hex_len(signature_hex), signature_hex))
   # Check that first byte of public_key is "04" ("uncompressed") and remove it.
   b = public_key_hex[:2]
-  msg = "1-byte compression type prepended to public key = {}".format(b)
-  deb(msg)
+  if debug:
+    msg = "1-byte compression type prepended to public key = {}".format(b)
+    deb(msg)
   if b != '04':
     raise ValueError
   public_key_hex = public_key_hex[2:]
-  deb("public_key_hex ({} bytes): {}".format(hex_len(public_key_hex), public_key_hex))
+  if debug:
+    deb("public_key_hex ({} bytes): {}".format(hex_len(public_key_hex), public_key_hex))
   return signature_hex, public_key_hex
 
 
@@ -329,28 +418,80 @@ def signature_hex_and_public_key_hex_to_script_sig(signature_hex, public_key_hex
   #deb("public_key_hex: {}".format(public_key_hex))
   # Add '04' ("uncompressed") compression type prefix to public_key_hex.
   public_key_hex = '04' + public_key_hex
-  msg = "public_key_hex (1-byte compression type prepended) ({} bytes) = {}".format(hex_len(public_key_hex), public_key_hex)
-  deb(msg)
   signature_hex_pushdata = int_to_var_int(hex_len(signature_hex))
   public_key_hex_pushdata = int_to_var_int(hex_len(public_key_hex))
-  msg = "signature_hex_pushdata ({} bytes) = {}".format(hex_len(signature_hex_pushdata), signature_hex_pushdata)
-  deb(msg)
-  msg = "public_key_hex_pushdata ({} bytes) = {}".format(hex_len(public_key_hex_pushdata), public_key_hex_pushdata)
-  deb(msg)
   script_sig = signature_hex_pushdata + signature_hex + public_key_hex_pushdata + public_key_hex
   script_length = int_to_var_int(hex_len(script_sig))
-  msg = "script_sig ({} bytes) = {}".format(hex_len(script_sig), script_sig)
-  deb(msg)
-  msg = "script_length ({} bytes) = {}".format(hex_len(script_length), script_length)
-  deb(msg)
+  if debug_enabled(logger):
+    msg = "public_key_hex (1-byte compression type prepended) ({} bytes) = {}".format(hex_len(public_key_hex), public_key_hex)
+    deb(msg)
+    msg = "signature_hex_pushdata ({} bytes) = {}".format(hex_len(signature_hex_pushdata), signature_hex_pushdata)
+    deb(msg)
+    msg = "public_key_hex_pushdata ({} bytes) = {}".format(hex_len(public_key_hex_pushdata), public_key_hex_pushdata)
+    deb(msg)
+    msg = "script_sig ({} bytes) = {}".format(hex_len(script_sig), script_sig)
+    deb(msg)
+    msg = "script_length ({} bytes) = {}".format(hex_len(script_length), script_length)
+    deb(msg)
   return script_sig, script_length
 
 
 
 
-def address_to_script_pub_key(address):
-  hash_hex = bitcoin_address_to_public_key_hash_hex(address)
+# ### SECTION
+# Address cache.
+# - The same addresses (e.g. change addresses) are decoded many times while a transaction is built, validated, and reloaded. Each decode is a full base58 decode plus a double-SHA256 checksum.
+# - address_cache maps address -> (public_key_hash_hex, script_pub_key, script_length).
+# - public_key_hash_cache maps public_key_hash_hex -> address.
+# - Only valid addresses are cached. An invalid address is decoded (and rejected) every time.
+# - Both caches are configured together via configure_address_cache().
+default_address_cache_size = 4096
+address_cache = util.lru_cache.LRUCache(max_size=default_address_cache_size)
+public_key_hash_cache = util.lru_cache.LRUCache(max_size=default_address_cache_size)
+
+
+
+
+def configure_address_cache(enabled=None, max_size=None):
+  address_cache.configure(enabled, max_size)
+  public_key_hash_cache.configure(enabled, max_size)
+
+
+
+
+def clear_address_cache():
+  address_cache.clear()
+  public_key_hash_cache.clear()
+
+
+
+
+def get_address_cache_stats():
+  d = OrderedDict()
+  d['address_cache'] = address_cache.stats()
+  d['public_key_hash_cache'] = public_key_hash_cache.stats()
+  return d
+
+
+
+
+def lookup_address(address):
+  # Returns (public_key_hash_hex, script_pub_key, script_length).
+  v.validate_string(address)
+  entry = address_cache.get(address)
+  if entry is not None:
+    return entry
+  hash_hex = decode_bitcoin_address(address)
   script_pub_key, script_length = public_key_hash_hex_to_script_pub_key(hash_hex)
+  entry = (hash_hex, script_pub_key, script_length)
+  address_cache.put(address, entry)
+  return entry
+
+
+
+
+def address_to_script_pub_key(address):
+  hash_hex, script_pub_key, script_length = lookup_address(address)
   return script_pub_key, script_length
 
 
@@ -381,6 +522,13 @@ def validate_bitcoin_address(s):
 
 
 def bitcoin_address_to_public_key_hash_hex(s):
+  hash_hex, script_pub_key, script_length = lookup_address(s)
+  return hash_hex
+
+
+
+
+def decode_bitcoin_address(s):
   x = base58check_to_hex(s)
   # Remove version byte ("00" for "main Bitcoin network").
   y = x[:2]
@@ -396,61 +544,24 @@ def bitcoin_address_to_public_key_hash_hex(s):
 
 
 def base58check_to_hex(s):
-  v.validate_string(s)
-  # 1) Count the number of leading '1' characters in the address, and remove them.
-  s2 = s.lstrip('1')
-  count_1 = len(s) - len(s2)
-  # 2) Convert the result of step (1) from the Bitcoin base-58 encoding to a base-10 integer.
-  s3 = base58_to_int(s2)
-  # 3) Convert the result of step (2) from a base-10 integer to a hex byte string.
-  s4 = int_to_hex(s3)
-  # 4) The last four bytes in the result of step (3) are the checksum. Record the checksum's value and remove it.
-  checksum = s4[-8:]
-  s5 = s4[:-8]
-  # 5) Let the result of step (1) be N. Add N leading zero bytes to the result of step (4).
-  s6 = (count_1 * '00') + s5
-  # Calculate the checksum and confirm that it matches the recorded value.
-  checksum_new = get_double_sha256_checksum(s6)
-  analysis = '''
-- Input: {s}
-- Input hex: {s4}
-- Input hex without checksum: {s5}
-- Input hex without checksum and with zeroes: {s6}
-- Checksum value     : {checksum}
-- Calculated checksum: {checksum_new}
-'''.format(**vars())
-  if checksum != checksum_new:
-    msg = "Checksum value does not match calculated checksum." + analysis
-    raise ValueError(msg)
-  return s6
+  # Returns the payload (including the version byte), without the checksum.
+  # - The checksum is verified (see base58.decode_check).
+  b = base58.decode_check(s)
+  return b.hex()
 
 
 
 
 def hex_to_base58check(x):
-  checksum_hex = get_double_sha256_checksum(x)
-  x += checksum_hex
-  x_base58 = hex_to_base58(x)
-  n = count_leading_zero_bytes(x)
-  output = '1' * n + x_base58
-  return output
+  v.validate_hex(x)
+  return base58.encode_check(bytes.fromhex(x))
 
 
 
 
 def base58_to_int(s):
   # Convert a string from Bitcoin base-58 encoding to a base-10 integer.
-  # The string base58_symbols can accessed as a 0-indexed list of characters.
-  base58_symbols = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
-  n = len(s)
-  m = n - 1
-  t = 0  # running total
-  for i in range(n):
-    character = s[i]
-    value = base58_symbols.index(character)
-    # Multiply the character's value by the power of 58 that corresponds to its position in the string.
-    result = value * (58 ** (m - i))
-    t += result
+  t = base58.base58_to_int(s)
   v.validate_positive_integer(t)
   return t
 
@@ -458,18 +569,10 @@ def base58_to_int(s):
 
 
 def hex_to_base58(x):
+  # Note: Leading zero bytes are not encoded. Use hex_to_base58check to create addresses.
   v.validate_hex(x)
   y = int(x, 16)  # Convert from hex to integer.
-  # The string base58_symbols can accessed as a 0-indexed list of characters.
-  base58_symbols = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
-  output = ''
-  y2 = y
-  while y2 > 0:
-    y2, remainder = divmod(y2, 58)
-    # Use remainder as index for accessing the corresponding base58 symbol.
-    output += base58_symbols[remainder]
-  output = ''.join(reversed(output))
-  return output
+  return base58.int_to_base58(y)
 
 
 
@@ -496,9 +599,9 @@ def get_double_sha256_checksum(x):
 
 
 def get_double_sha256(x):
-  y = get_sha256(x)
-  z = get_sha256(y)
-  return z
+  v.validate_hex(x)
+  y = bytes.fromhex(x)
+  return hashing.double_sha256(y).hex()
 
 
 
@@ -506,7 +609,7 @@ def get_double_sha256(x):
 def get_sha256(x):
   v.validate_hex(x)
   y = bytes.fromhex(x)
-  return sha256.hexdigest(y)
+  return hashing.sha256(y).hex()
 
 
 
@@ -514,7 +617,20 @@ def get_sha256(x):
 def get_ripemd160(x):
   v.validate_hex(x)
   y = bytes.fromhex(x)
-  return ripemd160.hexdigest(y)
+  return hashing.ripemd160(y).hex()
+
+
+
+
+# The largest valid amount: the maximum supply of 21 million bitcoin, in satoshi.
+max_satoshi_amount = 21 * (10 ** 6) * (10 ** 8)
+
+
+
+
+def validate_satoshi_amount(n):
+  # n must be an integer in [0, max_satoshi_amount].
+  v.validate_integer_domain(n, 0, max_satoshi_amount)
 
 
 
@@ -522,9 +638,7 @@ def get_ripemd160(x):
 def satoshi_to_bitcoin(n):
   # Accepts int, returns bitcoin amount (string).
   # Example: accepts 242000, returns "0.00242".
-  max_amount = 21*(10**6)  # 21 million bitcoin
-  max_amount_satoshi = max_amount * (10 ** 8)
-  v.validate_integer_domain(n, 0, max_amount_satoshi)
+  validate_satoshi_amount(n)
   s = str(n)
   p = len(s)  # Number of digits
   if p <= 8:
@@ -632,123 +746,97 @@ def ensure_8_decimal_places(s):
 
 
 
-def var_int_to_int(x):
-  # Currently only handles 1-byte var_ints.
-  # A 1-byte var_int can encode values in the domain [0, 252].
-  v.validate_hex_length(x, 1)
-  if x in 'fd fe ff'.split():
-    raise ValueError
-  n = int(x, 16)
-  v.validate_integer_domain(n, min_value=0, max_value=252)
-  return n
-
-
-
-
-def int_to_var_int(n):
-  # Currently only handles 1-byte var_ints.
-  # A 1-byte var_int can encode values in the domain [0, 252].
-  v.validate_integer_domain(n, min_value=0, max_value=252)
-  x = int_to_hex(n)
-  v.validate_hex(x)
-  return x
-
-
-
-
-def pad_hex(x, n_bytes):
-  v.validate_hex(x)
-  v.validate_integer(n_bytes)
-  n = hex_len(x)
-  if n_bytes < n:
-    msg = "Hex value is already longer than desired padded length. Hex value: {}".format(x)
-    raise ValueError(msg)
-  m = n_bytes - n
-  if m > 0:
-    # Add leading zero hex bytes at the left-hand side.
-    x = '00' * m + x
-  return x
+# var_int (also known as "CompactSize"):
+# - [0, 252]: 1 byte.
+# - [253, 0xffff]: 'fd' followed by the value as 2 bytes (little-endian).
+# - [0x10000, 0xffffffff]: 'fe' followed by the value as 4 bytes (little-endian).
+# - [0x100000000, 0xffffffffffffffff]: 'ff' followed by the value as 8 bytes (little-endian).
+# - Only the canonical (shortest) encoding of a value is accepted.
+var_int_prefixes = {0xfd: 2, 0xfe: 4, 0xff: 8}
+var_int_minimums = {0xfd: 0xfd, 0xfe: 0x10000, 0xff: 0x100000000}
+var_int_max_value = 0xffffffffffffffff
 
 
 
 
-def pad_hex_le(x, n_bytes):
-  # Used for padding hex in little-endian format.
+def var_int_to_int(x):
   v.validate_hex(x)
-  v.validate_integer(n_bytes)
-  n = hex_len(x)
-  if n_bytes < n:
-    msg = "Hex value is already longer than desired padded length. Hex value: {}".format(x)
+  b = bytes.fromhex(x)
+  if len(b) == 0:
+    raise ValueError("Empty var_int.")
+  n, i = read_var_int(b, 0)
+  if i != len(b):
+    msg = "var_int {} has {} extra byte(s).".format(x, len(b) - i)
     raise ValueError(msg)
-  m = n_bytes - n
-  if m > 0:
-    # Add leading zero hex bytes at the right-hand side.
-    x += '00' * m
-  return x
-
-
-
-
-def hex_le_to_int(x_le):
-  # Accepts hex string in little-endian format, returns integer.
-  x = reverse_hex_order(x_le)
-  n = hex_to_int(x)
   return n
 
 
 
 
-def int_to_hex_le(n):
-  # Accepts integer, returns hex string in little-endian format.
-  x = int_to_hex(n)
-  x_le = reverse_hex_order(x)
-  return x_le
+def read_var_int(b, i):
+  # Read a var_int from bytes (or a memoryview) b, starting at index i.
+  # Returns (value, index of the first byte after the var_int).
+  if i >= len(b):
+    msg = "Expected a var_int at byte offset {}, but the data ends at byte offset {}.".format(i, len(b))
+    raise ValueError(msg)
+  first = b[i]
+  if first < 0xfd:
+    return first, i + 1
+  n_bytes = var_int_prefixes[first]
+  if i + 1 + n_bytes > len(b):
+    msg = "var_int at byte offset {} requires {} bytes, but only {} remain.".format(i, 1 + n_bytes, len(b) - i)
+    raise ValueError(msg)
+  n = int.from_bytes(b[i + 1:i + 1 + n_bytes], 'little')
+  if n < var_int_minimums[first]:
+    msg = "Non-canonical var_int at byte offset {}: value {} should use a shorter encoding.".format(i, n)
+    raise ValueError(msg)
+  return n, i + 1 + n_bytes
 
 
 
 
-def hex_to_int(x):
-  return int(x, 16)
+def int_to_var_int(n):
+  v.validate_integer_domain(n, min_value=0, max_value=var_int_max_value)
+  return int_to_var_int_bytes(n).hex()
 
 
 
 
-def int_to_hex(n):
-  # Accepts integer, returns hex string.
-  v.validate_integer(n)
-  x = hex(n)
-  x = x[2:]  # Remove '0x' prefix.
-  # Python-specific issue: Remove 'L' suffix if it exists.
-  if x[-1] == "L":
-    x = x[:-1]
-  # Ensure an even number of characters.
-  # 1 byte == 2 hex characters. An extra hex character by itself is a half-byte.
-  if len(x) % 2 == 1:
-    # Add a leading 0 (a single empty half-byte in hex).
-    x = '0' + x
-  v.validate_hex(x)
-  return x
+def int_to_var_int_bytes(n):
+  if n < 0xfd:
+    return bytes([n])
+  if n <= 0xffff:
+    return b'\xfd' + n.to_bytes(2, 'little')
+  if n <= 0xffffffff:
+    return b'\xfe' + n.to_bytes(4, 'little')
+  return b'\xff' + n.to_bytes(8, 'little')
 
 
 
 
-def reverse_hex_order(x):
-  v.validate_hex(x)
-  n = 2  # Number of hex characters per byte
-  output = [x[i:i+n] for i in range(0, len(x), n)]
-  output.reverse()
-  output = ''.join(output)
-  v.validate_hex(output)
-  return output
+def var_int_size(n):
+  # The number of bytes needed to encode n as a var_int.
+  v.validate_integer_domain(n, min_value=0, max_value=var_int_max_value)
+  if n < 0xfd:
+    return 1
+  if n <= 0xffff:
+    return 3
+  if n <= 0xffffffff:
+    return 5
+  return 9
 
 
 
 
-def hex_len(x):
-  # Divide hex length by 2 to get hex length in bytes.
-  v.validate_hex(x)
-  n = len(x) // 2
-  return n
+# The hex conversion functions are implemented in util.primitives.
+pad_hex = primitives.pad_hex
+pad_hex_le = primitives.pad_hex_le
+hex_le_to_int = primitives.hex_le_to_int
+int_to_hex_le = primitives.int_to_hex_le
+hex_to_int = primitives.hex_to_int
+int_to_hex = primitives.int_to_hex
+reverse_hex_order = primitives.reverse_hex_order
+hex_len = primitives.hex_len
 
 
 
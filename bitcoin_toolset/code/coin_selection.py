@@ -0,0 +1,540 @@
+# Imports
+import logging
+import math
+import random
+import time
+from collections import OrderedDict
+
+
+
+
+# Relative imports
+from .. import util
+from . import basic
+
+
+
+
+# Shortcuts
+v = util.validate
+
+
+
+
+# Set up logger for this module. By default, it produces no output.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.ERROR)
+log = logger.info
+deb = logger.debug
+
+
+
+
+def setup(
+    log_level = 'error',
+    debug = False,
+    log_timestamp = False,
+    log_file = None,
+    ):
+  # Configure logger for this module.
+  util.module_logger.configure_module_logger(
+    logger = logger,
+    logger_name = __name__,
+    log_level = log_level,
+    debug = debug,
+    log_timestamp = log_timestamp,
+    log_file = log_file,
+  )
+  deb('Setup complete.')
+
+
+
+
+# Notes:
+# - This module chooses which inputs (UTXOs) to spend in a new transaction.
+# - A "strategy" is a function with the signature: function(amounts, target, options)
+# -- amounts: a list of integer values (satoshi), one per available input.
+# -- target: the minimum total value (satoshi) that the selected inputs must contain.
+# -- options: an OrderedDict of settings (see build_options).
+# -- It returns a list of indices into amounts (in selection order), or None if no selection was found.
+# - Greedy strategies: 'largest_first', 'smallest_first', 'all'.
+# - Search strategies:
+# -- 'branch_and_bound': A depth-first search for a selection whose total lies within [target, target + cost_window]. Such a selection needs no change output: the small excess is given to the miner instead. This makes the transaction smaller, and avoids creating a new small output that will cost a fee to spend later. The search is bounded by max_iterations and max_seconds, so it stays fast on large input pools. If it finds no match, the knapsack strategy is used instead.
+# -- 'knapsack': A randomised search for the selection with the smallest total that is at least the target. The excess is sent to a change output. The random number generator is seeded (default seed: 0), so a given input pool and design always produce the same transaction.
+# - The search strategies work with "effective values": the value of each input minus the fee needed to include it in the transaction (at the fee rate). An input whose effective value is not positive costs more to spend than it contains, so it is never selected.
+# - select_inputs() wraps the strategies and handles the fee calculation. It is used by create_transaction for the search strategies, and for all strategies when the fee is calculated from the exact transaction size (see transaction_size).
+
+
+
+
+default_max_iterations = 100000
+default_max_seconds = 1.0
+default_knapsack_iterations = 1000
+default_max_candidates = 1000
+default_seed = 0
+# Check the time limit once per this many iterations.
+time_check_interval = 1024
+
+strategies = OrderedDict()
+search_strategy_names = []
+
+
+
+
+def register_strategy(name, function, search=False):
+  v.validate_string(name)
+  if not callable(function):
+    msg = "Coin selection strategy '{}': function must be callable.".format(name)
+    raise TypeError(msg)
+  strategies[name] = function
+  if search and name not in search_strategy_names:
+    search_strategy_names.append(name)
+
+
+
+
+def get_strategy(name):
+  if name not in strategies:
+    msg = "Unrecognised coin selection strategy: {}. Available strategies: {}".format(name, list(strategies.keys()))
+    raise NotImplementedError(msg)
+  return strategies[name]
+
+
+
+
+def is_search_strategy(name):
+  return name in search_strategy_names
+
+
+
+
+def build_options(
+    cost_window = 0,
+    max_iterations = None,
+    max_seconds = None,
+    seed = None,
+    knapsack_iterations = None,
+    max_candidates = None,
+    ):
+  # Arguments that are None receive their default values.
+  options = OrderedDict()
+  options['cost_window'] = cost_window
+  options['max_iterations'] = max_iterations if max_iterations is not None else default_max_iterations
+  options['max_seconds'] = max_seconds if max_seconds is not None else default_max_seconds
+  options['seed'] = seed if seed is not None else default_seed
+  options['knapsack_iterations'] = knapsack_iterations if knapsack_iterations is not None else default_knapsack_iterations
+  options['max_candidates'] = max_candidates if max_candidates is not None else default_max_candidates
+  v.validate_whole_number(options['cost_window'])
+  v.validate_positive_integer(options['max_iterations'])
+  v.validate_positive_integer(options['knapsack_iterations'])
+  v.validate_positive_integer(options['max_candidates'])
+  v.validate_whole_number(options['seed'])
+  if not isinstance(options['max_seconds'], (int, float)) or options['max_seconds'] <= 0:
+    msg = "max_seconds must be a positive number, not {}.".format(repr(options['max_seconds']))
+    raise ValueError(msg)
+  return options
+
+
+
+
+def select(name, amounts, target, options=None):
+  # Run one strategy. Returns a list of indices into amounts, or None.
+  function = get_strategy(name)
+  if options is None:
+    options = build_options()
+  indices = function(amounts, target, options)
+  if indices is None:
+    msg = "Coin selection strategy '{}': no selection found for target {} satoshi ({} inputs available).".format(name, target, len(amounts))
+  else:
+    msg = "Coin selection strategy '{}': {} of {} inputs selected for target {} satoshi.".format(name, len(indices), len(amounts), target)
+  log(msg)
+  return indices
+
+
+
+
+def sort_indices(amounts, descending=True):
+  # Note: The sort is stable, so inputs with equal amounts stay in their original order.
+  return sorted(range(len(amounts)), key=amounts.__getitem__, reverse=descending)
+
+
+
+
+def select_in_order(amounts, target, order):
+  # Accumulate inputs in the given order until their total reaches the target.
+  indices = []
+  total = 0
+  for i in order:
+    indices.append(i)
+    total += amounts[i]
+    if total >= target:
+      return indices
+  return None
+
+
+
+
+# ### SECTION
+# Greedy strategies.
+
+
+
+
+def select_largest_first(amounts, target, options):
+  return select_in_order(amounts, target, sort_indices(amounts, descending=True))
+
+
+
+
+def select_smallest_first(amounts, target, options):
+  return select_in_order(amounts, target, sort_indices(amounts, descending=False))
+
+
+
+
+def select_all(amounts, target, options):
+  if sum(amounts) < target:
+    return None
+  return sort_indices(amounts, descending=True)
+
+
+
+
+# ### SECTION
+# Search strategies.
+
+
+
+
+def select_branch_and_bound(amounts, target, options):
+  # Depth-first search over include/exclude decisions, with the inputs in descending order of value.
+  # - A branch is abandoned when it can no longer reach the target (even with all the remaining inputs), or when it has exceeded target + cost_window.
+  # - Among the selections within the window, the one with the smallest excess is kept. An exact match ends the search immediately.
+  # - If the previous input was excluded, an input with the same value is also excluded, as including it would only repeat a branch that has already been explored.
+  cost_window = options['cost_window']
+  max_iterations = options['max_iterations']
+  deadline = time.monotonic() + options['max_seconds']
+  order = [i for i in sort_indices(amounts) if amounts[i] > 0]
+  values = [amounts[i] for i in order]
+  n = len(values)
+  available = sum(values)
+  if available < target:
+    return None
+  upper = target + cost_window
+  selection = []  # One boolean (included or not) for each input considered so far.
+  value = 0
+  best = None
+  best_excess = None
+  iteration = 0
+  while iteration < max_iterations:
+    iteration += 1
+    if iteration % time_check_interval == 0 and time.monotonic() > deadline:
+      log("Branch and bound: time limit reached.")
+      break
+    backtrack = False
+    if value + available < target or value > upper:
+      backtrack = True
+    elif value >= target:
+      excess = value - target
+      if best_excess is None or excess < best_excess:
+        best = [order[k] for k, included in enumerate(selection) if included]
+        best_excess = excess
+        if excess == 0:
+          break
+      backtrack = True
+    elif len(selection) == n:
+      backtrack = True
+    if backtrack:
+      # Step back to the most recently included input, and explore the branch where it is excluded.
+      while selection and not selection[-1]:
+        available += values[len(selection) - 1]
+        selection.pop()
+      if not selection:
+        # The whole tree has been explored.
+        break
+      selection[-1] = False
+      value -= values[len(selection) - 1]
+    else:
+      depth = len(selection)
+      available -= values[depth]
+      if selection and not selection[-1] and values[depth] == values[depth - 1]:
+        selection.append(False)
+      else:
+        selection.append(True)
+        value += values[depth]
+  msg = "Branch and bound: {} iterations, target = {}, cost window = {}, best excess = {}.".format(iteration, target, cost_window, best_excess)
+  deb(msg)
+  return best
+
+
+
+
+def select_knapsack(amounts, target, options):
+  # Based on the knapsack solver that Bitcoin Core used before branch and bound.
+  # - An input with exactly the target value is used on its own.
+  # - Otherwise, consider the inputs that are smaller than the target. If they can't reach the target, use the smallest input that is larger than the target.
+  # - Otherwise, search for the subset of the smaller inputs with the smallest total that reaches the target, by repeated random inclusion. Use the smallest larger input instead if it is closer to the target.
+  # - At most max_candidates of the smaller inputs take part in the random search (more if they are needed to reach the target), so that each iteration stays cheap on large input pools.
+  smaller = []
+  smallest_larger = None
+  for i in sort_indices(amounts):
+    x = amounts[i]
+    if x <= 0:
+      continue
+    if x == target:
+      return [i]
+    if x < target:
+      smaller.append(i)
+    elif smallest_larger is None or x < amounts[smallest_larger]:
+      smallest_larger = i
+  total_smaller = sum(amounts[i] for i in smaller)
+  if total_smaller == target:
+    return smaller
+  if total_smaller < target:
+    if smallest_larger is None:
+      return None
+    return [smallest_larger]
+  candidates = choose_candidates(amounts, target, smaller, options['max_candidates'])
+  best = approximate_best_subset([amounts[i] for i in candidates], target, options)
+  best_total = sum(amounts[candidates[k]] for k in best)
+  if smallest_larger is not None and amounts[smallest_larger] <= best_total:
+    return [smallest_larger]
+  return [candidates[k] for k in best]
+
+
+
+
+def choose_candidates(amounts, target, smaller, max_candidates):
+  # smaller: indices of the inputs that are smaller than the target, in descending order of value.
+  # Keep enough of the largest inputs to reach the target. Fill the remaining places with inputs spread evenly across the rest of the list, so that the search still has small values with which to approach the target closely.
+  n_needed = 0
+  total = 0
+  for i in smaller:
+    n_needed += 1
+    total += amounts[i]
+    if total >= target:
+      break
+  rest = smaller[n_needed:]
+  n_rest = max_candidates - n_needed
+  if len(rest) <= n_rest:
+    return smaller
+  if n_rest <= 0:
+    return smaller[:n_needed]
+  sample = [rest[j * len(rest) // n_rest] for j in range(n_rest)]
+  return smaller[:n_needed] + sample
+
+
+
+
+def approximate_best_subset(values, target, options):
+  # values are in descending order and their sum is at least the target.
+  # Returns the positions (in values) of the best subset found.
+  rng = random.Random(options['seed'])
+  deadline = time.monotonic() + options['max_seconds']
+  n = len(values)
+  best_included = [True] * n
+  best_total = sum(values)
+  for repetition in range(options['knapsack_iterations']):
+    if best_total == target:
+      break
+    if time.monotonic() > deadline:
+      log("Knapsack: time limit reached.")
+      break
+    included = [False] * n
+    total = 0
+    reached_target = False
+    for n_pass in range(2):
+      if reached_target:
+        break
+      for i in range(n):
+        # First pass: include each input with probability 0.5. Second pass: include the inputs that were left out.
+        if n_pass == 0:
+          include = rng.random() < 0.5
+        else:
+          include = not included[i]
+        if not include:
+          continue
+        total += values[i]
+        included[i] = True
+        if total >= target:
+          reached_target = True
+          if total < best_total:
+            best_total = total
+            best_included = included[:]
+          # Remove this input and see whether the later (smaller) inputs get closer to the target.
+          total -= values[i]
+          included[i] = False
+  return [i for i in range(n) if best_included[i]]
+
+
+
+
+register_strategy('largest_first', select_largest_first)
+register_strategy('smallest_first', select_smallest_first)
+register_strategy('all', select_all)
+register_strategy('branch_and_bound', select_branch_and_bound, search=True)
+register_strategy('knapsack', select_knapsack, search=True)
+
+
+
+
+# ### SECTION
+# Fee-aware selection.
+
+
+
+
+def estimate_input_size(n_outputs=1, size_function=None):
+  # The number of bytes that one standard signed input adds to a transaction.
+  size_function = size_function or basic.estimate_transaction_size
+  return size_function(1, n_outputs) - size_function(0, n_outputs)
+
+
+
+
+def estimate_output_size(n_inputs=1, size_function=None):
+  # The number of bytes that one standard P2PKH output adds to a transaction.
+  size_function = size_function or basic.estimate_transaction_size
+  return size_function(n_inputs, 1) - size_function(n_inputs, 0)
+
+
+
+
+def calculate_input_fee(n_outputs, fee_rate=None, size_function=None):
+  # The fee (satoshi) for including one input in the transaction, at the fee rate. The effective value of an input is its value minus this fee. With a fixed fee (no fee_rate), it is 0.
+  if fee_rate is None:
+    return 0
+  return int(math.ceil(estimate_input_size(n_outputs, size_function) * fee_rate))
+
+
+
+
+def calculate_fee(n_inputs, n_outputs, fee=None, fee_rate=None, size_function=None):
+  # Exactly one of fee (satoshi) and fee_rate (satoshi/byte) must be supplied.
+  # size_function(n_inputs, n_outputs) returns the transaction size in bytes. Default: basic.estimate_transaction_size.
+  if fee is not None:
+    return fee
+  size_function = size_function or basic.estimate_transaction_size
+  size = size_function(n_inputs, n_outputs)
+  # Round up to the nearest satoshi.
+  return int(math.ceil(size * fee_rate))
+
+
+
+
+def select_inputs(name, amounts, total_output, n_outputs, fee=None, fee_rate=None, max_fee=None, change_output_exists=False, cost_of_change=None, options=None, size_function=None):
+  # Select inputs with a strategy, accounting for the fee.
+  # - Supply exactly one of fee (a fixed fee, in satoshi) and fee_rate (satoshi/byte).
+  # - max_fee: If supplied, excess value is only given to the miner (instead of creating change) if the fee stays within this limit.
+  # - change_output_exists: True if one of the outputs already sends to the change address. If not, returning change requires a new output, which increases the fee.
+  # - cost_of_change: The value (satoshi) that it is worth giving to the miner in order to avoid creating change. Default: the fee for a change output plus the fee to spend it later, at the same fee rate. With a fixed fee, the default is 0 (only an exact match avoids change).
+  # - size_function: see calculate_fee. transaction_size.signed_transaction_size gives the exact maximum size.
+  # Returns None if the inputs can't cover the outputs and the fee. Otherwise, an OrderedDict:
+  # - indices: the selected inputs (indices into amounts).
+  # - fee: the fee (satoshi). If there is no change, this includes any excess value.
+  # - change: the value (satoshi) to be sent to the change address. 0 means that no change output is needed.
+  if (fee is None) == (fee_rate is None):
+    msg = "Exactly one of fee and fee_rate must be supplied."
+    raise ValueError(msg)
+  if options is None:
+    options = build_options()
+  n_change_outputs = 0 if change_output_exists else 1
+  input_fee = calculate_input_fee(n_outputs, fee_rate, size_function)
+  if fee_rate is not None:
+    change_fee = int(math.ceil(estimate_output_size(1, size_function) * fee_rate * n_change_outputs))
+  else:
+    change_fee = 0
+  if cost_of_change is None:
+    cost_of_change = change_fee + input_fee
+
+  def changeless_fee(indices):
+    # Returns the fee if these inputs can be spent without change, or None.
+    excess_fee = sum(amounts[i] for i in indices) - total_output
+    required_fee = calculate_fee(len(indices), n_outputs, fee, fee_rate, size_function)
+    # Note: The effective values don't account for the larger var_int needed for more than 252 inputs, so the fee is checked here.
+    if not required_fee <= excess_fee <= required_fee + cost_of_change:
+      return None
+    if max_fee is not None and excess_fee > max_fee:
+      return None
+    return excess_fee
+
+  if not is_search_strategy(name):
+    return select_inputs_greedy(name, amounts, total_output, n_outputs, n_change_outputs, fee, fee_rate, changeless_fee, options, size_function)
+  effective_amounts = [x - input_fee for x in amounts]
+  base_fee = calculate_fee(0, n_outputs, fee, fee_rate, size_function)
+  if name == 'branch_and_bound':
+    target = total_output + base_fee
+    options_bnb = OrderedDict(options)
+    options_bnb['cost_window'] = cost_of_change
+    indices = select(name, effective_amounts, target, options_bnb)
+    if indices is not None:
+      final_fee = changeless_fee(indices)
+      if final_fee is not None:
+        return build_selection(indices, final_fee, 0)
+    name = 'knapsack'
+  # Select inputs that also pay for a change output.
+  target = total_output + base_fee + change_fee
+  indices = select(name, effective_amounts, target, options)
+  if indices is None:
+    return None
+  # If the change would be worth less than the cost of creating it, give it to the miner instead.
+  if not change_output_exists:
+    final_fee = changeless_fee(indices)
+    if final_fee is not None:
+      return build_selection(indices, final_fee, 0)
+  total_selected = sum(amounts[i] for i in indices)
+  final_fee = calculate_fee(len(indices), n_outputs + n_change_outputs, fee, fee_rate, size_function)
+  change = total_selected - total_output - final_fee
+  if change < 0:
+    return None
+  return build_selection(indices, final_fee, change)
+
+
+
+
+def select_inputs_greedy(name, amounts, total_output, n_outputs, n_change_outputs, fee, fee_rate, changeless_fee, options, size_function=None):
+  # The fee depends on the number of inputs, and the number of inputs depends on the fee. Start with the fee for no inputs, select inputs to cover it, recalculate the fee for the selected inputs, and repeat until the number of inputs stops changing.
+  # - The fee only increases as inputs are added, so the number of selected inputs never decreases, and the loop ends after at most len(amounts) + 1 rounds.
+  # - First, try to pay for a change output as well. If the inputs can't cover that, try without one.
+  for n_total_outputs in [n_outputs + n_change_outputs, n_outputs]:
+    n_selected = 0
+    indices = None
+    for iteration in range(len(amounts) + 1):
+      final_fee = calculate_fee(n_selected, n_total_outputs, fee, fee_rate, size_function)
+      indices = select(name, amounts, total_output + final_fee, options)
+      if indices is None or len(indices) == n_selected:
+        break
+      n_selected = len(indices)
+    msg = "Greedy selection with {} outputs: {} rounds, {} inputs selected.".format(n_total_outputs, iteration + 1, n_selected)
+    deb(msg)
+    if indices is None:
+      continue
+    if n_total_outputs > n_outputs:
+      # If the change would be worth less than the cost of creating it, give it to the miner instead.
+      changeless = changeless_fee(indices)
+      if changeless is not None:
+        return build_selection(indices, changeless, 0)
+    total_selected = sum(amounts[i] for i in indices)
+    change = total_selected - total_output - final_fee
+    if n_total_outputs == n_outputs and change > 0:
+      # There's no change output, so the excess goes to the miner.
+      final_fee = changeless_fee(indices)
+      if final_fee is None:
+        return None
+      change = 0
+    return build_selection(indices, final_fee, change)
+  return None
+
+
+
+
+def build_selection(indices, fee, change):
+  result = OrderedDict()
+  result['indices'] = indices
+  result['fee'] = fee
+  result['change'] = change
+  return result
+
+
+
@@ -10,9 +10,13 @@ import math
 # Relative imports
 from .. import util
 from . import basic
+from . import coin_selection
+from . import input_pool
 from . import transaction
+from . import transaction_size
 from . import transaction_input
 from . import transaction_output
+from . import validation
 
 
 
@@ -20,6 +24,8 @@ from . import transaction_output
 # Shortcuts
 Namespace = argparse.Namespace
 v = util.validate
+primitives = util.primitives
+info_enabled = util.module_logger.info_enabled
 
 
 
@@ -100,9 +106,18 @@ inputs design
 '''
   expected = expected.replace('\n', ' ').split()
   received1 = list(vars(a).keys())
+  # Optional: A prebuilt InputPool (see input_pool.py), used instead of a.inputs. Its inputs must already have been validated. The inputs that it marks as spent are not used.
+  pool = a.input_pool if 'input_pool' in received1 else None
+  if pool is not None:
+    expected.remove('inputs')
   v.validate_list_contains_items(received1, expected)
   allow_duplicate_output_address = a.allow_duplicate_output_address if 'allow_duplicate_output_address' in received1 else None
   change_output_index = a.change_output_index if 'change_output_index' in received1 else None
+  # Optional: The total value of the whole pool of available inputs, if a.inputs contains only some of them (e.g. candidates from a UTXO store). It is used for the spending limit.
+  total_available_input = a.total_available_input if 'total_available_input' in received1 else None
+  # Optional: The validation level (see validation.py). With 'trusted', the inputs are not validated here (e.g. because they have already been validated by the caller). The design is always validated.
+  validation_level = a.validation_level if 'validation_level' in received1 else None
+  validation_level = validation.resolve_level(validation_level)
 
   # Unpack arguments.
   design = a.design
@@ -121,16 +136,20 @@ inputs design
     max_fee = design['max_fee']
     if isinstance(max_fee, str):
       design['max_fee'] = int(max_fee)
-  for input_ in a.inputs:
-    input_['previous_output_index'] = int(input_['previous_output_index'])
+  if pool is None:
+    for input_ in a.inputs:
+      input_['previous_output_index'] = int(input_['previous_output_index'])
 
   # Validate arguments.
-  validate_inputs(a.inputs)
+  if pool is None and validation_level != 'trusted':
+    validate_inputs(a.inputs)
   validate_design(a.design)
   if allow_duplicate_output_address is not None:
     v.validate_boolean(allow_duplicate_output_address)
   if change_output_index is not None:
     v.validate_whole_number(change_output_index)
+  if total_available_input is not None:
+    v.validate_whole_number(total_available_input)
 
   log('All arguments validated. No problems found.')
 
@@ -143,6 +162,8 @@ inputs design
   max_fee = design['max_fee']
   max_spend_percentage = design['max_spend_percentage']
   input_selection_approaches = design['input_selection_approaches'] if 'input_selection_approaches' in received else ["largest_first"]
+  coin_selection_settings = dict(design['coin_selection']) if 'coin_selection' in received else {}
+  fee_calculation = design['fee_calculation'] if 'fee_calculation' in received else 'estimate'
 
 
 
@@ -156,8 +177,9 @@ inputs design
     fee_rate = float(fee_rate)
   # Calculate satoshi amounts from the Bitcoin amounts.
   # - Add these to the original data.
-  for x in a.inputs:
-    x['satoshi_amount'] = basic.bitcoin_to_satoshi(x['bitcoin_amount'])
+  if pool is None:
+    for x in a.inputs:
+      x['satoshi_amount'] = basic.bitcoin_to_satoshi(x['bitcoin_amount'])
   for x in a.outputs:
     x['satoshi_amount'] = basic.bitcoin_to_satoshi(x['bitcoin_amount'])
 
@@ -165,46 +187,45 @@ inputs design
 
 
   # [SECTION]: Report input and output data.
-  log("Report supplied data for inputs and outputs.")
-  for i, x in enumerate(a.inputs):
-    address = x['address']
-    txid = x['transaction_id']
-    index = x['previous_output_index']
-    ba = x['bitcoin_amount']
-    sa = x['satoshi_amount']
-    msg = '''
+  # Note: These reports are only built if they will be logged, as they are linear in the number of inputs.
+  if info_enabled(logger):
+    log("Report supplied data for inputs and outputs.")
+    if pool is None:
+      for i, x in enumerate(a.inputs):
+        address = x['address']
+        txid = x['transaction_id']
+        index = x['previous_output_index']
+        ba = x['bitcoin_amount']
+        sa = x['satoshi_amount']
+        msg = '''
 Input {i}:
 - address: {address}
 - txid: {txid}
 - previous_output_index: {index}
 - bitcoin_amount: {ba} ({sa} satoshi)
 '''.strip().format(**vars())
-    log(msg)
-  for i, x in enumerate(a.outputs):
-    address = x['address']
-    ba = x['bitcoin_amount']
-    sa = x['satoshi_amount']
-    msg = '''
+        log(msg)
+    for i, x in enumerate(a.outputs):
+      address = x['address']
+      ba = x['bitcoin_amount']
+      sa = x['satoshi_amount']
+      msg = '''
 Output {i}:
 - address: {address}
 - bitcoin_amount: {ba} ({sa} satoshi)
 '''.strip().format(**vars())
-    log(msg)
+      log(msg)
 
 
 
 
-  # [SECTION]: Create input and output instances.
-  inputs = []  # Note that this is different from a.inputs.
-  for x in a.inputs:
-    input_ = transaction_input.TransactionInput.create(
-      address = x['address'],
-      txid = x['transaction_id'],
-      previous_output_index_int = x['previous_output_index'],
-      satoshi_amount = x['satoshi_amount'],
-    )
-    inputs.append(input_)
-  n_inputs = len(inputs)
+  # [SECTION]: Create the input pool and the output instances.
+  # Note: The inputs are stored in an InputPool (see input_pool.py). TransactionInput instances are only created for the inputs that are selected.
+  if pool is None:
+    pool = input_pool.InputPool.from_inputs(a.inputs)
+  # The input data has already been validated, so only check it again if the validation level is 'strict'.
+  input_validation_level = 'strict' if validation_level == 'strict' else 'trusted'
+  n_inputs = pool.n_unspent()
   log("Number of inputs: {}".format(n_inputs))
   outputs = []  # Note that this is different from a.outputs.
   for x in a.outputs:
@@ -223,85 +244,87 @@ Output {i}:
   if len(input_selection_approaches) > 1:
     raise NotImplementedError
   approach = input_selection_approaches[0]
+  # positions: The pool positions of the inputs, in sorted order.
   if approach == 'largest_first':
-    inputs.sort(key=lambda x: x.satoshi_amount, reverse=True)
+    positions = pool.sort_positions(descending=True)
   elif approach == 'smallest_first':
-    inputs.sort(key=lambda x: x.satoshi_amount)
+    positions = pool.sort_positions(descending=False)
   elif approach == 'all':
     # sort by largest_first in any case.
-    inputs.sort(key=lambda x: x.satoshi_amount, reverse=True)
+    positions = pool.sort_positions(descending=True)
+  elif coin_selection.is_search_strategy(approach):
+    # The search strategies also consider the inputs largest first.
+    positions = pool.sort_positions(descending=True)
   else:
     msg = "Unrecognised input_selection_approach: {}".format(approach)
     raise NotImplementedError(msg)
   plural = 'es' if len(input_selection_approaches) > 1 else ''
   msg = "{} inputs sorted according to the input selection approach{}: {}"
-  msg = msg.format(len(inputs), plural, str(input_selection_approaches))
+  msg = msg.format(n_inputs, plural, str(input_selection_approaches))
   log(msg)
 
 
 
   # [SECTION]: Report sorted inputs and outputs.
-  log("Report inputs (now sorted) and outputs.")
-  for i, x in enumerate(inputs):
-    address = x.address
-    txid = x.txid
-    index = x.previous_output_index_int
-    ba = x.bitcoin_amount
-    sa = x.satoshi_amount
-    msg = '''
+  if info_enabled(logger):
+    log("Report inputs (now sorted) and outputs.")
+    for i, j in enumerate(positions):
+      address = pool.get_address(j)
+      txid = pool.get_txid(j)
+      index = pool.get_previous_output_index(j)
+      sa = pool.get_amount(j)
+      ba = basic.satoshi_to_bitcoin(sa)
+      msg = '''
 Input {i}:
 - address: {address}
 - txid: {txid}
 - previous_output_index: {index}
 - bitcoin_amount: {ba} ({sa} satoshi)
 '''.strip().format(**vars())
-    log(msg)
-  for i, x in enumerate(outputs):
-    address = x.address
-    ba = x.bitcoin_amount
-    sa = x.satoshi_amount
-    msg = '''
+      log(msg)
+    for i, x in enumerate(outputs):
+      address = x.address
+      ba = x.bitcoin_amount
+      sa = x.satoshi_amount
+      msg = '''
 Output {i}:
 - address: {address}
 - bitcoin_amount: {ba} ({sa} satoshi)
 '''.strip().format(**vars())
-    log(msg)
+      log(msg)
 
 
 
 
   # [SECTION]: Report aspects of the inputs and outputs.
   # Report each input address and the total value within it.
-  input_addresses = defaultdict(int)
-  for input_ in inputs:
-    satoshi = input_.satoshi_amount
-    address = input_.address
-    input_addresses[address] += satoshi
-  msg = "Input addresses and the value that they each contain:"
-  for address in input_addresses:
-    satoshi = input_addresses[address]
-    bitcoin = basic.satoshi_to_bitcoin(satoshi)
-    count = sum(1 for x in inputs if x.address == address)
-    plural = 's' if count > 1 else ''
-    msg += "\n- {}: {} bitcoin ({} satoshi), {} input{}."
-    msg = msg.format(address, bitcoin, satoshi, count, plural)
-  log(msg)
+  # Note: The input totals are only needed for this report, so they are only calculated if it will be logged.
+  # Note: The counts are accumulated in the same pass, so that this stays linear in the number of inputs and outputs.
+  if info_enabled(logger):
+    msg = "Input addresses and the value that they each contain:"
+    for address, (satoshi, count) in pool.address_totals().items():
+      bitcoin = basic.satoshi_to_bitcoin(satoshi)
+      plural = 's' if count > 1 else ''
+      msg += "\n- {}: {} bitcoin ({} satoshi), {} input{}.".format(address, bitcoin, satoshi, count, plural)
+    log(msg)
   # Report each output address and the total value to be sent to each.
   output_addresses = defaultdict(int)
+  output_address_counts = defaultdict(int)
   for output in outputs:
     satoshi = output.satoshi_amount
     address = output.address
     output_addresses[address] += satoshi
-  msg = "Output addresses, with total value to be sent to each:"
-  for address in output_addresses:
-    satoshi = output_addresses[address]
-    bitcoin = basic.satoshi_to_bitcoin(satoshi)
-    msg += "\n- {}: {} bitcoin ({} satoshi)"
-    msg = msg.format(address, bitcoin, satoshi)
-  log(msg)
+    output_address_counts[address] += 1
+  if info_enabled(logger):
+    msg = "Output addresses, with total value to be sent to each:"
+    for address in output_addresses:
+      satoshi = output_addresses[address]
+      bitcoin = basic.satoshi_to_bitcoin(satoshi)
+      msg += "\n- {}: {} bitcoin ({} satoshi)".format(address, bitcoin, satoshi)
+    log(msg)
   # Check if multiple outputs use the same address.
   for address in output_addresses:
-    count = sum(1 for x in outputs if x.address == address)
+    count = output_address_counts[address]
     if count > 1:
       if not allow_duplicate_output_address:
         msg = "Multiple outputs ({}) send to this address: {}".format(count, address)
@@ -313,38 +336,47 @@ Output {i}:
   # [SECTION]: Manage fee
   # Notes:
   # - Later, we may need to add more inputs in order to pay the fee.
-  estimated_tx_size = basic.estimate_transaction_size(n_inputs, n_outputs)
-  msg = "Estimated transaction size: {} bytes".format(estimated_tx_size)
-  log(msg)
-  msg = 'Fee type: {}'.format(fee_type)
-  log(msg)
-  if fee_type == 'fee':
-    msg = 'Fee: {} (satoshi)'.format(fee)
-  elif fee_type == 'fee_rate':
-    msg = 'Fee rate: {} (satoshi/byte)'.format(fee_rate)
-  log(msg)
-  # Calculate approximate fee.
+  # - With a search strategy (e.g. branch_and_bound), or with fee_calculation = 'exact', the fee depends on which inputs are selected, so it is calculated during input selection instead.
+  # - fee_calculation = 'exact': The fee is calculated from the maximum size of the signed transaction, for the inputs that are actually selected (see transaction_size). Otherwise, it is estimated with basic.estimate_transaction_size.
+  search = coin_selection.is_search_strategy(approach)
+  select_with_fee = search or fee_calculation == 'exact'
+  size_function = transaction_size.signed_transaction_size if fee_calculation == 'exact' else None
   final_fee = None
-  final_fee_rate = None
-  if fee_type == 'fee':
-    final_fee = fee
-  elif fee_type == 'fee_rate':
-    final_fee = estimated_tx_size * fee_rate
-    # Round up to the nearest satoshi.
-    final_fee = int(math.ceil(float(final_fee)))
-  msg = "Transaction fee: {} satoshi".format(final_fee)
-  log(msg)
-  final_fee_rate = float(final_fee) / estimated_tx_size
-  if fee_type == 'fee':
-    msg = "Estimated fee rate: {:.4f} satoshi/byte".format(final_fee_rate)
+  if select_with_fee:
+    msg = "Input selection approach: '{}'. Fee calculation: '{}'. The fee will be calculated during input selection.".format(approach, fee_calculation)
     log(msg)
-  # Check whether the fee passes the fee limit.
-  msg = "Maximum fee: {} satoshi".format(max_fee)
-  log(msg)
-  final_fee_bitcoin = basic.satoshi_to_bitcoin(final_fee)
-  if final_fee > max_fee:
-    msg = "The fee ({f} satoshi) is greater than the specified maximum fee ({m} satoshi).".format(f=final_fee, m=max_fee)
-    raise ValueError(msg)
+  else:
+    estimated_tx_size = basic.estimate_transaction_size(n_inputs, n_outputs)
+    msg = "Estimated transaction size: {} bytes".format(estimated_tx_size)
+    log(msg)
+    msg = 'Fee type: {}'.format(fee_type)
+    log(msg)
+    if fee_type == 'fee':
+      msg = 'Fee: {} (satoshi)'.format(fee)
+    elif fee_type == 'fee_rate':
+      msg = 'Fee rate: {} (satoshi/byte)'.format(fee_rate)
+    log(msg)
+    # Calculate approximate fee.
+    final_fee_rate = None
+    if fee_type == 'fee':
+      final_fee = fee
+    elif fee_type == 'fee_rate':
+      final_fee = estimated_tx_size * fee_rate
+      # Round up to the nearest satoshi.
+      final_fee = int(math.ceil(float(final_fee)))
+    msg = "Transaction fee: {} satoshi".format(final_fee)
+    log(msg)
+    final_fee_rate = float(final_fee) / estimated_tx_size
+    if fee_type == 'fee':
+      msg = "Estimated fee rate: {:.4f} satoshi/byte".format(final_fee_rate)
+      log(msg)
+    # Check whether the fee passes the fee limit.
+    msg = "Maximum fee: {} satoshi".format(max_fee)
+    log(msg)
+    final_fee_bitcoin = basic.satoshi_to_bitcoin(final_fee)
+    if final_fee > max_fee:
+      msg = "The fee ({f} satoshi) is greater than the specified maximum fee ({m} satoshi).".format(f=final_fee, m=max_fee)
+      raise ValueError(msg)
 
 
 
@@ -356,7 +388,7 @@ Output {i}:
 
 
   # Calculate totals.
-  total_input = sum([x.satoshi_amount for x in inputs])
+  total_input = pool.total()
   total_input_bitcoin = basic.satoshi_to_bitcoin(total_input)
   total_output = sum([x.satoshi_amount for x in outputs])
   total_output_bitcoin = basic.satoshi_to_bitcoin(total_output)
@@ -379,6 +411,42 @@ Output {i}:
   log(msg)
 
 
+  # Select the inputs and calculate the fee together.
+  if select_with_fee:
+    selection_options = dict(coin_selection_settings)
+    cost_of_change = selection_options.pop('cost_of_change', None)
+    options = coin_selection.build_options(**selection_options)
+    selection = coin_selection.select_inputs(
+      approach,
+      amounts = [pool.amounts[j] for j in positions],
+      total_output = total_output,
+      n_outputs = n_outputs,
+      fee = fee if fee_type == 'fee' else None,
+      fee_rate = fee_rate if fee_type == 'fee_rate' else None,
+      max_fee = max_fee,
+      change_output_exists = change_address in output_addresses,
+      cost_of_change = cost_of_change,
+      options = options,
+      size_function = size_function,
+    )
+    if selection is None:
+      msg = "Input selection approach '{}' found no inputs that cover the total output value ({} satoshi) and the fee.".format(approach, total_output)
+      raise OutputAndFeeValueNotCovered(msg)
+    selected_positions = [positions[i] for i in selection['indices']]
+    selected_inputs = pool.to_transaction_inputs(selected_positions, input_validation_level)
+    selected_inputs_index = len(selected_inputs)
+    final_fee = selection['fee']
+    msg = "Transaction fee: {} satoshi".format(final_fee)
+    if not selection['change']:
+      msg += " (no change output needed)"
+    log(msg)
+    msg = "Maximum fee: {} satoshi".format(max_fee)
+    log(msg)
+    if final_fee > max_fee:
+      msg = "The fee ({f} satoshi) is greater than the specified maximum fee ({m} satoshi).".format(f=final_fee, m=max_fee)
+      raise ValueError(msg)
+
+
   # Calculate totals.
   total_output_plus_fee = total_output + final_fee
   total_output_plus_fee_bitcoin = basic.satoshi_to_bitcoin(total_output_plus_fee)
@@ -394,9 +462,12 @@ Output {i}:
     msg = "Total available input value is less than total output + fee value."
     msg += "\n- Shortfall: {} bitcoin ({} satoshi)".format(shortfall_bitcoin, shortfall)
     raise OutputAndFeeValueNotCovered(msg)
+  elif select_with_fee:
+    msg = "Inputs selected according to input selection approaches {}.".format(input_selection_approaches)
+    log(msg)
   elif total_input == total_output_plus_fee:
     log("Total available input value exactly matches total output + fee value.")
-    selected_inputs = inputs
+    selected_inputs = pool.to_transaction_inputs(positions, input_validation_level)
   else:
     surplus = total_input - total_output_plus_fee
     surplus_bitcoin = basic.satoshi_to_bitcoin(surplus)
@@ -407,15 +478,11 @@ Output {i}:
     msg = "Selecting inputs according to input selection approaches {} until [total selected input value] exceeds [total output + fee value]."
     msg = msg.format(input_selection_approaches)
     log(msg)
-    for input_ in inputs:
-      selected_inputs_index += 1
-      total_selected_input += input_.satoshi_amount
-      selected_inputs.append(input_)
-      if total_selected_input >= total_output_plus_fee:
-        if input_selection_approaches[0] == 'all':
-          pass
-        else:
-          break
+    amounts = [pool.amounts[j] for j in positions]
+    indices = coin_selection.select(approach, amounts, total_output_plus_fee)
+    selected_positions = [positions[i] for i in indices]
+    selected_inputs = pool.to_transaction_inputs(selected_positions, input_validation_level)
+    selected_inputs_index = len(selected_inputs)
 
   msg = "Selected inputs: {}".format(selected_inputs_index)
   log(msg)
@@ -524,7 +591,12 @@ Output {i}:
   msg = "Maximum percentage of input value (prior to fee subtraction) that can be spent: {:.2f}%".format(max_spend_percentage)
   msg += '\n- Note: "spend" == send bitcoin to any address that is not the change address.'
   log(msg)
-  max_spend = max_spend_percentage / 100 * total_input
+  if total_available_input is None:
+    total_available_input = total_input
+  elif total_available_input < total_input:
+    msg = "total_available_input ({} satoshi) is less than the total value of the supplied inputs ({} satoshi).".format(total_available_input, total_input)
+    raise ValueError(msg)
+  max_spend = max_spend_percentage / 100 * total_available_input
   # Round up to the nearest satoshi.
   max_spend = int(math.ceil(max_spend))
   max_spend_bitcoin = basic.satoshi_to_bitcoin(max_spend)
@@ -536,7 +608,7 @@ Output {i}:
   msg = "Spend amount: {} bitcoin ({} satoshi)"
   msg = msg.format(spend_bitcoin, spend)
   log(msg)
-  spend_percentage = float(spend) / total_input * 100
+  spend_percentage = float(spend) / total_available_input * 100
   msg = "The spend amount is {:.2f}% of the available input value.".format(spend_percentage)
   log(msg)
   if spend <= max_spend:
@@ -584,9 +656,11 @@ address transaction_id previous_output_index bitcoin_amount
     received = list(input_.keys())
     v.validate_lists_are_identical(received, expected)
     basic.validate_bitcoin_address(input_['address'])
-    v.validate_hex_length(input_['transaction_id'], 32)
     v.validate_whole_number(input_['previous_output_index'])
     basic.validate_positive_bitcoin_amount(input_['bitcoin_amount'])
+  # Check all the transaction IDs in one pass.
+  txids = [x['transaction_id'] for x in inputs]
+  primitives.validate_hex_length_list(txids, 32, 'transaction_id', 'validate_inputs')
 
 
 
@@ -622,6 +696,8 @@ change_address max_fee max_spend_percentage outputs
     max_fee = design['max_fee']
     max_spend_percentage = design['max_spend_percentage']
     input_selection_approaches = design['input_selection_approaches'] if 'input_selection_approaches' in received else None
+    coin_selection_settings = design['coin_selection'] if 'coin_selection' in received else None
+    fee_calculation = design['fee_calculation'] if 'fee_calculation' in received else None
     outputs = design['outputs']
 
     # Validate change_address
@@ -677,6 +753,7 @@ Design must contain exactly one of these keys:
       available_approaches = [
         'all',
         'largest_first', 'smallest_first',
+        'branch_and_bound', 'knapsack',
         'any_address', 'one_address_at_a_time',
         'largest_address_first', 'smallest_address_first',
       ]
@@ -685,9 +762,11 @@ Design must contain exactly one of these keys:
           raise ValueError
       # At the moment, 'all' conflicts with any other approach.
       # - Future: Might want to order the inputs in a particular way, even if selecting 'all'.
-      if 'all' in approaches:
-        if len(approaches) > 1:
-          raise ValueError
+      # The search strategies choose the inputs themselves, so they also conflict with any other approach.
+      for approach in ['all', 'branch_and_bound', 'knapsack']:
+        if approach in approaches and len(approaches) > 1:
+          msg = "In the input selection approach list, '{}' cannot be used with any other approach.".format(approach)
+          raise ValueError(msg)
       conflicts = [
         ('largest_first', 'smallest_first'),
         ('any_address', 'one_address_at_a_time'),
@@ -700,5 +779,38 @@ Design must contain exactly one of these keys:
           msg = msg.format(x, y)
           raise ValueError(msg)
 
+    # Validate fee_calculation
+    # - 'estimate' (default): The fee is calculated from basic.estimate_transaction_size, for all the available inputs.
+    # - 'exact': The fee is calculated from the maximum signed size of the transaction, for the inputs that are selected.
+    if fee_calculation is not None:
+      if fee_calculation not in ['estimate', 'exact']:
+        msg = "fee_calculation must be 'estimate' or 'exact', not {}.".format(repr(fee_calculation))
+        raise ValueError(msg)
+
+    # Validate coin_selection
+    # - Optional settings for the search strategies ('branch_and_bound', 'knapsack').
+    # Example:
+    # "coin_selection": {
+    #   "cost_of_change": 1000,
+    #   "max_iterations": 100000,
+    #   "max_seconds": 1.0,
+    #   "seed": 0
+    # }
+    if coin_selection_settings is not None:
+      v.validate_dict(coin_selection_settings)
+      available_settings = '''
+cost_of_change max_iterations max_seconds seed knapsack_iterations max_candidates
+'''
+      available_settings = available_settings.replace('\n', ' ').split()
+      for key in coin_selection_settings:
+        if key not in available_settings:
+          msg = "Unrecognised coin_selection setting: {}. Available settings: {}".format(key, available_settings)
+          raise ValueError(msg)
+      settings = dict(coin_selection_settings)
+      cost_of_change = settings.pop('cost_of_change', None)
+      if cost_of_change is not None:
+        v.validate_whole_number(cost_of_change)
+      coin_selection.build_options(**settings)
+
 
 
@@ -0,0 +1,221 @@
+# Imports
+import logging
+import argparse
+import copy
+from collections import OrderedDict
+
+
+
+
+# Relative imports
+from .. import util
+from . import basic
+from . import create_transaction
+from . import input_pool
+from . import transaction
+from . import validation
+
+
+
+
+# Shortcuts
+Namespace = argparse.Namespace
+v = util.validate
+
+
+
+
+# Set up logger for this module. By default, it produces no output.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.ERROR)
+log = logger.info
+deb = logger.debug
+
+
+
+
+def setup(
+    log_level = 'error',
+    debug = False,
+    log_timestamp = False,
+    log_file = None,
+    ):
+  # Configure logger for this module.
+  util.module_logger.configure_module_logger(
+    logger = logger,
+    logger_name = __name__,
+    log_level = log_level,
+    debug = debug,
+    log_timestamp = log_timestamp,
+    log_file = log_file,
+  )
+  deb('Setup complete.')
+
+
+
+
+# Notes:
+# - This module creates many transactions from one shared pool of inputs (UTXOs) and a manifest (a list) of transaction designs.
+# - The designs are processed in order. Each design is given the inputs that have not yet been used by an earlier transaction, so no input is spent twice within a batch.
+# - The input pool (an InputPool, see input_pool.py) is built once for the whole batch. After each transaction, its inputs are marked as spent in the pool. The pool caches its sorted order, so the inputs are only sorted once, and the input data isn't copied for each design.
+# - Each design is passed to create_transaction.create_transaction with the shared pool, and it selects inputs from the unspent ones according to the design. The resulting transaction is signed, and the signed hex is decoded and verified before it is reported.
+# - create_transaction modifies the design data that it receives, so it is always given a fresh copy.
+# - A design can contain an optional 'name' key, which is copied to its result. It is removed before the design is validated.
+# - The input pool is validated once, at the start of the batch. Unless the validation level is 'strict', it is not validated again for each design.
+# - A design that can't be fulfilled (e.g. because the remaining inputs can't cover its outputs) produces a result with an error message. Its inputs are not consumed, and the batch continues with the next design.
+
+
+
+
+# Keys that a design in a manifest can contain, in addition to the normal design keys.
+batch_design_keys = ['name']
+
+# The errors that mean that a single design can't be fulfilled.
+design_errors = (
+  ValueError,
+  NotImplementedError,
+  create_transaction.OutputValueNotCovered,
+  create_transaction.OutputAndFeeValueNotCovered,
+  create_transaction.DuplicateOutputAddressError,
+)
+
+
+
+
+def input_key(input_):
+  # An input (UTXO) is identified by its transaction ID and previous output index.
+  return (input_['transaction_id'], int(input_['previous_output_index']))
+
+
+
+
+def validate_manifest(designs):
+  v.validate_list(designs, 'designs', 'validate_manifest')
+  if not designs:
+    msg = "The manifest must contain at least one design."
+    raise ValueError(msg)
+  for i, design in enumerate(designs):
+    if not isinstance(design, dict):
+      msg = "Design {} in the manifest must be a dict, not {}.".format(i, type(design).__name__)
+      raise TypeError(msg)
+
+
+
+
+def validate_input_pool(inputs):
+  v.validate_list(inputs, 'inputs', 'validate_input_pool')
+  keys = set()
+  for input_ in inputs:
+    key = input_key(input_)
+    if key in keys:
+      msg = "Input pool contains a duplicate input: transaction_id = {}, previous_output_index = {}".format(*key)
+      raise ValueError(msg)
+    keys.add(key)
+
+
+
+
+def map_addresses_to_private_keys(private_keys_hex):
+  # Derive each address once for the whole batch, rather than once per transaction.
+  result = {}
+  for private_key_hex in private_keys_hex:
+    v.validate_hex_length(private_key_hex, 32)
+    address = basic.private_key_hex_to_address(private_key_hex)
+    result[address] = private_key_hex
+  return result
+
+
+
+
+def create_transactions(inputs, designs, private_keys_hex, workers=None, executor=None, fail_fast=False, validation_level=None):
+  # Generator. Yields one result (an OrderedDict) per design, in manifest order, as soon as its transaction has been created, signed, and verified.
+  # Each result contains:
+  # - index: the position of the design in the manifest (starting at 0).
+  # - name: the design's name, if it has one.
+  # - valid: True if the transaction was created and all of its signatures are valid.
+  # - If the transaction was created: txid, transaction_hex, size_bytes, fee, inputs (a list of 'txid:previous_output_index' strings), n_inputs, n_outputs.
+  # - Otherwise: error.
+  # Note: workers, executor, and fail_fast are passed to Transaction.sign and Transaction.verify for each transaction.
+  level = validation.resolve_level(validation_level)
+  validate_input_pool(inputs)
+  inputs = [dict(x, previous_output_index=int(x['previous_output_index'])) for x in inputs]
+  if level != 'trusted':
+    create_transaction.validate_inputs(inputs)
+  design_validation_level = 'strict' if level == 'strict' else 'trusted'
+  validate_manifest(designs)
+  address_to_private_key_hex = map_addresses_to_private_keys(private_keys_hex)
+  for x in inputs:
+    x['satoshi_amount'] = basic.bitcoin_to_satoshi(x['bitcoin_amount'])
+  pool = input_pool.InputPool.from_inputs(inputs)
+  # The pool position of each input, by (txid, previous_output_index), in the form used by the selected TransactionInputs.
+  positions = {(pool.get_txid(i), pool.get_previous_output_index(i)): i for i in range(len(pool))}
+  n_designs = len(designs)
+  n_valid = 0
+  for index, design in enumerate(designs):
+    result = OrderedDict()
+    result['index'] = index
+    if 'name' in design:
+      result['name'] = design['name']
+    design = copy.deepcopy(design)
+    for key in batch_design_keys:
+      design.pop(key, None)
+    msg = "Design {} of {}: {} inputs available.".format(index + 1, n_designs, pool.n_unspent())
+    log(msg)
+    try:
+      tx_signed_hex, tx = create_one_transaction(pool, design, address_to_private_key_hex, workers, executor, fail_fast, design_validation_level)
+    except design_errors as e:
+      result['valid'] = False
+      result['error'] = '{}: {}'.format(type(e).__name__, e)
+      msg = "Design {}: transaction not created. {}".format(index, result['error'])
+      logger.error(msg)
+      yield result
+      continue
+    selected = [(x.txid, x.previous_output_index_int) for x in tx.inputs]
+    pool.mark_spent([positions[x] for x in selected])
+    n_valid += 1
+    result['valid'] = True
+    result['txid'] = tx.calculate_txid()
+    result['transaction_hex'] = tx_signed_hex
+    result['size_bytes'] = basic.hex_len(tx_signed_hex)
+    result['fee'] = tx.fee
+    result['inputs'] = ['{}:{}'.format(*x) for x in selected]
+    result['n_inputs'] = len(tx.inputs)
+    result['n_outputs'] = len(tx.outputs)
+    yield result
+  msg = "Batch complete: {} designs, {} transactions created, {} inputs used, {} inputs remaining."
+  msg = msg.format(n_designs, n_valid, pool.n_spent, pool.n_unspent())
+  log(msg)
+
+
+
+
+def create_one_transaction(pool, design, address_to_private_key_hex, workers=None, executor=None, fail_fast=False, validation_level=None):
+  # pool: an InputPool. Only its unspent inputs are used.
+  # Returns (signed transaction hex, decoded signed transaction).
+  a = Namespace(
+    input_pool = pool,
+    design = design,
+    validation_level = validation_level,
+  )
+  tx_unsigned = create_transaction.create_transaction(a)
+  # Supply only the private keys for the selected inputs.
+  addresses = []
+  for input_ in tx_unsigned.inputs:
+    address = input_.address
+    if address not in address_to_private_key_hex:
+      msg = "No private key supplied for input address: {}".format(address)
+      raise ValueError(msg)
+    if address not in addresses:
+      addresses.append(address)
+  private_keys_hex = [address_to_private_key_hex[x] for x in addresses]
+  tx_signed = tx_unsigned.sign(private_keys_hex, workers=workers, executor=executor)
+  tx_signed_hex = tx_signed.to_hex_signed_form()
+  # Verify the data that will be broadcast: decode the signed hex and check its signatures.
+  tx_signed_2 = transaction.Transaction.from_hex_signed(tx_signed_hex)
+  invalid_signatures = tx_signed_2.verify(workers=workers, executor=executor, fail_fast=fail_fast)
+  if invalid_signatures:
+    plural = 's' if invalid_signatures > 1 else ''
+    msg = "Signed transaction: {} invalid signature{} detected.".format(invalid_signatures, plural)
+    raise ValueError(msg)
+  return tx_signed_hex, tx_signed
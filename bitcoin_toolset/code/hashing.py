@@ -0,0 +1,204 @@
+# Imports
+import logging
+import hashlib
+
+
+
+
+# Relative imports
+from .. import util
+from .. import submodules
+
+
+
+
+# Shortcuts
+v = util.validate
+ripemd160_python3 = submodules.ripemd160_python3
+sha256_python3 = submodules.sha256_python3
+
+
+
+
+# Set up logger for this module. By default, it produces no output.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.ERROR)
+log = logger.info
+deb = logger.debug
+
+
+
+
+def setup(
+    log_level = 'error',
+    debug = False,
+    log_timestamp = False,
+    log_file = None,
+    ):
+  # Configure logger for this module.
+  util.module_logger.configure_module_logger(
+    logger = logger,
+    logger_name = __name__,
+    log_level = log_level,
+    debug = debug,
+    log_timestamp = log_timestamp,
+    log_file = log_file,
+  )
+  deb('Setup complete.')
+
+
+
+
+# Notes:
+# - This module provides the hash functions used throughout the package (SHA256 and RIPEMD160).
+# - A "hash backend" is a pair of functions that each accept bytes and return a digest (bytes).
+# - Available backends:
+# -- 'hashlib': Python's standard hashlib module (fast, implemented in C). If the local OpenSSL build doesn't provide RIPEMD160, the pure-Python RIPEMD160 submodule is used instead.
+# -- 'python': The pure-Python sha256_python3 and ripemd160_python3 submodules. These are short and readable, so they are kept as a reference implementation that can be audited.
+# -- 'cross_check': Runs both 'hashlib' and 'python' on every input and raises an error if the results differ.
+# - The default backend is 'hashlib'. The backend can be chosen via bitcoin_toolset.setup(hash_backend=...) or set_backend().
+
+
+
+
+default_backend_name = 'hashlib'
+backends = {}
+backend = None
+backend_name = None
+
+
+
+
+def register_backend(name, sha256_function, ripemd160_function):
+  v.validate_string(name)
+  if not callable(sha256_function) or not callable(ripemd160_function):
+    msg = "Hash backend '{}': sha256_function and ripemd160_function must be callable.".format(name)
+    raise TypeError(msg)
+  backends[name] = {
+    'sha256': sha256_function,
+    'ripemd160': ripemd160_function,
+  }
+
+
+
+
+def set_backend(name):
+  global backend, backend_name
+  if name not in backends:
+    msg = "Unrecognised hash backend: {}. Available backends: {}".format(name, sorted(backends.keys()))
+    raise ValueError(msg)
+  backend = backends[name]
+  backend_name = name
+  log("Hash backend set to '{}'.".format(name))
+
+
+
+
+def get_backend_name():
+  return backend_name
+
+
+
+
+def sha256(b):
+  # Accepts bytes, returns a 32-byte digest (bytes).
+  return backend['sha256'](b)
+
+
+
+
+def ripemd160(b):
+  # Accepts bytes, returns a 20-byte digest (bytes).
+  return backend['ripemd160'](b)
+
+
+
+
+def double_sha256(b):
+  return sha256(sha256(b))
+
+
+
+
+def hash160(b):
+  # RIPEMD160(SHA256(b)). Used to derive the public key hash from a public key.
+  return ripemd160(sha256(b))
+
+
+
+
+# ### SECTION
+# Backend implementations.
+
+
+
+
+def hashlib_sha256(b):
+  return hashlib.sha256(b).digest()
+
+
+
+
+def hashlib_ripemd160_available():
+  # Some OpenSSL builds (e.g. OpenSSL 3 without the legacy provider) list ripemd160 in hashlib.algorithms_available but fail when it is actually used.
+  try:
+    hashlib.new('ripemd160', b'')
+  except ValueError:
+    return False
+  return True
+
+
+
+
+def hashlib_ripemd160(b):
+  return hashlib.new('ripemd160', b).digest()
+
+
+
+
+def python_sha256(b):
+  return sha256_python3.digest(b)
+
+
+
+
+def python_ripemd160(b):
+  return ripemd160_python3.digest(b)
+
+
+
+
+def build_cross_check_function(hash_name, function_1, function_2):
+
+  def cross_check(b):
+    digest_1 = function_1(b)
+    digest_2 = function_2(b)
+    if digest_1 != digest_2:
+      msg = "Hash backends disagree on {} digest.".format(hash_name)
+      msg += "\n- Input ({} bytes): {}".format(len(b), bytes(b).hex())
+      msg += "\n- hashlib: {}".format(digest_1.hex())
+      msg += "\n- python:  {}".format(digest_2.hex())
+      raise ValueError(msg)
+    return digest_1
+
+  return cross_check
+
+
+
+
+if hashlib_ripemd160_available():
+  ripemd160_fast = hashlib_ripemd160
+else:
+  ripemd160_fast = python_ripemd160
+register_backend('hashlib', hashlib_sha256, ripemd160_fast)
+register_backend('python', python_sha256, python_ripemd160)
+register_backend(
+  'cross_check',
+  build_cross_check_function('sha256', hashlib_sha256, python_sha256),
+  build_cross_check_function('ripemd160', ripemd160_fast, python_ripemd160),
+)
+set_backend(default_backend_name)
+
+
+
@@ -0,0 +1,188 @@
+# Imports
+import logging
+from array import array
+
+
+
+
+# Relative imports
+from .. import util
+from . import transaction_input
+
+
+
+
+# Shortcuts
+v = util.validate
+
+
+
+
+# Set up logger for this module. By default, it produces no output.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.ERROR)
+log = logger.info
+deb = logger.debug
+
+
+
+
+def setup(
+    log_level = 'error',
+    debug = False,
+    log_timestamp = False,
+    log_file = None,
+    ):
+  # Configure logger for this module.
+  util.module_logger.configure_module_logger(
+    logger = logger,
+    logger_name = __name__,
+    log_level = log_level,
+    debug = debug,
+    log_timestamp = log_timestamp,
+    log_file = log_file,
+  )
+  deb('Setup complete.')
+
+
+
+
+# Notes:
+# - An InputPool holds the available inputs (UTXOs) for a new transaction in a compact, column-oriented form:
+# -- amounts: satoshi amounts, in an array('q').
+# -- txids: the 32-byte transaction IDs, one after another in a single bytearray.
+# -- indices: previous output indices, in an array('q').
+# -- address_ids: an index into the list of distinct addresses, in an array('l'). Each address is stored once, however many inputs it holds.
+# - Each input is identified by its position in the pool (the order in which it was added).
+# - Coin selection only needs the amounts. Sorting and selection work on positions, and TransactionInput objects (which need a base58 decode and a scriptPubKey each) are built only for the inputs that are selected.
+# - The pool doesn't validate the inputs. create_transaction.validate_inputs does this beforehand.
+# - Spent inputs: A pool can be used for several transactions (e.g. in create_transaction_batch.py). The inputs that an earlier transaction has used are marked as spent (in a bytearray mask), and are left out of the sorted positions, the totals, and the reports.
+# - The sorted order of all the inputs is calculated once for each direction and cached, so a pool that is used for several transactions is only sorted once.
+
+
+
+
+class InputPool:
+
+
+  def __init__(self):
+    self.amounts = array('q')
+    self.txids = bytearray()
+    self.indices = array('q')
+    self.address_ids = array('l')
+    self.addresses = []
+    self.address_map = {}
+    self.spent = bytearray()
+    self.n_spent = 0
+    # Cache of sorted positions: {descending: positions}.
+    self.sorted_positions = {}
+
+
+  def __len__(self):
+    return len(self.amounts)
+
+
+  def __str__(self):
+    name = self.__class__.__name__
+    n = len(self)
+    n_addresses = len(self.addresses)
+    s = "{name}: {n} inputs, {n_addresses} addresses".format(**vars())
+    if self.n_spent:
+      s += ", {} spent".format(self.n_spent)
+    return s
+
+
+  @classmethod
+  def from_inputs(cls, inputs):
+    # inputs: a list of dicts in the form used by create_transaction (address, transaction_id, previous_output_index, satoshi_amount).
+    pool = cls()
+    for x in inputs:
+      pool.add(x['address'], x['transaction_id'], x['previous_output_index'], x['satoshi_amount'])
+    log("Input pool created: {}".format(pool))
+    return pool
+
+
+  def add(self, address, txid, previous_output_index_int, satoshi_amount):
+    address_id = self.address_map.get(address)
+    if address_id is None:
+      address_id = len(self.addresses)
+      self.addresses.append(address)
+      self.address_map[address] = address_id
+    self.amounts.append(satoshi_amount)
+    self.txids += bytes.fromhex(txid)
+    self.indices.append(previous_output_index_int)
+    self.address_ids.append(address_id)
+    self.spent.append(0)
+    self.sorted_positions = {}
+
+
+  def get_address(self, i):
+    return self.addresses[self.address_ids[i]]
+
+
+  def get_txid(self, i):
+    return self.txids[i * 32:(i + 1) * 32].hex()
+
+
+  def get_previous_output_index(self, i):
+    return self.indices[i]
+
+
+  def get_amount(self, i):
+    return self.amounts[i]
+
+
+  def n_unspent(self):
+    return len(self.amounts) - self.n_spent
+
+
+  def mark_spent(self, positions):
+    for i in positions:
+      if not self.spent[i]:
+        self.spent[i] = 1
+        self.n_spent += 1
+
+
+  def total(self):
+    # The total value of the unspent inputs.
+    if not self.n_spent:
+      return sum(self.amounts)
+    return sum(x for x, spent in zip(self.amounts, self.spent) if not spent)
+
+
+  def sort_positions(self, descending=True):
+    # Returns the positions of the unspent inputs, sorted by amount. The sort is stable, so inputs with the same amount stay in the order in which they were added.
+    positions = self.sorted_positions.get(descending)
+    if positions is None:
+      positions = sorted(range(len(self.amounts)), key=self.amounts.__getitem__, reverse=descending)
+      self.sorted_positions[descending] = positions
+    if not self.n_spent:
+      return list(positions)
+    spent = self.spent
+    return [i for i in positions if not spent[i]]
+
+
+  def address_totals(self):
+    # Returns {address: [total satoshi, number of inputs]} for the unspent inputs, in order of first appearance.
+    totals = [[0, 0] for x in self.addresses]
+    for address_id, amount, spent in zip(self.address_ids, self.amounts, self.spent):
+      if spent:
+        continue
+      totals[address_id][0] += amount
+      totals[address_id][1] += 1
+    return {address: x for address, x in zip(self.addresses, totals) if x[1]}
+
+
+  def to_transaction_input(self, i, validation_level=None):
+    return transaction_input.TransactionInput.create(
+      address = self.get_address(i),
+      txid = self.get_txid(i),
+      previous_output_index_int = self.indices[i],
+      satoshi_amount = self.amounts[i],
+      validation_level = validation_level,
+    )
+
+
+  def to_transaction_inputs(self, positions, validation_level=None):
+    return [self.to_transaction_input(i, validation_level) for i in positions]
@@ -0,0 +1,190 @@
+# Imports
+import logging
+import math
+import itertools
+import os
+
+
+
+
+# Relative imports
+from .. import util
+
+
+
+
+# Shortcuts
+v = util.validate
+
+
+
+
+# Set up logger for this module. By default, it produces no output.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.ERROR)
+log = logger.info
+deb = logger.debug
+
+
+
+
+def setup(
+    log_level = 'error',
+    debug = False,
+    log_timestamp = False,
+    log_file = None,
+    ):
+  # Configure logger for this module.
+  util.module_logger.configure_module_logger(
+    logger = logger,
+    logger_name = __name__,
+    log_level = log_level,
+    debug = debug,
+    log_timestamp = log_timestamp,
+    log_file = log_file,
+  )
+  deb('Setup complete.')
+
+
+
+
+# Notes:
+# - This module runs CPU-bound jobs (e.g. ECDSA signing) across multiple processes.
+# - Parallelism is always opt-in. If neither workers nor an executor is supplied, the jobs are run one after another in the current process, and concurrent.futures is never imported. This is the recommended setting on offline signing machines, where we want as few moving parts as possible.
+# - The job function must be defined at the top level of a module, so that it can be pickled and sent to the worker processes.
+# - Results are always returned in the same order as the jobs, regardless of the order in which the worker processes finish them.
+
+
+
+
+def validate_workers(workers):
+  if workers is None:
+    return
+  v.validate_positive_integer(workers, 'workers', 'parallel.validate_workers')
+
+
+
+
+def use_serial(n_jobs, workers=None, executor=None):
+  if executor is not None:
+    return False
+  return workers is None or workers == 1 or n_jobs <= 1
+
+
+
+
+def map_jobs(function, jobs, workers=None, executor=None):
+  # Apply function to each job and return the list of results, in job order.
+  # - executor: an existing concurrent.futures.Executor (e.g. a long-lived ProcessPoolExecutor). It is not shut down afterwards.
+  # - workers: the number of worker processes in a new ProcessPoolExecutor, which is shut down afterwards.
+  validate_workers(workers)
+  jobs = list(jobs)
+  n_jobs = len(jobs)
+  if use_serial(n_jobs, workers, executor):
+    deb("Running {} jobs serially.".format(n_jobs))
+    return [function(job) for job in jobs]
+  if executor is not None:
+    deb("Running {} jobs on the supplied executor.".format(n_jobs))
+    return list(executor.map(function, jobs))
+  import concurrent.futures
+  workers = min(workers, n_jobs)
+  # Send the jobs in chunks, to reduce the cost of inter-process communication.
+  chunksize = max(1, int(math.ceil(n_jobs / float(workers * 4))))
+  deb("Running {} jobs on {} worker processes (chunksize = {}).".format(n_jobs, workers, chunksize))
+  with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+    results = list(executor.map(function, jobs, chunksize=chunksize))
+  return results
+
+
+
+
+def imap_jobs(function, jobs, workers=None, executor=None):
+  # Generator version of map_jobs. Results are yielded in job order.
+  # - If the caller stops iterating early (e.g. after finding an invalid result), the jobs that haven't started yet are cancelled.
+  validate_workers(workers)
+  jobs = list(jobs)
+  n_jobs = len(jobs)
+  if use_serial(n_jobs, workers, executor):
+    deb("Running {} jobs serially.".format(n_jobs))
+    for job in jobs:
+      yield function(job)
+    return
+  import concurrent.futures
+  own_executor = executor is None
+  if own_executor:
+    workers = min(workers, n_jobs)
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+  deb("Running {} jobs (results yielded in order).".format(n_jobs))
+  futures = [executor.submit(function, job) for job in jobs]
+  try:
+    for future in futures:
+      yield future.result()
+  finally:
+    n_cancelled = sum(1 for future in futures if future.cancel())
+    if n_cancelled:
+      deb("Cancelled {} of {} jobs.".format(n_cancelled, n_jobs))
+    if own_executor:
+      executor.shutdown(wait=True)
+
+
+
+
+def iterate_chunks(items, chunk_size):
+  # Yield lists of up to chunk_size items. Works with any iterable (e.g. lines read from a stream), without loading it all into memory.
+  v.validate_positive_integer(chunk_size, 'chunk_size', 'parallel.iterate_chunks')
+  items = iter(items)
+  while True:
+    chunk = list(itertools.islice(items, chunk_size))
+    if not chunk:
+      return
+    yield chunk
+
+
+
+
+def count_workers(workers=None):
+  # The number of worker processes to plan for. If not specified, use the number of CPUs.
+  if workers is not None:
+    return workers
+  return os.cpu_count() or 1
+
+
+
+
+def imap_jobs_unordered(function, jobs, workers=None, executor=None, max_in_flight=None):
+  # Generator. Yields results as soon as they are complete, which may not be in job order.
+  # - jobs can be any iterable, including a stream that is read lazily. At most max_in_flight jobs are taken from it and submitted at any one time, so memory use stays bounded.
+  # - max_in_flight defaults to 4 times the number of workers.
+  validate_workers(workers)
+  if max_in_flight is not None:
+    v.validate_positive_integer(max_in_flight, 'max_in_flight', 'parallel.imap_jobs_unordered')
+  if use_serial(2, workers, executor):
+    for job in jobs:
+      yield function(job)
+    return
+  import concurrent.futures
+  if max_in_flight is None:
+    max_in_flight = count_workers(workers) * 4
+  own_executor = executor is None
+  if own_executor:
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+  jobs = iter(jobs)
+  pending = set()
+  try:
+    while True:
+      for job in itertools.islice(jobs, max_in_flight - len(pending)):
+        pending.add(executor.submit(function, job))
+      if not pending:
+        break
+      done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+      for future in done:
+        yield future.result()
+  finally:
+    for future in pending:
+      future.cancel()
+    if own_executor:
+      executor.shutdown(wait=True)
+
+
+
@@ -0,0 +1,503 @@
+# Imports
+import logging
+import os
+import hashlib
+
+
+
+
+# Relative imports
+from .. import util
+
+
+
+
+# Shortcuts
+v = util.validate
+
+
+
+
+# Set up logger for this module. By default, it produces no output.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.ERROR)
+log = logger.info
+deb = logger.debug
+
+
+
+
+def setup(
+    log_level = 'error',
+    debug = False,
+    log_timestamp = False,
+    log_file = None,
+    ):
+  # Configure logger for this module.
+  util.module_logger.configure_module_logger(
+    logger = logger,
+    logger_name = __name__,
+    log_level = log_level,
+    debug = debug,
+    log_timestamp = log_timestamp,
+    log_file = log_file,
+  )
+  deb('Setup complete.')
+
+
+
+
+# Notes:
+# - This module implements fast public key derivation (private_key * G) on the secp256k1 curve.
+# - Signing and verification are still performed by the ecdsa_python3 submodule.
+# - Points are stored in Jacobian coordinates (X, Y, Z), which represent the affine point (X/Z^2, Y/Z^3). This means that point addition and doubling require no modular inversions. A single inversion is needed to convert the final result back to affine coordinates.
+# - Fixed-base window table:
+# -- The private key is split into windows of window_bits bits (default: 8).
+# -- For each window i, the table contains the affine points j * 2^(window_bits * i) * G, for j in [1, 2^window_bits - 1].
+# -- The public key is then the sum of one table entry per non-zero window. With 8-bit windows, this is at most 32 point additions and no point doublings.
+# - The table is built lazily, once it is worth building. Building it takes about as long as 20-30 scalar multiplications without it, so the first few multiplications (table_build_threshold) use double-and-add instead. Short tasks (e.g. deriving one address) then don't pay for the table, and longer tasks build it after a few keys. All of its points are converted to affine coordinates together, using a single modular inversion (Montgomery's batch inversion trick).
+# - The table can optionally be cached to disk (see configure_generator_table). The cache file includes a checksum, and every point is checked to be on the curve when the file is loaded. If the file is invalid, the table is rebuilt and the file is overwritten.
+# - Table lookups depend on the private key, so this code is not constant-time. Neither is the ecdsa_python3 submodule. Don't use this toolset on a machine where untrusted code is running at the same time.
+# - Point at infinity: represented as None.
+
+
+
+
+# Curve parameters.
+P = 0xfffffffffffffffffffffffffffffffffffffffffffffffffffffffefffffc2f
+N = 0xfffffffffffffffffffffffffffffffebaaedce6af48a03bbfd25e8cd0364141
+Gx = 0x79be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798
+Gy = 0x483ada7726a3c4655da4fbfc0e1108a8fd17b448a68554199c47d08ffb10d4b8
+G = (Gx, Gy)
+# Curve equation: y^2 = x^3 + 7 (mod P)
+B = 7
+
+
+
+
+# Generator table settings.
+default_window_bits = 8
+table_window_bits = default_window_bits
+table_cache_file = None
+table = None
+# The number of multiplications of G that are done with double-and-add, before the table is built.
+# - If a cache file is configured, the table is loaded (or built) straight away.
+table_build_threshold = 8
+multiplications_without_table = 0
+cache_file_magic = b'secp256k1-G-table-v1'
+
+
+
+
+def configure_generator_table(window_bits=None, cache_file=None):
+  # Changing the settings discards the current table. It will be rebuilt (or loaded from the cache file) the next time that it is needed.
+  global table, table_window_bits, table_cache_file, multiplications_without_table
+  if window_bits is not None:
+    v.validate_integer_domain(window_bits, 1, 16)
+    table_window_bits = window_bits
+  if cache_file is not None:
+    v.validate_string(cache_file)
+  table_cache_file = cache_file
+  table = None
+  multiplications_without_table = 0
+
+
+
+
+# ### SECTION
+# Field arithmetic.
+
+
+
+
+def inverse(a):
+  # Modular inverse, using Fermat's little theorem (P is prime).
+  if a % P == 0:
+    raise ValueError("Cannot invert 0.")
+  return pow(a, P - 2, P)
+
+
+
+
+def batch_inverse(values):
+  # Montgomery's trick: invert n field elements with one modular inversion and 3(n-1) multiplications.
+  n = len(values)
+  if n == 0:
+    return []
+  prefix = [0] * n
+  acc = 1
+  for i, a in enumerate(values):
+    if a % P == 0:
+      raise ValueError("Cannot invert 0.")
+    prefix[i] = acc
+    acc = (acc * a) % P
+  acc = inverse(acc)
+  results = [0] * n
+  for i in range(n - 1, -1, -1):
+    results[i] = (acc * prefix[i]) % P
+    acc = (acc * values[i]) % P
+  return results
+
+
+
+
+def is_on_curve(point):
+  if point is None:
+    return False
+  x, y = point
+  if not (0 <= x < P and 0 <= y < P):
+    return False
+  return (y * y - x * x * x - B) % P == 0
+
+
+
+
+# ### SECTION
+# Point arithmetic (Jacobian coordinates).
+
+
+
+
+def to_jacobian(point):
+  if point is None:
+    return None
+  x, y = point
+  return (x, y, 1)
+
+
+
+
+def to_affine(point):
+  if point is None:
+    return None
+  x, y, z = point
+  z_inv = inverse(z)
+  z_inv_2 = (z_inv * z_inv) % P
+  return ((x * z_inv_2) % P, (y * z_inv_2 * z_inv) % P)
+
+
+
+
+def to_affine_many(points):
+  # Convert many Jacobian points to affine coordinates with a single modular inversion.
+  # - The points must not include the point at infinity.
+  z_invs = batch_inverse([point[2] for point in points])
+  results = []
+  for (x, y, z), z_inv in zip(points, z_invs):
+    z_inv_2 = (z_inv * z_inv) % P
+    results.append(((x * z_inv_2) % P, (y * z_inv_2 * z_inv) % P))
+  return results
+
+
+
+
+def point_double(point):
+  # Formula: "dbl-2009-l" (a = 0).
+  if point is None:
+    return None
+  x, y, z = point
+  if y == 0:
+    return None
+  a = (x * x) % P
+  b = (y * y) % P
+  c = (b * b) % P
+  d = (2 * ((x + b) * (x + b) - a - c)) % P
+  e = (3 * a) % P
+  f = (e * e) % P
+  x3 = (f - 2 * d) % P
+  y3 = (e * (d - x3) - 8 * c) % P
+  z3 = (2 * y * z) % P
+  return (x3, y3, z3)
+
+
+
+
+def point_add(point_1, point_2):
+  # Add two Jacobian points. Formula: "add-2007-bl".
+  if point_1 is None:
+    return point_2
+  if point_2 is None:
+    return point_1
+  x1, y1, z1 = point_1
+  x2, y2, z2 = point_2
+  z1z1 = (z1 * z1) % P
+  z2z2 = (z2 * z2) % P
+  u1 = (x1 * z2z2) % P
+  u2 = (x2 * z1z1) % P
+  s1 = (y1 * z2 * z2z2) % P
+  s2 = (y2 * z1 * z1z1) % P
+  if u1 == u2:
+    if s1 != s2:
+      return None
+    return point_double(point_1)
+  h = (u2 - u1) % P
+  i = (4 * h * h) % P
+  j = (h * i) % P
+  r = (2 * (s2 - s1)) % P
+  v_ = (u1 * i) % P
+  x3 = (r * r - j - 2 * v_) % P
+  y3 = (r * (v_ - x3) - 2 * s1 * j) % P
+  z3 = (((z1 + z2) * (z1 + z2) - z1z1 - z2z2) * h) % P
+  return (x3, y3, z3)
+
+
+
+
+def point_add_affine(point_1, point_2):
+  # Add a Jacobian point (point_1) and an affine point (point_2). Formula: "madd-2007-bl".
+  # - This is cheaper than point_add, because Z2 = 1.
+  if point_2 is None:
+    return point_1
+  if point_1 is None:
+    return to_jacobian(point_2)
+  x1, y1, z1 = point_1
+  x2, y2 = point_2
+  z1z1 = (z1 * z1) % P
+  u2 = (x2 * z1z1) % P
+  s2 = (y2 * z1 * z1z1) % P
+  if x1 == u2:
+    if y1 != s2:
+      return None
+    return point_double(point_1)
+  h = (u2 - x1) % P
+  hh = (h * h) % P
+  i = (4 * hh) % P
+  j = (h * i) % P
+  r = (2 * (s2 - y1)) % P
+  v_ = (x1 * i) % P
+  x3 = (r * r - j - 2 * v_) % P
+  y3 = (r * (v_ - x3) - 2 * y1 * j) % P
+  z3 = ((z1 + h) * (z1 + h) - z1z1 - hh) % P
+  return (x3, y3, z3)
+
+
+
+
+def point_multiply(k, point):
+  # Generic double-and-add scalar multiplication of an affine point. Returns an affine point.
+  # - For multiples of G, use generator_multiply instead, which is much faster.
+  return to_affine(point_multiply_jacobian(k, point))
+
+
+
+
+def point_multiply_jacobian(k, point):
+  # Returns k * point in Jacobian coordinates.
+  result = None
+  addend = to_jacobian(point)
+  while k > 0:
+    if k & 1:
+      result = point_add(result, addend)
+    addend = point_double(addend)
+    k >>= 1
+  return result
+
+
+
+
+# ### SECTION
+# Fixed-base window table for G.
+
+
+
+
+def build_generator_table(window_bits):
+  n_windows = (256 + window_bits - 1) // window_bits
+  n_entries = (1 << window_bits) - 1
+  msg = "Building secp256k1 generator table ({} windows of {} bits, {} points).".format(n_windows, window_bits, n_windows * n_entries)
+  log(msg)
+  points = []
+  base = to_jacobian(G)
+  for i in range(n_windows):
+    # base = 2^(window_bits * i) * G
+    point = base
+    for j in range(n_entries):
+      points.append(point)
+      point = point_add(point, base)
+    # After the loop, point = 2^window_bits * base.
+    base = point
+  points = to_affine_many(points)
+  rows = [points[i * n_entries:(i + 1) * n_entries] for i in range(n_windows)]
+  return rows
+
+
+
+
+def table_to_bytes(rows, window_bits):
+  data = bytearray()
+  for row in rows:
+    for x, y in row:
+      data += x.to_bytes(32, 'big') + y.to_bytes(32, 'big')
+  header = cache_file_magic + bytes([window_bits])
+  checksum = hashlib.sha256(header + data).digest()
+  return header + checksum + bytes(data)
+
+
+
+
+def table_from_bytes(b, window_bits):
+  # Returns None if the data isn't a valid table for this window size.
+  n_windows = (256 + window_bits - 1) // window_bits
+  n_entries = (1 << window_bits) - 1
+  header = cache_file_magic + bytes([window_bits])
+  n_header = len(header)
+  n_data = n_windows * n_entries * 64
+  if len(b) != n_header + 32 + n_data:
+    return None
+  if b[:n_header] != header:
+    return None
+  checksum = b[n_header:n_header + 32]
+  data = b[n_header + 32:]
+  if hashlib.sha256(header + data).digest() != checksum:
+    return None
+  rows = []
+  i = 0
+  for _ in range(n_windows):
+    row = []
+    for _ in range(n_entries):
+      x = int.from_bytes(data[i:i + 32], 'big')
+      y = int.from_bytes(data[i + 32:i + 64], 'big')
+      i += 64
+      point = (x, y)
+      if not is_on_curve(point):
+        return None
+      row.append(point)
+    rows.append(row)
+  if rows[0][0] != G:
+    return None
+  return rows
+
+
+
+
+def load_table_from_file(file_path, window_bits):
+  if not os.path.isfile(file_path):
+    return None
+  with open(file_path, 'rb') as f:
+    b = f.read()
+  rows = table_from_bytes(b, window_bits)
+  if rows is None:
+    msg = "Invalid secp256k1 generator table cache file: {}. It will be rebuilt.".format(file_path)
+    logger.warning(msg)
+  return rows
+
+
+
+
+def save_table_to_file(rows, window_bits, file_path):
+  # Write to a temporary file first, so that an interrupted write can't leave a truncated cache file behind.
+  tmp_path = file_path + '.tmp'
+  with open(tmp_path, 'wb') as f:
+    f.write(table_to_bytes(rows, window_bits))
+  os.replace(tmp_path, file_path)
+  log("Saved secp256k1 generator table to {}".format(file_path))
+
+
+
+
+def get_generator_table():
+  global table
+  if table is not None:
+    return table
+  rows = None
+  if table_cache_file:
+    rows = load_table_from_file(table_cache_file, table_window_bits)
+  if rows is None:
+    rows = build_generator_table(table_window_bits)
+    if table_cache_file:
+      save_table_to_file(rows, table_window_bits, table_cache_file)
+  table = rows
+  return table
+
+
+
+
+def generator_multiply_jacobian(k):
+  # Returns k * G in Jacobian coordinates.
+  global multiplications_without_table
+  if table is None and not table_cache_file and multiplications_without_table < table_build_threshold:
+    multiplications_without_table += 1
+    return point_multiply_jacobian(k, G)
+  rows = get_generator_table()
+  window_bits = table_window_bits
+  mask = (1 << window_bits) - 1
+  result = None
+  i = 0
+  while k > 0:
+    digit = k & mask
+    if digit:
+      result = point_add_affine(result, rows[i][digit - 1])
+    k >>= window_bits
+    i += 1
+  return result
+
+
+
+
+def generator_multiply(k):
+  # Returns k * G as an affine point.
+  v.validate_integer_domain(k, 1, N - 1)
+  return to_affine(generator_multiply_jacobian(k))
+
+
+
+
+def generator_multiply_many(ks):
+  # Returns [k * G for k in ks] as affine points.
+  # - The conversions to affine coordinates are batched, so only one modular inversion is needed for the whole list.
+  points = []
+  for k in ks:
+    v.validate_integer_domain(k, 1, N - 1)
+    points.append(generator_multiply_jacobian(k))
+  return to_affine_many(points)
+
+
+
+
+def generator_multiply_range(k, count, batch_size=256):
+  # Generator. Yields the affine points k * G, (k + 1) * G, ..., (k + count - 1) * G.
+  # - Only the first point requires a scalar multiplication. Each subsequent point is found by adding G to the previous one.
+  # - The points are converted to affine coordinates in batches, with one modular inversion per batch.
+  v.validate_whole_number(count)
+  v.validate_positive_integer(batch_size)
+  if count == 0:
+    return
+  v.validate_integer_domain(k, 1, N - 1)
+  v.validate_integer_domain(k + count - 1, 1, N - 1)
+  point = generator_multiply_jacobian(k)
+  batch = []
+  for i in range(count):
+    batch.append(point)
+    if len(batch) == batch_size:
+      for affine_point in to_affine_many(batch):
+        yield affine_point
+      batch = []
+    if i < count - 1:
+      point = point_add_affine(point, G)
+  for affine_point in to_affine_many(batch):
+    yield affine_point
+
+
+
+
+def point_to_public_key_hex(point):
+  # Returns the public key as 64 bytes of hex (32-byte big-endian X value, 32-byte big-endian Y value), without the "04" prefix.
+  x, y = point
+  return '{:064x}{:064x}'.format(x, y)
+
+
+
+
+def private_key_int_to_public_key_hex(k):
+  return point_to_public_key_hex(generator_multiply(k))
+
+
+
+
+def private_key_hex_to_public_key_hex(private_key_hex):
+  v.validate_hex_length(private_key_hex, 32)
+  return private_key_int_to_public_key_hex(int(private_key_hex, 16))
+
+
+
@@ -0,0 +1,312 @@
+# Imports
+import logging
+import re
+from collections import OrderedDict
+
+
+
+
+# Relative imports
+from .. import util
+from . import basic
+
+
+
+
+# Shortcuts
+v = util.validate
+
+
+
+
+# Set up logger for this module. By default, it produces no output.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.ERROR)
+log = logger.info
+deb = logger.debug
+
+
+
+
+def setup(
+    log_level = 'error',
+    debug = False,
+    log_timestamp = False,
+    log_file = None,
+    ):
+  # Configure logger for this module.
+  util.module_logger.configure_module_logger(
+    logger = logger,
+    logger_name = __name__,
+    log_level = log_level,
+    debug = debug,
+    log_timestamp = log_timestamp,
+    log_file = log_file,
+  )
+  deb('Setup complete.')
+
+
+
+
+# Notes:
+# - This module converts transactions (and their inputs and outputs) into raw bytes.
+# - The transaction objects store their fields as hex strings. Each field is converted to bytes once and appended to a single bytearray, so that we never build a long hex string by repeated concatenation.
+# - Hex is produced only at the API edge, e.g. in Transaction.to_hex_signed_form().
+# - The field order is exactly the same as in the to_dict_signable_form() and to_dict_signed_form() methods of the transaction classes. The raw formats are described in transaction.py.
+# - It also contains the parser for signed transactions (see the "Parsing" section below). The parser reads the raw bytes through a Cursor, which holds a memoryview of the data and an offset. Fields are sliced out of the memoryview without copying, and integers are decoded with int.from_bytes. Errors report the byte offset at which the problem was found.
+
+
+
+
+def transaction_to_bytes_signed(tx):
+  b = bytearray()
+  b += bytes.fromhex(tx.version)
+  b += bytes.fromhex(tx.input_count)
+  for input_ in tx.inputs:
+    b += input_to_bytes_signed(input_)
+  b += bytes.fromhex(tx.output_count)
+  for output in tx.outputs:
+    b += output_to_bytes(output)
+  b += bytes.fromhex(tx.block_lock_time)
+  return bytes(b)
+
+
+
+
+def transaction_to_bytes_signable(tx, input_index):
+  # The transaction-in-signable-form for a particular input.
+  # - The input being signed contains the scriptPubKey of the unspent output that it spends.
+  # - Every other input contains an empty script.
+  n_inputs = len(tx.inputs)
+  if not 0 <= input_index < n_inputs:
+    msg = "Input index {} is out of range for a transaction with {} inputs.".format(input_index, n_inputs)
+    raise ValueError(msg)
+  b = bytearray()
+  b += bytes.fromhex(tx.version)
+  b += bytes.fromhex(tx.input_count)
+  for i, input_ in enumerate(tx.inputs):
+    if i == input_index:
+      b += input_to_bytes_signable(input_)
+    else:
+      b += input_to_bytes_signable_empty(input_)
+  b += bytes.fromhex(tx.output_count)
+  for output in tx.outputs:
+    b += output_to_bytes(output)
+  b += bytes.fromhex(tx.block_lock_time)
+  b += bytes.fromhex(tx.hash_type_4_byte)
+  return bytes(b)
+
+
+
+
+def input_to_bytes_signed(input_):
+  if input_.script_length is None or input_.script_sig is None:
+    msg = "Input has not been signed. Input: {}".format(input_)
+    raise ValueError(msg)
+  b = bytearray()
+  b += bytes.fromhex(input_.previous_output_hash)
+  b += bytes.fromhex(input_.previous_output_index)
+  b += bytes.fromhex(input_.script_length)
+  b += bytes.fromhex(input_.script_sig)
+  b += bytes.fromhex(input_.sequence)
+  return bytes(b)
+
+
+
+
+def input_to_bytes_signable(input_):
+  b = bytearray()
+  b += bytes.fromhex(input_.previous_output_hash)
+  b += bytes.fromhex(input_.previous_output_index)
+  b += bytes.fromhex(input_.script_pub_key_length)
+  b += bytes.fromhex(input_.script_pub_key)
+  b += bytes.fromhex(input_.sequence)
+  return bytes(b)
+
+
+
+
+def input_to_bytes_signable_empty(input_):
+  # A script_length of 0 indicates that no script is included.
+  b = bytearray()
+  b += bytes.fromhex(input_.previous_output_hash)
+  b += bytes.fromhex(input_.previous_output_index)
+  b += b'\x00'
+  b += bytes.fromhex(input_.sequence)
+  return bytes(b)
+
+
+
+
+def output_to_bytes(output):
+  # The signable form and the signed form of an output are identical.
+  b = bytearray()
+  b += bytes.fromhex(output.value)
+  b += bytes.fromhex(output.script_length)
+  b += bytes.fromhex(output.script_pub_key)
+  return bytes(b)
+
+
+
+
+# ### SECTION
+# Parsing.
+
+
+
+
+class IncompleteDataError(ValueError):
+  # The data ended before the transaction was complete.
+  # - When reading a stream of transactions, this means that more data is needed.
+  pass
+
+
+
+
+hex_bytes_pattern = re.compile(rb'[0-9a-fA-F]*')
+
+
+
+
+def data_to_bytes(data):
+  # Accepts:
+  # - raw transaction bytes (bytes, bytearray, or memoryview)
+  # - hex (a string, or ASCII bytes, e.g. read from a file opened in binary mode). Surrounding whitespace is ignored.
+  # Raw bytes are returned without being copied.
+  if isinstance(data, str):
+    s = data.strip()
+    try:
+      return bytes.fromhex(s)
+    except ValueError:
+      msg = "Data is a string, but not valid hex."
+      raise ValueError(msg)
+  if not isinstance(data, (bytes, bytearray, memoryview)):
+    msg = "Expected bytes or a hex string, but received {}.".format(type(data).__name__)
+    raise TypeError(msg)
+  # A raw signed transaction begins with the version 01000000, and byte 0x01 is not an ASCII hex character, so raw data and hex data can't be confused.
+  b = bytes(data).strip() if len(data) and data[0] in b' \t\r\n0123456789abcdefABCDEF' else None
+  if b and len(b) % 2 == 0 and hex_bytes_pattern.fullmatch(b):
+    return bytes.fromhex(b.decode('ascii'))
+  return data
+
+
+
+
+def field_name(name, index=None):
+  # See Cursor.read.
+  if index is None:
+    return name
+  return name.format(index)
+
+
+
+
+class Cursor:
+
+
+  def __init__(self, data, offset=0):
+    self.data = memoryview(data_to_bytes(data)).cast('B')
+    self.offset = offset
+
+
+  def __str__(self):
+    return "Cursor: byte offset {} of {}".format(self.offset, len(self.data))
+
+
+  @property
+  def remaining(self):
+    return len(self.data) - self.offset
+
+
+  def at_end(self):
+    return self.offset >= len(self.data)
+
+
+  def read(self, n, name, index=None):
+    # Returns a memoryview of the next n bytes.
+    # - name: the name of the field, for error messages. If index is supplied (e.g. the input number), name is a template (e.g. 'input {} sequence'). It is only formatted if an error is raised, so reading a field doesn't build a string.
+    start = self.offset
+    end = start + n
+    if end > len(self.data):
+      name = field_name(name, index)
+      msg = "Incomplete data: expected {} bytes for {} at byte offset {}, but only {} remain.".format(n, name, start, len(self.data) - start)
+      raise IncompleteDataError(msg)
+    self.offset = end
+    return self.data[start:end]
+
+
+  def read_var_int(self, name, index=None):
+    # Returns (value, memoryview of the var_int bytes).
+    start = self.offset
+    if start >= len(self.data):
+      name = field_name(name, index)
+      msg = "Incomplete data: expected a var_int for {} at byte offset {}, but the data ends there.".format(name, start)
+      raise IncompleteDataError(msg)
+    first = self.data[start]
+    n_bytes = 1
+    if first >= 0xfd:
+      n_bytes += {0xfd: 2, 0xfe: 4, 0xff: 8}[first]
+    b = self.read(n_bytes, name, index)
+    try:
+      n, i = basic.read_var_int(b, 0)
+    except ValueError as e:
+      name = field_name(name, index)
+      msg = "Invalid var_int for {} at byte offset {}: {}".format(name, start, e)
+      raise ValueError(msg)
+    return n, b
+
+
+
+
+def read_transaction_signed(cursor):
+  # Read one signed transaction, starting at the cursor's offset, and advance the cursor past it.
+  # - Returns an OrderedDict of the fields. Byte fields are memoryviews of the original data. The byte offset of each input and output is included, for use in error messages.
+  # - Raises IncompleteDataError if the data ends before the transaction does.
+  d = OrderedDict()
+  d['offset'] = cursor.offset
+  offset = cursor.offset
+  version = cursor.read(4, 'version')
+  if version != b'\x01\x00\x00\x00':
+    msg = "Unsupported transaction version {} at byte offset {}. Expected: 01000000".format(version.hex(), offset)
+    raise ValueError(msg)
+  d['version'] = version
+  input_count, d['input_count'] = cursor.read_var_int('input_count')
+  inputs = []
+  for i in range(input_count):
+    input_ = OrderedDict()
+    input_['offset'] = cursor.offset
+    input_['previous_output_hash'] = cursor.read(32, 'input {} previous_output_hash', i)
+    input_['previous_output_index'] = cursor.read(4, 'input {} previous_output_index', i)
+    script_length, input_['script_length'] = cursor.read_var_int('input {} script_length', i)
+    input_['script_sig_offset'] = cursor.offset
+    input_['script_sig'] = cursor.read(script_length, 'input {} scriptSig', i)
+    offset = cursor.offset
+    sequence = cursor.read(4, 'input {} sequence', i)
+    if sequence != b'\xff\xff\xff\xff':
+      msg = "Unsupported sequence {} for input {} at byte offset {}. Expected: ffffffff".format(sequence.hex(), i, offset)
+      raise ValueError(msg)
+    input_['sequence'] = sequence
+    inputs.append(input_)
+  d['inputs'] = inputs
+  output_count, d['output_count'] = cursor.read_var_int('output_count')
+  outputs = []
+  for i in range(output_count):
+    output = OrderedDict()
+    output['offset'] = cursor.offset
+    output['value'] = cursor.read(8, 'output {} value', i)
+    script_length, output['script_length'] = cursor.read_var_int('output {} script_length', i)
+    output['script_pub_key'] = cursor.read(script_length, 'output {} scriptPubKey', i)
+    outputs.append(output)
+  d['outputs'] = outputs
+  offset = cursor.offset
+  block_lock_time = cursor.read(4, 'block_lock_time')
+  if block_lock_time != b'\x00\x00\x00\x00':
+    msg = "Unsupported block lock time {} at byte offset {}. Expected: 00000000".format(block_lock_time.hex(), offset)
+    raise ValueError(msg)
+  d['block_lock_time'] = block_lock_time
+  d['size'] = cursor.offset - d['offset']
+  return d
+
+
+
@@ -0,0 +1,115 @@
+# Imports
+import logging
+
+
+
+
+# Relative imports
+from .. import util
+from . import hashing
+from . import serialization
+
+
+
+
+# Shortcuts
+v = util.validate
+
+
+
+
+# Set up logger for this module. By default, it produces no output.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.ERROR)
+log = logger.info
+deb = logger.debug
+
+
+
+
+def setup(
+    log_level = 'error',
+    debug = False,
+    log_timestamp = False,
+    log_file = None,
+    ):
+  # Configure logger for this module.
+  util.module_logger.configure_module_logger(
+    logger = logger,
+    logger_name = __name__,
+    log_level = log_level,
+    debug = debug,
+    log_timestamp = log_timestamp,
+    log_file = log_file,
+  )
+  deb('Setup complete.')
+
+
+
+
+# Notes:
+# - When signing or verifying a transaction, each input needs its own transaction-in-signable-form (see transaction.py for the format).
+# - These forms differ only in a single place: the input being signed contains the scriptPubKey of the unspent output that it spends, and every other input contains an empty script.
+# - Building each form from scratch costs O(N) work in Python for each of N inputs. Instead, we serialize the shared pieces once:
+# -- head: version + input_count
+# -- the empty-script records of all the inputs, concatenated into a single bytes object
+# -- tail: output_count + outputs + block lock time + hash type
+# - The form for input i is then: head + [empty records before i] + [signable record for input i] + [empty records after i] + tail. The slices are taken with memoryview, so the only copy is the final join.
+# - Note: The total amount of data hashed is still quadratic in the number of inputs. This is inherent in the legacy (pre-SegWit) signature hash algorithm. However, this work is now done inside hashlib and bytes.join, rather than by Python code.
+
+
+
+
+class SignableForms:
+
+
+  def __init__(self, tx):
+    self.tx = tx
+    self.n_inputs = len(tx.inputs)
+    self.head = bytes.fromhex(tx.version) + bytes.fromhex(tx.input_count)
+    records = [serialization.input_to_bytes_signable_empty(x) for x in tx.inputs]
+    # offsets[i] is the position of the start of input i's empty record.
+    offsets = [0]
+    for record in records:
+      offsets.append(offsets[-1] + len(record))
+    self.offsets = offsets
+    self.empty_inputs = memoryview(b''.join(records))
+    tail = bytearray()
+    tail += bytes.fromhex(tx.output_count)
+    for output in tx.outputs:
+      tail += serialization.output_to_bytes(output)
+    tail += bytes.fromhex(tx.block_lock_time)
+    tail += bytes.fromhex(tx.hash_type_4_byte)
+    self.tail = bytes(tail)
+    msg = "Precomputed shared signable form data for {} inputs ({} bytes of empty input records).".format(self.n_inputs, offsets[-1])
+    deb(msg)
+
+
+  def to_bytes(self, input_index):
+    if not 0 <= input_index < self.n_inputs:
+      msg = "Input index {} is out of range for a transaction with {} inputs.".format(input_index, self.n_inputs)
+      raise ValueError(msg)
+    input_ = self.tx.inputs[input_index]
+    start = self.offsets[input_index]
+    end = self.offsets[input_index + 1]
+    signable_form_bytes = b''.join([
+      self.head,
+      self.empty_inputs[:start],
+      serialization.input_to_bytes_signable(input_),
+      self.empty_inputs[end:],
+      self.tail,
+    ])
+    return signable_form_bytes
+
+
+  def digest(self, input_index):
+    # Returns the signature hash (double SHA256 of the signable form) for this input, as bytes.
+    return hashing.double_sha256(self.to_bytes(input_index))
+
+
+  def digest_hex(self, input_index):
+    return self.digest(input_index).hex()
+
+
+
@@ -10,6 +10,11 @@ from decimal import Decimal
 # Relative imports
 from .. import util
 from . import basic
+from . import hashing
+from . import parallel
+from . import serialization
+from . import sighash
+from . import validation
 from . import transaction_input
 from . import transaction_output
 
@@ -19,6 +24,8 @@ from . import transaction_output
 # Shortcuts
 v = util.validate
 hex_len = basic.hex_len
+LazyMessage = util.module_logger.LazyMessage
+debug_enabled = util.module_logger.debug_enabled
 
 
 
@@ -155,6 +162,29 @@ def setup(
 
 
 
+def sign_digest(job):
+  # A job is a tuple: (private_key_hex, digest_hex, random_value_hex).
+  # - random_value_hex can be None, in which case a deterministic signature is created.
+  # - This function is defined at module level so that it can be sent to worker processes (see parallel.map_jobs).
+  private_key_hex, digest_hex, random_value_hex = job
+  v.validate_hex_length(digest_hex, 32)
+  if not random_value_hex:
+    signature_hex = basic.create_deterministic_signature_for_digest(private_key_hex, digest_hex)
+  else:
+    signature_hex = basic.create_signature_for_digest(private_key_hex, digest_hex, random_value_hex)
+  return signature_hex
+
+
+
+
+def verify_digest(job):
+  # A job is a tuple: (public_key_hex, digest_hex, signature_hex).
+  # - signature_hex is the concatenated r & s values (not DER-encoded).
+  # - This function is defined at module level so that it can be sent to worker processes (see parallel.map_jobs).
+  public_key_hex, digest_hex, signature_hex = job
+  v.validate_hex_length(digest_hex, 32)
+  valid_signature = basic.verify_signature_digest(public_key_hex, digest_hex, signature_hex)
+  return valid_signature
 
 
 
@@ -205,6 +235,30 @@ class Transaction:
     return signed
 
 
+  @property
+  def validated(self):
+    # True if every input and output has been checked (see validation.py).
+    return all(x.validated for x in self.inputs + self.outputs)
+
+
+  def validate(self, validation_level=None):
+    # Check the inputs and outputs that haven't been checked yet, e.g. after loading JSON with the 'trusted' validation level.
+    # With the 'strict' level, every input and output is checked, including those that the package created.
+    level = validation.resolve_level(validation_level)
+    if level == 'trusted':
+      return self
+    strict = level == 'strict'
+    for x in self.inputs:
+      if strict or not x.validated:
+        transaction_input.TransactionInput.validate_dict(x.to_dict(), strict=strict)
+        x.validated = True
+    for x in self.outputs:
+      if strict or not x.validated:
+        transaction_output.TransactionOutput.validate_dict(x.to_dict(), strict=strict)
+        x.validated = True
+    return self
+
+
   @property
   def input_values_known(self):
     return all(x.satoshi_amount is not None for x in self.inputs)
@@ -308,7 +362,7 @@ class Transaction:
         'bitcoin_amount': basic.satoshi_to_bitcoin(self.change),
       }
     if self.signed:
-      size_bytes = hex_len(self.to_hex_signed_form())
+      size_bytes = len(self.to_bytes_signed_form())
       d['size_bytes'] = size_bytes
       if self.fee is not None:
         fee_rate = Decimal(self.fee) / size_bytes
@@ -328,12 +382,14 @@ class Transaction:
 
 
   @classmethod
-  def from_json(cls, s):
+  def from_json(cls, s, validation_level=None):
     # Notes:
     # - This is used to load (and validate) both unsigned and signed tx JSON data.
     # 1) Check that the JSON data has a particular structure.
     # 2) Validate the format of the values, as much as is feasible.
     # 3) Check that the total output value is less than or equal to the total input value.
+    # - With the 'trusted' validation level, step 2 is skipped for the inputs and outputs. They can be checked later with validate().
+    level = validation.resolve_level(validation_level)
     d = json.loads(s)
     expected = '''
 version input_count inputs output_count outputs
@@ -351,11 +407,11 @@ block_lock_time hash_type_4_byte hash_type_1_byte signed
     assert output_count == len(d['outputs'])
     inputs = []
     for x in d['inputs']:
-      input_ = transaction_input.TransactionInput.from_dict(x)
+      input_ = transaction_input.TransactionInput.from_dict(x, level)
       inputs.append(input_)
     outputs = []
     for x in d['outputs']:
-      output = transaction_output.TransactionOutput.from_dict(x)
+      output = transaction_output.TransactionOutput.from_dict(x, level)
       outputs.append(output)
     assert d['block_lock_time'] == '00000000'
     assert d['hash_type_4_byte'] == '01000000'
@@ -372,56 +428,74 @@ block_lock_time hash_type_4_byte hash_type_1_byte signed
     t.outputs = outputs
     if d['signed'] is True:
       assert t.signed is True
-    msg = 'Transaction successfully loaded from JSON format and validated.'
+    msg = "Transaction successfully loaded from JSON format and validated (validation level: '{}').".format(level)
     log(msg)
     return t
 
 
-  def sign(self, private_keys_hex, random_values_hex=None):
+  def sign(self, private_keys_hex, random_values_hex=None, workers=None, executor=None):
     # We create a signature for each input, using the private key that corresponds to that input.
     # The signature is stored in the input.
     # The transaction form is a little different for each input signing process. It must be altered carefully into the right format.
     # Regarding random_values_hex:
     # - We usually create deterministic signatures.
     # - However, in the test set there are legacy transactions that used random values that were generated separately.
+    # Regarding workers and executor:
+    # - By default, the signatures are created one after another in this process.
+    # - If workers > 1 (or a concurrent.futures executor is supplied), the ECDSA signing is spread across multiple processes. The digests are calculated here beforehand, and the results are collected in input order, so the signed transaction is byte-identical to one produced serially.
     if random_values_hex:
       if len(random_values_hex) != len(set(random_values_hex)):
         raise ValueError
       if len(random_values_hex) != len(private_keys_hex):
         raise ValueError
+    parallel.validate_workers(workers)
     map_address_to_private_key_hex = {}
+    map_address_to_public_key_hex = {}
     for private_key_hex in private_keys_hex:
       v.validate_hex_length(private_key_hex, 32)
-      address = basic.private_key_hex_to_address(private_key_hex)
+      # Derive the public_key_hex from the private_key. This will be included in the scriptSig.
+      public_key_hex = basic.private_key_hex_to_public_key_hex(private_key_hex)
+      address = basic.public_key_hex_to_address(public_key_hex)
       map_address_to_private_key_hex[address] = private_key_hex
+      map_address_to_public_key_hex[address] = public_key_hex
     known_addresses = sorted(map_address_to_private_key_hex.keys())
     n_inputs = len(self.inputs)
+    # Serialize the data shared by all the signable forms once.
+    signable_forms = sighash.SignableForms(self)
+    # Prepare one signing job for each input.
+    jobs = []
     for i, input_ in enumerate(self.inputs):
       input_index = i
       random_value_hex = random_values_hex[i] if random_values_hex else None
       address = input_.address
       prefix = '' if random_values_hex is None else "non-"
-      msg = "Creating {}deterministic signature {} of {}. Source address = {}".format(prefix, i + 1, n_inputs, address)
-      log(msg)
+      log(LazyMessage("Creating {}deterministic signature {} of {}. Source address = {}", prefix, i + 1, n_inputs, address))
       if address not in known_addresses:
         raise ValueError
       private_key_hex = map_address_to_private_key_hex[address]
-      # Derive the public_key_hex from the private_key. This will be included in the scriptSig.
-      public_key_hex = basic.private_key_hex_to_public_key_hex(private_key_hex)
+      digest_hex = signable_forms.digest_hex(input_index)
+      jobs.append((private_key_hex, digest_hex, random_value_hex))
+    signatures_hex = parallel.map_jobs(sign_digest, jobs, workers, executor)
+    debug = debug_enabled(logger)
+    for i, input_ in enumerate(self.inputs):
+      public_key_hex = map_address_to_public_key_hex[input_.address]
       input_.public_key_hex = public_key_hex
-      msg = "public_key_hex ({} bytes) = {}".format(hex_len(public_key_hex), public_key_hex)
-      deb(msg)
-      signature_hex = self.create_signature_for_one_input(input_index, private_key_hex, random_value_hex)
-      msg = "signature_hex ({} bytes) = {}".format(hex_len(signature_hex), signature_hex)
-      deb(msg)
+      signature_hex = signatures_hex[i]
+      if debug:
+        msg = "public_key_hex ({} bytes) = {}".format(hex_len(public_key_hex), public_key_hex)
+        deb(msg)
+        msg = "signature_hex ({} bytes) = {}".format(hex_len(signature_hex), signature_hex)
+        deb(msg)
       # Convert the signature to DER encoding.
       signature_hex = basic.signature_to_der(signature_hex)
-      msg = "signature_hex (DER-encoded) ({} bytes) = {}".format(hex_len(signature_hex), signature_hex)
-      deb(msg)
+      if debug:
+        msg = "signature_hex (DER-encoded) ({} bytes) = {}".format(hex_len(signature_hex), signature_hex)
+        deb(msg)
       # Append hash_type SIGHASH_ALL (as a single byte) "01" to DER-encoded signature.
       signature_hex += self.hash_type_1_byte
-      msg = "signature_hex (DER-encoded, 1-byte hash type appended) ({} bytes) = {}".format(hex_len(signature_hex), signature_hex)
-      deb(msg)
+      if debug:
+        msg = "signature_hex (DER-encoded, 1-byte hash type appended) ({} bytes) = {}".format(hex_len(signature_hex), signature_hex)
+        deb(msg)
       script_sig, script_length = basic.signature_hex_and_public_key_hex_to_script_sig(signature_hex, input_.public_key_hex)
       script_length_int = basic.var_int_to_int(script_length)
       # Storing the scriptSig and its script_length in the input-used-for-signing, for every input, completes the sign() process.
@@ -434,36 +508,26 @@ block_lock_time hash_type_4_byte hash_type_1_byte signed
     return self
 
 
-  def create_signature_for_one_input(self, input_index, private_key_hex, random_value_hex=None):
+  def create_signature_for_one_input(self, input_index, private_key_hex, random_value_hex=None, signable_forms=None):
     input_ = self.inputs[input_index]
-    # Get the transaction-in-signable-form for this input.
+    # Get the transaction-in-signable-form for this input, and hash it.
+    # - If signing multiple inputs, pass in a sighash.SignableForms instance, so that the shared data isn't serialized again for each input.
     #deb(self.to_json_signable_form(input_index))
-    signable_form_hex = self.to_hex_signable_form(input_index)
-    #deb(signable_form_hex)
-    digest_hex = basic.get_double_sha256(signable_form_hex)
+    if signable_forms is None:
+      signable_forms = sighash.SignableForms(self)
+    digest_hex = signable_forms.digest_hex(input_index)
     #deb(digest_hex)
-    v.validate_hex_length(digest_hex, 32)
-    if not random_value_hex:
-      signature_hex = basic.create_deterministic_signature_for_digest(private_key_hex, digest_hex)
-    else:
-      signature_hex = basic.create_signature_for_digest(private_key_hex, digest_hex, random_value_hex)
+    signature_hex = sign_digest((private_key_hex, digest_hex, random_value_hex))
     #deb("signature_hex: {}".format(signature_hex))
     return signature_hex
 
 
   def to_hex_signable_form(self, input_index):
-    d = self.to_dict_signable_form(input_index)
-    s = ''
-    for k, v in d.items():
-      if k in 'inputs outputs'.split():
-        # These are lists of ordered dicts.
-        for x in v:
-          for k2, v2 in x.items():
-            s += v2
-      else:
-        # Add the stored hex value to the hex result.
-        s += v
-    return s
+    return self.to_bytes_signable_form(input_index).hex()
+
+
+  def to_bytes_signable_form(self, input_index):
+    return serialization.transaction_to_bytes_signable(self, input_index)
 
 
   def to_json_signable_form(self, input_index):
@@ -493,12 +557,26 @@ block_lock_time hash_type_4_byte hash_type_1_byte signed
     return d
 
 
-  def verify(self):
-    invalid_signatures = 0
+  def verify(self, workers=None, executor=None, fail_fast=False):
+    # Returns the number of invalid signatures.
+    # - If fail_fast is True, verification stops at the first invalid signature, so the result is at most 1.
+    results = self.verify_inputs(workers, executor, fail_fast)
+    invalid_signatures = len([x for x in results if x['valid'] is False])
+    return invalid_signatures
+
+
+  def verify_inputs(self, workers=None, executor=None, fail_fast=False):
+    # Returns a list of results, one for each input, in input order. Each result is an OrderedDict:
+    # - input_index: The index of the input in the transaction.
+    # - address: The address of the input.
+    # - valid: True or False. If fail_fast is True, the inputs after the first invalid signature are not checked, and their value is None.
+    # Regarding workers and executor:
+    # - The digests are calculated here. The signature checks can be spread across multiple processes (see parallel.map_jobs).
+    parallel.validate_workers(workers)
     n_inputs = len(self.inputs)
+    signable_forms = sighash.SignableForms(self)
+    jobs = []
     for i, input_ in enumerate(self.inputs):
-      msg = "Verifying signature {} of {}.".format(i+1, n_inputs)
-      deb(msg)
       input_index = i
       script_sig = input_.script_sig
       if script_sig is None:
@@ -506,50 +584,64 @@ block_lock_time hash_type_4_byte hash_type_1_byte signed
       signature_hex, public_key_hex = basic.script_sig_to_signature_hex_and_public_key_hex(script_sig)
       # Convert DER-encoded signature to concatenated r & s.
       signature_hex = basic.signature_from_der(signature_hex)
-      valid_signature = self.verify_signature_for_one_input(input_index, public_key_hex, signature_hex)
+      digest_hex = signable_forms.digest_hex(input_index)
+      jobs.append((public_key_hex, digest_hex, signature_hex))
+    results = []
+    if fail_fast:
+      checks = parallel.imap_jobs(verify_digest, jobs, workers, executor)
+    else:
+      checks = parallel.map_jobs(verify_digest, jobs, workers, executor)
+    for i, valid_signature in enumerate(checks):
+      deb(LazyMessage("Verifying signature {} of {}.", i + 1, n_inputs))
+      result = OrderedDict()
+      result['input_index'] = i
+      result['address'] = self.inputs[i].address
+      result['valid'] = valid_signature
+      results.append(result)
       if valid_signature:
-        msg = "Signature {} of {} is valid.".format(i + 1, n_inputs)
-        deb(msg)
+        deb(LazyMessage("Signature {} of {} is valid.", i + 1, n_inputs))
       else:
         msg = "Signature {} of {} is invalid!".format(i + 1, n_inputs)
         logger.error(msg)
-        invalid_signatures += 1
-    plural = 's' if n_inputs > 1 else ''
-    msg = "Transaction verified: {} valid signature{}".format(n_inputs, plural)
+        if fail_fast:
+          checks.close()
+          break
+    for i in range(len(results), n_inputs):
+      result = OrderedDict()
+      result['input_index'] = i
+      result['address'] = self.inputs[i].address
+      result['valid'] = None
+      results.append(result)
+    n_valid = len([x for x in results if x['valid']])
+    plural = 's' if n_valid != 1 else ''
+    msg = "Transaction verified: {} valid signature{}".format(n_valid, plural)
     log(msg)
-    return invalid_signatures
+    return results
 
 
-  def verify_signature_for_one_input(self, input_index, public_key_hex, signature_hex):
+  def verify_signature_for_one_input(self, input_index, public_key_hex, signature_hex, signable_forms=None):
     input_ = self.inputs[input_index]
-    # Get the transaction-in-signable-form for this input.
+    # Get the transaction-in-signable-form for this input, and hash it.
     #deb(self.to_json_signable_form(input_index))
-    signable_form_hex = self.to_hex_signable_form(input_index)
-    #deb(signable_form_hex)
-    digest_hex = basic.get_double_sha256(signable_form_hex)
+    if signable_forms is None:
+      signable_forms = sighash.SignableForms(self)
+    digest_hex = signable_forms.digest_hex(input_index)
     #deb(digest_hex)
-    v.validate_hex_length(digest_hex, 32)
-    valid_signature = basic.verify_signature_digest(public_key_hex, digest_hex, signature_hex)
+    valid_signature = verify_digest((public_key_hex, digest_hex, signature_hex))
     return valid_signature
 
 
   def to_hex_signed_form(self):
-    d = self.to_dict_signed_form()
-    s = ''
-    for k, v in d.items():
-      if k in 'inputs outputs'.split():
-        # These are lists of ordered dicts.
-        for x in v:
-          for k2, v2 in x.items():
-            s += v2
-      else:
-        # Add the stored hex value to the hex result.
-        s += v
+    s = self.to_bytes_signed_form().hex()
     msg = "Signed transaction converted to hex form."
     log(msg)
     return s
 
 
+  def to_bytes_signed_form(self):
+    return serialization.transaction_to_bytes_signed(self)
+
+
   def to_json_signed_form(self):
     d = self.to_dict_signed_form()
     s = json.dumps(d, indent=2)
@@ -578,86 +670,64 @@ block_lock_time hash_type_4_byte hash_type_1_byte signed
     # - This is used to load (and validate) signed tx hex data.
     # - We build and return a tx instance, so that we can call tx.verify().
     # -- We only the need to store the information returned in to_dict_signable_form().
-    log("Loading signed transaction from hex.")
-    deb("hex received: " + s)
-    n = basic.hex_len(s)
-    deb('hex length: {}'.format(n))
-    hex_bytes = [s[i:i+2] for i in range(0, len(s), 2)]
-    version = ''.join(hex_bytes[0:4])
-    i = 4  # current index
-    if version != '01000000':
-      raise ValueError
-    deb('version: {}'.format(version))
-    input_count = hex_bytes[i]
-    i += 1
+    v.validate_string(s)
+    return cls.from_bytes_signed(s)
+
 
-    deb('input_count: {}'.format(input_count))
-    input_count_int = basic.var_int_to_int(input_count)
-    deb('input_count_int: {}'.format(input_count_int))
+  @classmethod
+  def from_bytes_signed(cls, data):
+    # Load a signed transaction from raw bytes or hex (see serialization.data_to_bytes).
+    # - The data must contain exactly one transaction.
+    log("Loading signed transaction.")
+    cursor = serialization.Cursor(data)
+    deb(LazyMessage('data length: {} bytes', len(cursor.data)))
+    d = serialization.read_transaction_signed(cursor)
+    if not cursor.at_end():
+      msg = "Unexpected data after the end of the transaction: {} bytes at byte offset {}.".format(cursor.remaining, cursor.offset)
+      raise ValueError(msg)
+    return cls.from_parsed_signed(d)
+
+
+  @classmethod
+  def from_parsed_signed(cls, d):
+    # Build a transaction from the fields returned by serialization.read_transaction_signed().
+    debug = debug_enabled(logger)
     inputs = []
-    for x in range(input_count_int):
-      deb('input {}:'.format(x))
-      previous_output_hash = ''.join(hex_bytes[i:i+32])
-      i += 32
-      deb('- previous_output_hash: {}'.format(previous_output_hash))
-      previous_output_index = ''.join(hex_bytes[i:i+4])
-      i += 4
-      deb('- previous_output_index: {}'.format(previous_output_index))
-      script_length = ''.join(hex_bytes[i])
-      deb('- script_length: {}'.format(script_length))
-      script_length_int = basic.var_int_to_int(script_length)
-      i += 1
-      deb('- script_length_int: {}'.format(script_length_int))
-      script_sig = ''.join(hex_bytes[i:i+script_length_int])
-      i += script_length_int
-      deb('- script_sig: {}'.format(script_sig))
-      signature_hex, public_key_hex = basic.script_sig_to_signature_hex_and_public_key_hex(script_sig)
-      deb('- signature_hex ({} bytes): {}'.format(hex_len(signature_hex), signature_hex))
-      deb('- public_key_hex ({} bytes): {}'.format(hex_len(public_key_hex), public_key_hex))
-      sequence = ''.join(hex_bytes[i:i+4])
-      i += 4
-      deb('- sequence: {}'.format(sequence))
-      if sequence != 'ffffffff':
-        raise ValueError
+    for i, x in enumerate(d['inputs']):
+      previous_output_hash = x['previous_output_hash'].hex()
+      previous_output_index = x['previous_output_index'].hex()
+      script_length = x['script_length'].hex()
+      script_sig = x['script_sig'].hex()
+      if debug:
+        deb('input {}: previous_output_hash = {}, previous_output_index = {}'.format(i, previous_output_hash, previous_output_index))
+        deb('- script_sig ({} bytes): {}'.format(len(x['script_sig']), script_sig))
+      try:
+        signature_hex, public_key_hex = basic.script_sig_to_signature_hex_and_public_key_hex(script_sig)
+      except ValueError as e:
+        msg = "Invalid scriptSig for input {} at byte offset {}. {}".format(i, x['script_sig_offset'], e)
+        raise ValueError(msg)
       input_ = transaction_input.TransactionInput.create_from_signed_tx_data(public_key_hex, previous_output_hash, previous_output_index, script_length, script_sig)
       inputs.append(input_)
-
-    output_count = hex_bytes[i]
-    i += 1
-    deb('output_count: {}'.format(output_count))
-    output_count_int = basic.var_int_to_int(output_count)
-    deb('output_count_int: {}'.format(output_count_int))
     outputs = []
-    for x in range(output_count_int):
-      deb('output {}:'.format(x))
-      value = ''.join(hex_bytes[i:i+8])
-      i += 8
-      satoshi_amount = basic.hex_le_to_int(value)
-      bitcoin_amount = basic.satoshi_to_bitcoin(satoshi_amount)
-      deb('- value: {} ({} bitcoin, {} satoshi)'.format(value, bitcoin_amount, satoshi_amount))
-      script_length = ''.join(hex_bytes[i])
-      i += 1
-      deb('- script_length: {}'.format(script_length))
-      script_length_int = basic.var_int_to_int(script_length)
-      deb('- script_length_int: {}'.format(script_length_int))
-      script_pub_key = ''.join(hex_bytes[i:i+script_length_int])
-      i += script_length_int
-      deb('- script_pub_key: {}'.format(script_pub_key))
-      output = transaction_output.TransactionOutput.create_from_signed_tx_data(value, script_length, script_pub_key)
+    for i, x in enumerate(d['outputs']):
+      value = x['value'].hex()
+      script_length = x['script_length'].hex()
+      script_pub_key = x['script_pub_key'].hex()
+      if debug:
+        deb('output {}: value = {}, script_pub_key = {}'.format(i, value, script_pub_key))
+      try:
+        output = transaction_output.TransactionOutput.create_from_signed_tx_data(value, script_length, script_pub_key)
+      except ValueError as e:
+        msg = "Invalid output {} at byte offset {}. {}".format(i, x['offset'], e)
+        raise ValueError(msg)
       outputs.append(output)
-
-    block_lock_time = ''.join(hex_bytes[i:i+4])
-    deb('- block_lock_time: {}'.format(block_lock_time))
-    if block_lock_time != '00000000':
-      raise ValueError
-
     # Create the instance and save the instance variables.
     t = Transaction()
     t.input_count = basic.int_to_var_int(len(inputs))
     t.inputs = inputs
     t.output_count = basic.int_to_var_int(len(outputs))
     t.outputs = outputs
-    msg = 'Signed transaction successfully loaded from hex format and validated.'
+    msg = 'Signed transaction successfully loaded and validated.'
     log(msg)
     return t
 
@@ -666,9 +736,9 @@ block_lock_time hash_type_4_byte hash_type_1_byte signed
     # The txid is calculated by applying the SHA256 hash algorithm twice to the signed transaction binary data, and then converting the result to little-endian.
     if not self.signed:
       raise ValueError
-    tx_signed_hex = self.to_hex_signed_form()
-    hash_hex = basic.get_double_sha256(tx_signed_hex)
-    txid = basic.reverse_hex_order(hash_hex)
+    tx_signed_bytes = self.to_bytes_signed_form()
+    hash_bytes = hashing.double_sha256(tx_signed_bytes)
+    txid = hash_bytes[::-1].hex()
     return txid
 
 
@@ -1,5 +1,6 @@
 # Imports
 import logging
+import sys
 from collections import OrderedDict
 
 
@@ -8,6 +9,7 @@ from collections import OrderedDict
 # Relative imports
 from .. import util
 from . import basic
+from . import validation
 
 
 
@@ -57,19 +59,36 @@ def setup(
 class TransactionInput:
 
 
+  # Notes:
+  # - The instances use __slots__, so that a large pool of inputs (e.g. 100,000 UTXOs) stays compact.
+  # - The core fields are stored as bytes and ints: previous_output_hash (32 bytes), previous_output_index_int, script_pub_key (bytes), satoshi_amount.
+  # - The other forms (txid, previous_output_index, script_pub_key_length, script_pub_key_length_int, bitcoin_amount, and the hex forms of the bytes) are properties, which are calculated when they are read.
+  # - The signature fields (public_key_hex, script_length, script_length_int, script_sig) are set during signing, and are stored as they are.
+  __slots__ = [
+    '_previous_output_hash',
+    'previous_output_index_int',
+    'sequence',
+    'public_key_hex',
+    '_script_pub_key',
+    'script_length',
+    'script_length_int',
+    'script_sig',
+    'address',
+    'satoshi_amount',
+    'validated',
+  ]
+
+
   def __init__(self):
     # Properties that go into the raw transaction:
-    self.previous_output_hash = None  # 32 bytes (big-endian)
+    self._previous_output_hash = None  # 32 bytes (big-endian)
     # - When previous_output_hash is little-endian, it is the "txid".
-    self.previous_output_index = None  # 4 bytes (little-endian)
-    self.previous_output_index_int = None  # string
+    self.previous_output_index_int = None  # int. previous_output_index is its 4-byte little-endian form.
     self.sequence = "ffffffff"  # 4 bytes
     # Properties that are needed for signing the raw transaction:
     self.public_key_hex = None  # Included in the scriptSig.
     # - Used when validating transaction signatures.
-    self.script_pub_key_length = None  # var_int
-    self.script_pub_key_length_int = None
-    self.script_pub_key = None
+    self._script_pub_key = None  # bytes. script_pub_key_length is its var_int length.
     # - The "scriptPubKey of relevant unspent output from previous transaction" (~= the address from which this input originates) is included in the signable form of a transaction, when signing that transaction with that particular input.
     # Properties that go into the signed transaction:
     # - Note: script_length_int doesn't go in, it's just helpful.
@@ -78,9 +97,9 @@ class TransactionInput:
     self.script_sig = None
     # Other properties:
     self.address = None
-    self.txid = None  # little-endian form of previous_output_hash
-    self.satoshi_amount = None  # int
-    self.bitcoin_amount = None  # string
+    self.satoshi_amount = None  # int. bitcoin_amount is its string form.
+    # True if the properties have been checked (see validation.py).
+    self.validated = False
 
 
   def __str__(self):
@@ -95,37 +114,106 @@ class TransactionInput:
     return s
 
 
+  @property
+  def previous_output_hash(self):
+    if self._previous_output_hash is None:
+      return None
+    return self._previous_output_hash.hex()
+
+
+  @previous_output_hash.setter
+  def previous_output_hash(self, value):
+    self._previous_output_hash = None if value is None else bytes.fromhex(value)
+
+
+  @property
+  def txid(self):
+    # little-endian form of previous_output_hash
+    if self._previous_output_hash is None:
+      return None
+    return self._previous_output_hash[::-1].hex()
+
+
+  @txid.setter
+  def txid(self, value):
+    self._previous_output_hash = None if value is None else bytes.fromhex(value)[::-1]
+
+
+  @property
+  def previous_output_index(self):
+    # 4 bytes (little-endian)
+    if self.previous_output_index_int is None:
+      return None
+    return self.previous_output_index_int.to_bytes(4, 'little').hex()
+
+
+  @previous_output_index.setter
+  def previous_output_index(self, value):
+    self.previous_output_index_int = None if value is None else int.from_bytes(bytes.fromhex(value), 'little')
+
+
+  @property
+  def script_pub_key(self):
+    if self._script_pub_key is None:
+      return None
+    return self._script_pub_key.hex()
+
+
+  @script_pub_key.setter
+  def script_pub_key(self, value):
+    self._script_pub_key = None if value is None else bytes.fromhex(value)
+
+
+  @property
+  def script_pub_key_length(self):
+    # var_int
+    if self._script_pub_key is None:
+      return None
+    return basic.int_to_var_int(len(self._script_pub_key))
+
+
+  @property
+  def script_pub_key_length_int(self):
+    if self._script_pub_key is None:
+      return None
+    return len(self._script_pub_key)
+
+
+  @property
+  def bitcoin_amount(self):
+    # string. We use this for logging.
+    if self.satoshi_amount is None:
+      return None
+    return basic.satoshi_to_bitcoin(self.satoshi_amount)
+
+
   # This method constructs the basic Input instance from the information that is publically available on the Bitcoin blockchain.
   # Later, when a transaction is signed using this input, the private key will be supplied, and various information will be generated from it.
   # The address will be generated from the private key, and the address supplied here will be compared with it, in order to match the correct private key to this input.
 
 
   @classmethod
-  def create(cls, address, txid, previous_output_index_int, satoshi_amount):
-    basic.validate_bitcoin_address(address)
-    v.validate_hex_length(txid, 32)
-    previous_output_hash = basic.reverse_hex_order(txid)
-    # previous_output_index is an integer. Convert it to 4 hex bytes (little endian).
-    v.validate_integer(previous_output_index_int)
-    previous_output_index = basic.int_to_hex_le(previous_output_index_int)
-    previous_output_index = basic.pad_hex_le(previous_output_index, n_bytes=4)
+  def create(cls, address, txid, previous_output_index_int, satoshi_amount, validation_level=None):
+    # The 'trusted' level skips the checks on the arguments, e.g. when they have already been validated by the caller.
+    level = validation.resolve_level(validation_level)
+    if level != 'trusted':
+      basic.validate_bitcoin_address(address)
+      v.validate_hex_length(txid, 32)
+      v.validate_integer(previous_output_index_int)
+      basic.validate_satoshi_amount(satoshi_amount)
+    # previous_output_index is stored as an integer. Check that it fits into 4 bytes (little endian).
+    v.validate_integer_domain(previous_output_index_int, 0, 0xffffffff)
     # Derive scriptPubKey from the address. This is used during the signing process.
     script_pub_key, script_pub_key_length = basic.address_to_script_pub_key(address)
-    script_pub_key_length_int = basic.var_int_to_int(script_pub_key_length)
-    # Calculate bitcoin amount from satoshi amount. We use this for logging.
-    bitcoin_amount = basic.satoshi_to_bitcoin(satoshi_amount)
     # Create the instance and save the instance variables.
     ti = TransactionInput()
-    ti.previous_output_hash = previous_output_hash
-    ti.previous_output_index = previous_output_index
+    ti.txid = txid
     ti.previous_output_index_int = previous_output_index_int
-    ti.script_pub_key_length = script_pub_key_length
     ti.script_pub_key = script_pub_key
-    ti.script_pub_key_length_int = script_pub_key_length_int
-    ti.address = address
-    ti.txid = txid
+    # Many inputs in a pool can share an address, so store a single copy of each address string.
+    ti.address = sys.intern(address)
     ti.satoshi_amount = satoshi_amount
-    ti.bitcoin_amount = bitcoin_amount
+    ti.validated = True
     return ti
 
 
@@ -142,24 +230,18 @@ class TransactionInput:
     v.validate_hex(script_sig)
     script_length_int = basic.var_int_to_int(script_length)
     script_pub_key, script_pub_key_length = basic.public_key_hex_to_script_pub_key(public_key_hex)
-    script_pub_key_length_int = basic.var_int_to_int(script_pub_key_length)
     address = basic.script_pub_key_to_address(script_pub_key)
-    previous_output_index_int = basic.hex_le_to_int(previous_output_index)
-    txid = basic.reverse_hex_order(previous_output_hash)
     # Create the instance and save the instance variables.
     ti = TransactionInput()
     ti.previous_output_hash = previous_output_hash
     ti.previous_output_index = previous_output_index
-    ti.previous_output_index_int = previous_output_index_int
     ti.public_key_hex = public_key_hex
-    ti.script_pub_key_length = script_pub_key_length
-    ti.script_pub_key_length_int = script_pub_key_length_int
     ti.script_pub_key = script_pub_key
     ti.script_length = script_length
     ti.script_length_int = script_length_int
     ti.script_sig = script_sig
     ti.address = address
-    ti.txid = txid
+    ti.validated = True
     return ti
 
 
@@ -192,8 +274,10 @@ class TransactionInput:
 
 
   @classmethod
-  def from_dict(cls, d):
+  def from_dict(cls, d, validation_level=None):
     # Note: This is used to load (and validate) both unsigned and signed inputs.
+    # Note: With the 'trusted' validation level, only the keys are checked.
+    # Note: The derived values (e.g. txid, bitcoin_amount) aren't stored. They are calculated from the core values (e.g. previous_output_hash, satoshi_amount), which they must match (see validate_dict).
     expected = '''
 previous_output_hash previous_output_index previous_output_index_int
 script_length script_length_int script_sig sequence
@@ -203,6 +287,25 @@ address txid satoshi_amount bitcoin_amount
     expected = expected.replace('\n', ' ').split()
     received = list(d.keys())
     v.validate_list_contains_items(received, expected)
+    level = validation.resolve_level(validation_level)
+    if level != 'trusted':
+      cls.validate_dict(d, strict=(level == 'strict'))
+    # Create the instance and save the instance variables.
+    ti = TransactionInput()
+    ti.previous_output_hash = d['previous_output_hash']
+    ti.previous_output_index_int = d['previous_output_index_int']
+    ti.script_length = d['script_length']
+    ti.script_length_int = d['script_length_int']
+    ti.script_sig = d['script_sig']
+    ti.script_pub_key = d['script_pub_key']
+    ti.address = d['address']
+    ti.satoshi_amount = d['satoshi_amount']
+    ti.validated = level != 'trusted'
+    return ti
+
+
+  @classmethod
+  def validate_dict(cls, d, strict=False):
     v.validate_hex_length(d['previous_output_hash'], 32)
     v.validate_hex(d['previous_output_index'])
     v.validate_integer(d['previous_output_index_int'])
@@ -238,22 +341,19 @@ address txid satoshi_amount bitcoin_amount
     basic.validate_positive_bitcoin_amount(d['bitcoin_amount'])
     bitcoin_amount = basic.satoshi_to_bitcoin(d['satoshi_amount'])
     assert bitcoin_amount == d['bitcoin_amount']
-    # Create the instance and save the instance variables.
-    ti = TransactionInput()
-    ti.previous_output_hash = d['previous_output_hash']
-    ti.previous_output_index = d['previous_output_index']
-    ti.previous_output_index_int = d['previous_output_index_int']
-    ti.script_length = d['script_length']
-    ti.script_length_int = d['script_length_int']
-    ti.script_sig = d['script_sig']
-    ti.script_pub_key_length = d['script_pub_key_length']
-    ti.script_pub_key_length_int = d['script_pub_key_length_int']
-    ti.script_pub_key = d['script_pub_key']
-    ti.address = d['address']
-    ti.txid = d['txid']
-    ti.satoshi_amount = d['satoshi_amount']
-    ti.bitcoin_amount = d['bitcoin_amount']
-    return ti
+    if not strict:
+      return
+    # Strict cross-checks: the scriptPubKey and the public key must match the address.
+    if d['script_pub_key'] is not None:
+      script_pub_key, script_pub_key_length = basic.address_to_script_pub_key(d['address'])
+      if (script_pub_key, script_pub_key_length) != (d['script_pub_key'], d['script_pub_key_length']):
+        msg = "scriptPubKey ({}) doesn't match address ({}).".format(d['script_pub_key'], d['address'])
+        raise ValueError(msg)
+    if d['public_key_hex'] is not None:
+      address = basic.public_key_hex_to_address(d['public_key_hex'])
+      if address != d['address']:
+        msg = "Public key (address {}) doesn't match address ({}).".format(address, d['address'])
+        raise ValueError(msg)
 
 
   def to_dict_signable_form(self):
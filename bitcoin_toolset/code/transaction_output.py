@@ -1,5 +1,6 @@
 # Imports
 import logging
+import sys
 from collections import OrderedDict
 
 
@@ -8,6 +9,7 @@ from collections import OrderedDict
 # Relative imports
 from .. import util
 from . import basic
+from . import validation
 
 
 
@@ -51,16 +53,27 @@ def setup(
 class TransactionOutput:
 
 
+  # Notes:
+  # - The instances use __slots__ (see TransactionInput).
+  # - The core fields are script_pub_key (bytes) and satoshi_amount (int). value, script_length, script_length_int, bitcoin_amount, and the hex form of script_pub_key are properties, which are calculated when they are read.
+  __slots__ = [
+    '_script_pub_key',
+    'address',
+    'satoshi_amount',
+    'validated',
+  ]
+
+
   def __init__(self):
     # Properties that go into the raw transaction:
-    self.value = None  # 8 bytes (little-endian)
-    self.script_length = None  # var_int
-    self.script_length_int = None
-    self.script_pub_key = None  # hex bytes
+    # - value: 8 bytes (little-endian), calculated from satoshi_amount.
+    # - script_length: var_int, calculated from script_pub_key.
+    self._script_pub_key = None  # bytes
     # Other properties:
     self.address = None  # string
-    self.bitcoin_amount = None  # string
     self.satoshi_amount = None  # int
+    # True if the properties have been checked (see validation.py).
+    self.validated = False
 
 
   def __str__(self):
@@ -72,23 +85,60 @@ class TransactionOutput:
     return s
 
 
+  @property
+  def value(self):
+    if self.satoshi_amount is None:
+      return None
+    return self.satoshi_amount.to_bytes(8, 'little').hex()
+
+
+  @property
+  def script_pub_key(self):
+    # hex bytes
+    if self._script_pub_key is None:
+      return None
+    return self._script_pub_key.hex()
+
+
+  @script_pub_key.setter
+  def script_pub_key(self, value):
+    self._script_pub_key = None if value is None else bytes.fromhex(value)
+
+
+  @property
+  def script_length(self):
+    # var_int
+    if self._script_pub_key is None:
+      return None
+    return basic.int_to_var_int(len(self._script_pub_key))
+
+
+  @property
+  def script_length_int(self):
+    if self._script_pub_key is None:
+      return None
+    return len(self._script_pub_key)
+
+
+  @property
+  def bitcoin_amount(self):
+    # string. We use this for logging.
+    if self.satoshi_amount is None:
+      return None
+    return basic.satoshi_to_bitcoin(self.satoshi_amount)
+
+
   @classmethod
   def create(cls, address, satoshi_amount):
-    value = basic.int_to_hex_le(satoshi_amount)
-    value = basic.pad_hex_le(value, n_bytes=8)
+    # value (8 bytes) is calculated from satoshi_amount. The maximum supply is well within 8 bytes.
+    basic.validate_satoshi_amount(satoshi_amount)
     script_pub_key, script_length = basic.address_to_script_pub_key(address)
-    script_length_int = basic.var_int_to_int(script_length)
-    # Calculate bitcoin amount from satoshi amount. We use this for logging.
-    bitcoin_amount = basic.satoshi_to_bitcoin(satoshi_amount)
     # Create the instance and save the instance variables.
     to = TransactionOutput()
-    to.value = value
     to.script_pub_key = script_pub_key
-    to.script_length = script_length
-    to.script_length_int = script_length_int
-    to.address = address
-    to.bitcoin_amount = bitcoin_amount
+    to.address = sys.intern(address)
     to.satoshi_amount = satoshi_amount
+    to.validated = True
     return to
 
 
@@ -96,19 +146,18 @@ class TransactionOutput:
   def create_from_signed_tx_data(cls, value, script_length, script_pub_key):
     # This creation method accepts the data available in a signed tx.
     # It allows us to call tx.verify()
-    script_length_int = basic.var_int_to_int(script_length)
+    if basic.var_int_to_int(script_length) != basic.hex_len(script_pub_key):
+      msg = "Script length value ({}) != byte length of script_pub_key ({}).".format(script_length, basic.hex_len(script_pub_key))
+      raise ValueError(msg)
     address = basic.script_pub_key_to_address(script_pub_key)
     satoshi_amount = basic.hex_le_to_int(value)
-    bitcoin_amount = basic.satoshi_to_bitcoin(satoshi_amount)
+    basic.validate_satoshi_amount(satoshi_amount)
     # Create the instance and save the instance variables.
     to = TransactionOutput()
-    to.value = value
     to.script_pub_key = script_pub_key
-    to.script_length = script_length
-    to.script_length_int = script_length_int
     to.address = address
     to.satoshi_amount = satoshi_amount
-    to.bitcoin_amount = bitcoin_amount
+    to.validated = True
     return to
 
 
@@ -127,7 +176,9 @@ class TransactionOutput:
 
 
   @classmethod
-  def from_dict(cls, d):
+  def from_dict(cls, d, validation_level=None):
+    # Note: With the 'trusted' validation level, only the keys are checked.
+    # Note: The derived values (value, script_length, bitcoin_amount) aren't stored. They are calculated from the core values, which they must match (see validate_dict).
     expected = '''
 value script_length script_length_int script_pub_key
 address satoshi_amount bitcoin_amount
@@ -135,6 +186,23 @@ address satoshi_amount bitcoin_amount
     expected = expected.replace('\n', ' ').split()
     received = list(d.keys())
     v.validate_list_contains_items(received, expected)
+    level = validation.resolve_level(validation_level)
+    if level != 'trusted':
+      cls.validate_dict(d, strict=(level == 'strict'))
+    # Create the instance and save the instance variables.
+    to = TransactionOutput()
+    to.script_pub_key = d['script_pub_key']
+    to.address = d['address']
+    to.satoshi_amount = d['satoshi_amount']
+    to.validated = level != 'trusted'
+    return to
+
+
+  @classmethod
+  def validate_dict(cls, d, strict=False):
+    if strict:
+      v.validate_hex_length(d['value'], 8)
+      v.validate_positive_integer(d['satoshi_amount'])
     v.validate_hex(d['value'])
     v.validate_hex(d['script_length'])
     v.validate_int(d['script_length_int'])
@@ -152,25 +220,12 @@ address satoshi_amount bitcoin_amount
     script_pub_key, script_length = basic.public_key_hash_hex_to_script_pub_key(hash_hex)
     assert script_pub_key == d['script_pub_key']
     assert script_length == d['script_length']
-    # Create the instance and save the instance variables.
-    to = TransactionOutput()
-    to.value = d['value']
-    to.script_pub_key = d['script_pub_key']
-    to.script_length = d['script_length']
-    to.script_length_int = d['script_length_int']
-    to.address = d['address']
-    to.bitcoin_amount = d['bitcoin_amount']
-    to.satoshi_amount = d['satoshi_amount']
-    return to
 
 
   def set_satoshi_amount(self, satoshi_amount):
     v.validate_positive_integer(satoshi_amount)
-    value = basic.int_to_hex_le(satoshi_amount)
-    value = basic.pad_hex_le(value, n_bytes=8)
-    self.value = value
+    basic.validate_satoshi_amount(satoshi_amount)
     self.satoshi_amount = satoshi_amount
-    self.bitcoin_amount = basic.satoshi_to_bitcoin(satoshi_amount)
 
 
   def to_dict_signable_form(self):
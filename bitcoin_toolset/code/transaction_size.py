@@ -0,0 +1,140 @@
+# Imports
+import logging
+import math
+
+
+
+
+# Relative imports
+from .. import util
+from . import basic
+
+
+
+
+# Shortcuts
+v = util.validate
+
+
+
+
+# Set up logger for this module. By default, it produces no output.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.ERROR)
+log = logger.info
+deb = logger.debug
+
+
+
+
+def setup(
+    log_level = 'error',
+    debug = False,
+    log_timestamp = False,
+    log_file = None,
+    ):
+  # Configure logger for this module.
+  util.module_logger.configure_module_logger(
+    logger = logger,
+    logger_name = __name__,
+    log_level = log_level,
+    debug = debug,
+    log_timestamp = log_timestamp,
+    log_file = log_file,
+  )
+  deb('Setup complete.')
+
+
+
+
+# Notes:
+# - This module calculates the size of a signed transaction from its structure (number of inputs and outputs, public key type), without creating any signatures.
+# - Unlike basic.estimate_transaction_size, which assumes a 138-byte scriptSig, the sizes here are upper bounds that every signature produced by this package fits within. A fee calculated from them always meets the requested fee rate.
+# - A P2PKH scriptSig contains:
+# -- PUSHDATA (1 byte) + DER-encoded signature + hash type (1 byte).
+# -- PUSHDATA (1 byte) + public key (65 bytes uncompressed: 04 + X + Y, or 33 bytes compressed).
+# - A DER-encoded ECDSA signature: 30 [length] 02 [r length] [r] 02 [s length] [s]. r and s are big-endian integers with leading zero bytes removed. A 0x00 byte is prepended if the high bit of the first byte is set (so that the integer isn't negative).
+# -- r is a 256-bit integer, so it takes at most 33 bytes.
+# -- This package only creates low-s signatures (s <= N/2), so the high bit of s is never set, and s takes at most 32 bytes.
+# -- So a signature is at most 6 + 33 + 32 = 71 bytes. r is 33 bytes about half the time, so the usual size is 70 or 71 bytes, and r or s is shorter than 32 bytes only rarely.
+# - The var_int widths (script lengths, input and output counts) are calculated exactly.
+
+
+
+
+der_header_length = 6  # 30 [length] 02 [r length] ... 02 [s length] ...
+max_r_length = 33
+max_s_length = 32  # Low-s signatures.
+max_der_signature_length = der_header_length + max_r_length + max_s_length
+hash_type_length = 1
+public_key_lengths = {
+  'uncompressed': 65,
+  'compressed': 33,
+}
+p2pkh_script_pub_key_length = 25
+# version (4 bytes) + block_lock_time (4 bytes)
+transaction_fixed_length = 4 + 4
+# previous_output_hash (32 bytes) + previous_output_index (4 bytes) + sequence (4 bytes)
+input_fixed_length = 32 + 4 + 4
+# value (8 bytes)
+output_fixed_length = 8
+
+
+
+
+def push_size(n):
+  # The size of the opcode(s) that push n bytes onto the stack, plus the data.
+  # - 1-75 bytes: a single opcode byte.
+  if not 1 <= n <= 75:
+    msg = "Pushes of {} bytes are not supported here.".format(n)
+    raise ValueError(msg)
+  return 1 + n
+
+
+
+
+def script_sig_size(public_key_type='uncompressed', signature_length=max_der_signature_length):
+  if public_key_type not in public_key_lengths:
+    msg = "Unrecognised public key type: {}. Available types: {}".format(public_key_type, sorted(public_key_lengths.keys()))
+    raise ValueError(msg)
+  v.validate_positive_integer(signature_length)
+  return push_size(signature_length + hash_type_length) + push_size(public_key_lengths[public_key_type])
+
+
+
+
+def input_size(public_key_type='uncompressed', signature_length=max_der_signature_length):
+  # The size of a signed P2PKH input.
+  n = script_sig_size(public_key_type, signature_length)
+  return input_fixed_length + basic.var_int_size(n) + n
+
+
+
+
+def output_size(script_pub_key_length=p2pkh_script_pub_key_length):
+  return output_fixed_length + basic.var_int_size(script_pub_key_length) + script_pub_key_length
+
+
+
+
+def signed_transaction_size(n_inputs, n_outputs, public_key_type='uncompressed'):
+  # The maximum size (in bytes) of a signed transaction with n_inputs P2PKH inputs and n_outputs P2PKH outputs.
+  # It has the same signature as basic.estimate_transaction_size, so it can be used in its place.
+  v.validate_whole_number(n_inputs)
+  v.validate_whole_number(n_outputs)
+  size = (
+    transaction_fixed_length
+    + basic.var_int_size(n_inputs)
+    + n_inputs * input_size(public_key_type)
+    + basic.var_int_size(n_outputs)
+    + n_outputs * output_size()
+  )
+  return size
+
+
+
+
+def calculate_fee(size, fee_rate):
+  # fee_rate: satoshi/byte. Round up to the nearest satoshi.
+  return int(math.ceil(size * fee_rate))
@@ -0,0 +1,239 @@
+# Imports
+import logging
+from collections import OrderedDict
+
+
+
+
+# Relative imports
+from .. import util
+from . import parallel
+from . import serialization
+from . import transaction
+
+
+
+
+# Shortcuts
+v = util.validate
+
+
+
+
+# Set up logger for this module. By default, it produces no output.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.ERROR)
+log = logger.info
+deb = logger.debug
+
+
+
+
+def setup(
+    log_level = 'error',
+    debug = False,
+    log_timestamp = False,
+    log_file = None,
+    ):
+  # Configure logger for this module.
+  util.module_logger.configure_module_logger(
+    logger = logger,
+    logger_name = __name__,
+    log_level = log_level,
+    debug = debug,
+    log_timestamp = log_timestamp,
+    log_file = log_file,
+  )
+  deb('Setup complete.')
+
+
+
+
+# Notes:
+# - This module decodes and verifies a stream of signed transactions, e.g. a batch of signer output that is about to be broadcast.
+# - Accepted stream formats (detected from the first non-whitespace byte):
+# -- Newline-delimited hex: one signed transaction per line. Blank lines are ignored. Each line must be valid hex (an even number of hex digits). A line that isn't produces an error result that says so, rather than being parsed as raw bytes.
+# -- Raw: signed transactions in binary form, concatenated together.
+# - The stream must be a binary file object (e.g. open(path, 'rb') or sys.stdin.buffer). It is read incrementally, so memory use is bounded by the number of transactions in flight, not by the size of the stream.
+# - Each transaction is decoded and verified separately (see decode_and_verify). This can be spread across worker processes. Results are yielded as soon as they are complete, so they may not be in stream order. Each result includes the index of the transaction in the stream.
+# - A transaction that can't be decoded produces a result with an error message, and the stream continues with the next line. In a raw stream, the transaction boundaries are lost after a decoding error, so the stream stops there.
+
+
+
+
+hex_characters = set(b'0123456789abcdefABCDEF')
+raw_read_size = 64 * 1024
+
+
+
+
+def detect_stream_format(stream):
+  # Returns (stream_format, initial_bytes). The initial bytes have already been read from the stream and must be processed first.
+  # - stream_format is 'hex', 'raw', or None (if the stream is empty).
+  initial = b''
+  while True:
+    chunk = stream.read(raw_read_size)
+    if not chunk:
+      return None, initial
+    initial += chunk
+    stripped = initial.lstrip()
+    if stripped:
+      stream_format = 'hex' if stripped[0] in hex_characters else 'raw'
+      return stream_format, initial
+
+
+
+
+def iterate_hex_lines(stream, initial=b''):
+  # Yields (index, data) for each non-blank line.
+  index = 0
+  for line in iterate_lines(stream, initial):
+    line = line.strip()
+    if not line:
+      continue
+    yield index, line
+    index += 1
+
+
+
+
+def iterate_lines(stream, initial=b''):
+  # The initial bytes may end partway through a line. The rest of that line is the first line read from the stream.
+  lines = initial.split(b'\n')
+  partial = lines.pop()
+  for line in lines:
+    yield line
+  for line in stream:
+    if partial:
+      line = partial + line
+      partial = b''
+    yield line
+  if partial:
+    yield partial
+
+
+
+
+def iterate_raw_transactions(stream, initial=b''):
+  # Yields (index, data) for each transaction in a stream of concatenated raw transactions.
+  # - The boundaries are found with serialization.read_transaction_signed. If the data ends partway through a transaction, more data is read from the stream.
+  # - The byte offsets in error messages from the parser are relative to the start of the transaction.
+  index = 0
+  buffer = initial.lstrip()
+  start = 0  # The position in the buffer of the next transaction.
+  stream_offset = len(initial) - len(buffer)  # The position in the stream of the next transaction.
+  while True:
+    if start == len(buffer):
+      buffer = stream.read(raw_read_size)
+      start = 0
+      if not buffer:
+        return
+    cursor = serialization.Cursor(memoryview(buffer)[start:])
+    try:
+      serialization.read_transaction_signed(cursor)
+    except serialization.IncompleteDataError as e:
+      chunk = stream.read(raw_read_size)
+      if chunk:
+        # Keep only the unread part of the buffer.
+        buffer = buffer[start:] + chunk
+        start = 0
+        continue
+      error = e
+    except ValueError as e:
+      error = e
+    else:
+      error = None
+    if error is not None:
+      # The transaction boundaries can't be found beyond this point. Pass on the remaining data, so that decode_and_verify reports the error for this transaction, and stop.
+      msg = "Transaction {} at stream offset {} is invalid or incomplete. The rest of the stream will not be read. {}".format(index, stream_offset, error)
+      logger.error(msg)
+      yield index, buffer[start:]
+      return
+    size = cursor.offset
+    yield index, buffer[start:start + size]
+    index += 1
+    start += size
+    stream_offset += size
+
+
+
+
+def iterate_transactions(stream):
+  # Returns (stream_format, items). items yields (index, data) for each transaction in the stream. data is either hex (as ASCII bytes) or raw bytes, depending on the stream format.
+  stream_format, initial = detect_stream_format(stream)
+  msg = "Stream format: {}".format(stream_format)
+  log(msg)
+  if stream_format is None:
+    return stream_format, iter([])
+  if stream_format == 'hex':
+    return stream_format, iterate_hex_lines(stream, initial)
+  return stream_format, iterate_raw_transactions(stream, initial)
+
+
+
+
+def hex_line_to_bytes(line):
+  # line: a line from a hex stream (ASCII bytes, without surrounding whitespace).
+  if not serialization.hex_bytes_pattern.fullmatch(line):
+    msg = "Invalid hex: the line contains characters that aren't hex digits."
+    raise ValueError(msg)
+  if len(line) % 2 != 0:
+    msg = "Invalid hex: the line contains an odd number of hex digits ({}).".format(len(line))
+    raise ValueError(msg)
+  return bytes.fromhex(line.decode('ascii'))
+
+
+
+
+def decode_and_verify(job):
+  # A job is a tuple: (index, data, fail_fast, stream_format).
+  # - This function is defined at module level so that it can be sent to worker processes (see parallel.imap_jobs_unordered).
+  index, data, fail_fast, stream_format = job
+  result = OrderedDict()
+  result['index'] = index
+  try:
+    if stream_format == 'hex':
+      data = hex_line_to_bytes(data)
+    tx = transaction.Transaction.from_bytes_signed(data)
+  except ValueError as e:
+    result['valid'] = False
+    result['error'] = str(e)
+    return result
+  results = tx.verify_inputs(fail_fast=fail_fast)
+  invalid_inputs = [x['input_index'] for x in results if x['valid'] is False]
+  result['valid'] = not invalid_inputs
+  result['txid'] = tx.calculate_txid()
+  result['size_bytes'] = len(tx.to_bytes_signed_form())
+  result['n_inputs'] = len(tx.inputs)
+  result['n_outputs'] = len(tx.outputs)
+  result['invalid_inputs'] = invalid_inputs
+  return result
+
+
+
+
+def decode_and_verify_stream(stream, workers=None, executor=None, fail_fast=False, max_in_flight=None):
+  # Generator. Yields one result (an OrderedDict) per transaction in the stream, as soon as it is complete.
+  # Each result contains:
+  # - index: the position of the transaction in the stream (starting at 0).
+  # - valid: True if the transaction was decoded and all of its signatures are valid.
+  # - If it was decoded: txid, size_bytes, n_inputs, n_outputs, invalid_inputs (a list of input indices).
+  # - If it couldn't be decoded: error.
+  stream_format, items = iterate_transactions(stream)
+  jobs = ((index, bytes(data), fail_fast, stream_format) for index, data in items)
+  n = 0
+  n_valid = 0
+  for result in parallel.imap_jobs_unordered(decode_and_verify, jobs, workers, executor, max_in_flight):
+    n += 1
+    if result['valid']:
+      n_valid += 1
+    else:
+      msg = "Transaction {} is invalid.".format(result['index'])
+      logger.error(msg)
+    yield result
+  msg = "Stream processed: {} transactions, {} valid, {} invalid.".format(n, n_valid, n - n_valid)
+  log(msg)
+
+
+
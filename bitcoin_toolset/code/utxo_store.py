@@ -0,0 +1,312 @@
+# Imports
+import logging
+import sqlite3
+from collections import OrderedDict
+
+
+
+
+# Relative imports
+from .. import util
+from . import basic
+from . import coin_selection
+from . import transaction_size
+
+
+
+
+# Shortcuts
+v = util.validate
+
+
+
+
+# Set up logger for this module. By default, it produces no output.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.ERROR)
+log = logger.info
+deb = logger.debug
+
+
+
+
+def setup(
+    log_level = 'error',
+    debug = False,
+    log_timestamp = False,
+    log_file = None,
+    ):
+  # Configure logger for this module.
+  util.module_logger.configure_module_logger(
+    logger = logger,
+    logger_name = __name__,
+    log_level = log_level,
+    debug = debug,
+    log_timestamp = log_timestamp,
+    log_file = log_file,
+  )
+  deb('Setup complete.')
+
+
+
+
+# Notes:
+# - This module stores a pool of available inputs (UTXOs) in a local SQLite database, so that a large pool doesn't have to be parsed and validated again for every new transaction.
+# - Each input is validated once, when it is added to the store.
+# - Each input is identified by (transaction_id, previous_output_index). Amounts are stored in satoshi, and are indexed, as are addresses.
+# - Inputs are returned in the same form as the entries in an inputs JSON file (address, transaction_id, previous_output_index, bitcoin_amount), so they can be passed directly to create_transaction.
+# - get_candidates() returns a small set of inputs for a new transaction, chosen with the same strategies as create_transaction. Only the amounts are read for the whole pool; full rows are read only for the chosen inputs.
+# - The store is not updated when a transaction is created, as the transaction might not be broadcast. Use spend_inputs() or spend_transaction() once it has been.
+
+
+
+
+schema = '''
+CREATE TABLE IF NOT EXISTS utxos (
+  transaction_id TEXT NOT NULL,
+  previous_output_index INTEGER NOT NULL,
+  address TEXT NOT NULL,
+  satoshi_amount INTEGER NOT NULL,
+  PRIMARY KEY (transaction_id, previous_output_index)
+);
+CREATE INDEX IF NOT EXISTS utxos_address ON utxos (address);
+CREATE INDEX IF NOT EXISTS utxos_satoshi_amount ON utxos (satoshi_amount);
+'''
+
+columns = 'address, transaction_id, previous_output_index, satoshi_amount'
+
+
+
+
+def row_to_input(row):
+  address, txid, index, satoshi_amount = row
+  x = OrderedDict()
+  x['address'] = address
+  x['transaction_id'] = txid
+  x['previous_output_index'] = index
+  x['bitcoin_amount'] = basic.satoshi_to_bitcoin(satoshi_amount)
+  return x
+
+
+
+
+def validate_input(input_):
+  # Same checks as create_transaction.validate_inputs, for a single input.
+  expected = 'address transaction_id previous_output_index bitcoin_amount'.split()
+  received = list(input_.keys())
+  v.validate_lists_are_identical(received, expected)
+  basic.validate_bitcoin_address(input_['address'])
+  v.validate_hex_length(input_['transaction_id'], 32)
+  v.validate_whole_number(int(input_['previous_output_index']))
+  basic.validate_positive_bitcoin_amount(input_['bitcoin_amount'])
+
+
+
+
+class UTXOStore:
+
+
+  def __init__(self, path):
+    # path: a file path, or ':memory:' for a temporary in-memory store.
+    v.validate_string(path)
+    self.path = path
+    self.connection = sqlite3.connect(path)
+    self.connection.executescript(schema)
+    self.connection.commit()
+    msg = "UTXO store opened: {} ({} inputs)".format(path, self.count())
+    log(msg)
+
+
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.close()
+
+
+  def close(self):
+    if self.connection is not None:
+      self.connection.close()
+      self.connection = None
+
+
+  @classmethod
+  def build(cls, path, inputs):
+    # Create (or replace the contents of) a store from a list of inputs.
+    store = cls(path)
+    with store.connection:
+      store.connection.execute('DELETE FROM utxos')
+    store.add_inputs(inputs)
+    return store
+
+
+  def add_inputs(self, inputs):
+    # Validate and add inputs. Nothing is added if any of them is invalid or already present.
+    # Returns the number of inputs added.
+    rows = []
+    for input_ in inputs:
+      validate_input(input_)
+      rows.append((
+        input_['transaction_id'],
+        int(input_['previous_output_index']),
+        input_['address'],
+        basic.bitcoin_to_satoshi(input_['bitcoin_amount']),
+      ))
+    try:
+      with self.connection:
+        self.connection.executemany('INSERT INTO utxos (transaction_id, previous_output_index, address, satoshi_amount) VALUES (?, ?, ?, ?)', rows)
+    except sqlite3.IntegrityError as e:
+      msg = "Can't add inputs to UTXO store: at least one input is already present. ({})".format(e)
+      raise ValueError(msg)
+    msg = "{} inputs added to UTXO store.".format(len(rows))
+    log(msg)
+    return len(rows)
+
+
+  def spend_inputs(self, keys):
+    # Remove spent inputs. keys: a list of (transaction_id, previous_output_index) pairs.
+    # Nothing is removed if any of the inputs is not in the store.
+    keys = [(txid, int(index)) for txid, index in keys]
+    with self.connection:
+      for txid, index in keys:
+        cursor = self.connection.execute('DELETE FROM utxos WHERE transaction_id = ? AND previous_output_index = ?', (txid, index))
+        if cursor.rowcount != 1:
+          msg = "Input not found in UTXO store: transaction_id = {}, previous_output_index = {}".format(txid, index)
+          raise ValueError(msg)
+    msg = "{} inputs spent from UTXO store.".format(len(keys))
+    log(msg)
+    return len(keys)
+
+
+  def spend_transaction(self, tx):
+    # Remove the inputs spent by a transaction.
+    keys = [(x.txid, x.previous_output_index_int) for x in tx.inputs]
+    return self.spend_inputs(keys)
+
+
+  def count(self):
+    return self.connection.execute('SELECT COUNT(*) FROM utxos').fetchone()[0]
+
+
+  def total_value(self):
+    # Total value of all inputs (satoshi).
+    return self.connection.execute('SELECT COALESCE(SUM(satoshi_amount), 0) FROM utxos').fetchone()[0]
+
+
+  def get_input(self, txid, index):
+    row = self.connection.execute('SELECT {} FROM utxos WHERE transaction_id = ? AND previous_output_index = ?'.format(columns), (txid, int(index))).fetchone()
+    if row is None:
+      return None
+    return row_to_input(row)
+
+
+  def get_inputs(self, descending=True):
+    order = 'DESC' if descending else 'ASC'
+    sql = 'SELECT {} FROM utxos ORDER BY satoshi_amount {}, rowid'.format(columns, order)
+    return [row_to_input(row) for row in self.connection.execute(sql)]
+
+
+  def get_inputs_by_address(self, address):
+    sql = 'SELECT {} FROM utxos WHERE address = ? ORDER BY satoshi_amount DESC, rowid'.format(columns)
+    return [row_to_input(row) for row in self.connection.execute(sql, (address,))]
+
+
+  def get_inputs_by_amount(self, min_satoshi=None, max_satoshi=None, limit=None):
+    # Inputs whose values lie within [min_satoshi, max_satoshi], largest first. Either limit can be None.
+    conditions = []
+    parameters = []
+    if min_satoshi is not None:
+      v.validate_whole_number(min_satoshi)
+      conditions.append('satoshi_amount >= ?')
+      parameters.append(min_satoshi)
+    if max_satoshi is not None:
+      v.validate_whole_number(max_satoshi)
+      conditions.append('satoshi_amount <= ?')
+      parameters.append(max_satoshi)
+    sql = 'SELECT {} FROM utxos'.format(columns)
+    if conditions:
+      sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY satoshi_amount DESC, rowid'
+    if limit is not None:
+      v.validate_positive_integer(limit)
+      sql += ' LIMIT ?'
+      parameters.append(limit)
+    return [row_to_input(row) for row in self.connection.execute(sql, parameters)]
+
+
+  def get_inputs_by_rowid(self, rowids):
+    # Returns the inputs in the same order as rowids.
+    rows = {}
+    # Stay well below SQLite's limit on the number of query parameters.
+    batch_size = 500
+    for i in range(0, len(rowids), batch_size):
+      batch = rowids[i:i + batch_size]
+      sql = 'SELECT rowid, {} FROM utxos WHERE rowid IN ({})'.format(columns, ', '.join('?' * len(batch)))
+      for row in self.connection.execute(sql, batch):
+        rows[row[0]] = row[1:]
+    return [row_to_input(rows[x]) for x in rowids]
+
+
+  def get_candidates(self, approach, target, max_candidates=None, input_fee=0):
+    # Returns a list of inputs from which a transaction with the given input selection approach can be built.
+    # - target: the value (satoshi) that the inputs must cover, e.g. total output value + maximum fee.
+    # - Greedy approaches: the inputs that the approach would select, in order, until the target is reached. These are read with an indexed query, so the rest of the pool isn't read.
+    # - Search approaches (see coin_selection): These select inputs by their effective value (the value minus input_fee, the fee for including one input). The candidates are the inputs whose effective value is positive and smaller than the target (at most max_candidates of them, chosen across the whole range of values), plus the smallest input whose effective value covers the target on its own.
+    # If the store can't cover the target, all of its inputs are returned, so that create_transaction can report the shortfall.
+    v.validate_whole_number(target)
+    v.validate_whole_number(input_fee)
+    if max_candidates is None:
+      max_candidates = coin_selection.default_max_candidates
+    if approach in ['largest_first', 'smallest_first']:
+      order = 'DESC' if approach == 'largest_first' else 'ASC'
+      sql = 'SELECT {} FROM utxos ORDER BY satoshi_amount {}, rowid'.format(columns, order)
+      rows = []
+      total = 0
+      for row in self.connection.execute(sql):
+        rows.append(row)
+        total += row[3]
+        if total >= target:
+          break
+      candidates = [row_to_input(row) for row in rows]
+    elif coin_selection.is_search_strategy(approach):
+      # An input's effective value is below the target if its value is below target + input_fee.
+      sql = 'SELECT rowid, satoshi_amount FROM utxos WHERE satoshi_amount > ? AND satoshi_amount < ? ORDER BY satoshi_amount DESC, rowid'
+      smaller = self.connection.execute(sql, (input_fee, target + input_fee)).fetchall()
+      effective_amounts = [x[1] - input_fee for x in smaller]
+      chosen = coin_selection.choose_candidates(effective_amounts, target, list(range(len(smaller))), max_candidates)
+      rowids = [smaller[i][0] for i in chosen]
+      sql = 'SELECT rowid FROM utxos WHERE satoshi_amount >= ? ORDER BY satoshi_amount ASC, rowid LIMIT 1'
+      row = self.connection.execute(sql, (target + input_fee,)).fetchone()
+      if row is not None:
+        rowids.append(row[0])
+      candidates = self.get_inputs_by_rowid(rowids)
+    elif approach == 'all':
+      candidates = self.get_inputs()
+    else:
+      msg = "Unrecognised input_selection_approach: {}".format(approach)
+      raise NotImplementedError(msg)
+    msg = "UTXO store: {} candidate inputs for approach '{}' and target {} satoshi.".format(len(candidates), approach, target)
+    log(msg)
+    return candidates
+
+
+  def get_candidates_for_design(self, design):
+    # Returns the candidate inputs for a transaction design (see create_transaction.validate_design).
+    # The target is the total output value plus the maximum fee, so the candidates cover any fee that the design permits.
+    # With a fee rate, the input fee (for the effective values) is calculated in the same way as in create_transaction and coin_selection.select_inputs.
+    approaches = design.get('input_selection_approaches', ['largest_first'])
+    if len(approaches) != 1:
+      msg = "A UTXO store supports exactly one input selection approach, not {}.".format(approaches)
+      raise NotImplementedError(msg)
+    total_output = sum(basic.bitcoin_to_satoshi(x['bitcoin_amount']) for x in design['outputs'])
+    target = total_output + int(design['max_fee'])
+    settings = design.get('coin_selection', {})
+    fee_rate = float(design['fee_rate']) if design.get('fee_rate') is not None and not design.get('fee') else None
+    size_function = transaction_size.signed_transaction_size if design.get('fee_calculation') == 'exact' else None
+    input_fee = coin_selection.calculate_input_fee(len(design['outputs']), fee_rate, size_function)
+    return self.get_candidates(approaches[0], target, settings.get('max_candidates'), input_fee)
+
+
+
@@ -0,0 +1,105 @@
+# Imports
+import logging
+
+
+
+
+# Relative imports
+from .. import util
+
+
+
+
+# Shortcuts
+v = util.validate
+
+
+
+
+# Set up logger for this module. By default, it produces no output.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+logger.setLevel(logging.ERROR)
+log = logger.info
+deb = logger.debug
+
+
+
+
+def setup(
+    log_level = 'error',
+    debug = False,
+    log_timestamp = False,
+    log_file = None,
+    ):
+  # Configure logger for this module.
+  util.module_logger.configure_module_logger(
+    logger = logger,
+    logger_name = __name__,
+    log_level = log_level,
+    debug = debug,
+    log_timestamp = log_timestamp,
+    log_file = log_file,
+  )
+  deb('Setup complete.')
+
+
+
+
+# Notes:
+# - The validation level controls how thoroughly data is checked when transactions, inputs, and outputs are built from dicts or JSON (from_dict, from_json) or created (create, create_transaction).
+# - Levels:
+# -- 'strict': All the standard checks, plus extra cross-checks (e.g. that an input's scriptPubKey and public key match its address). Objects are always checked again, even if the package built them.
+# -- 'standard' (the default): Every value is checked once. Values that have already been checked (e.g. by create_transaction.validate_inputs) are not checked again.
+# -- 'trusted': Per-value checks are skipped. Only the structure (the expected keys) is checked. Use this only for data that this package produced itself, e.g. JSON that it wrote earlier.
+# - Objects carry a "validated" flag. It is True if the object was created by the package from checked values, or loaded with the 'standard' or 'strict' level. It is False if the object was loaded with the 'trusted' level.
+# - Functions that accept a validation_level argument use the package-wide level (see set_level) if it is None.
+
+
+
+
+levels = ['strict', 'standard', 'trusted']
+default_level = 'standard'
+level = default_level
+
+
+
+
+def set_level(name):
+  global level
+  validate_level(name)
+  level = name
+  log("Validation level set to '{}'.".format(name))
+
+
+
+
+def get_level():
+  return level
+
+
+
+
+def validate_level(name):
+  if name not in levels:
+    msg = "Unrecognised validation level: {}. Available levels: {}".format(repr(name), levels)
+    raise ValueError(msg)
+
+
+
+
+def resolve_level(validation_level=None):
+  # Returns the validation level to use: the supplied one, or the package-wide one.
+  if validation_level is None:
+    return level
+  validate_level(validation_level)
+  return validation_level
+
+
+
+
+def needs_check(x, validation_level=None):
+  # Returns True if an object (e.g. a Transaction) should be checked again, given its validated flag and the validation level.
+  if resolve_level(validation_level) == 'strict':
+    return True
+  return not getattr(x, 'validated', False)
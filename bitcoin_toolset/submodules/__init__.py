@@ -1,4 +1,5 @@
 # Imports
+import sys
 import logging
 
 
@@ -6,9 +7,31 @@ import logging
 
 # Relative imports
 from .. import util
-from . import ecdsa_python3
-from . import ripemd160_python3
-from . import sha256_python3
+
+
+
+
+# Notes:
+# - The submodules are imported when they are first used (see util/lazy_import.py).
+module_names = """
+ecdsa_python3
+ripemd160_python3
+sha256_python3
+""".split()
+lazy = util.lazy_import.LazyPackage(__name__, module_names)
+
+
+
+
+def __getattr__(name):
+  # Python 3.7+: Called when an attribute isn't found, i.e. when a submodule hasn't been imported yet.
+  return lazy.load(name)
+
+
+
+
+if sys.version_info < (3, 7):
+  lazy.load_all()
 
 
 
@@ -40,22 +63,10 @@ def setup(
   )
   deb('Setup complete.')
   # Configure modules further down in this package.
-  ecdsa_python3.setup(
+  # - Submodules that haven't been imported yet are configured when they are imported.
+  lazy.setup(
     log_level = log_level,
     debug = debug,
     log_timestamp = log_timestamp,
     log_file = log_file,
   )
-  ripemd160_python3.setup(
-    log_level = log_level,
-    debug = debug,
-    log_timestamp = log_timestamp,
-    log_file = log_file,
-  )
-  sha256_python3.setup(
-    log_level = log_level,
-    debug = debug,
-    log_timestamp = log_timestamp,
-    log_file = log_file,
-  )
-
@@ -293,3 +293,104 @@ def test_a30():
 
 
 
+
+def test_derive_addresses():
+  private_keys_hex = [
+    b'hello_world'.hex(),
+    b'the_library_of_babel'.hex(),
+    b'the_eye_of_argon'.hex(),
+    'b675ceedba0843d19934d1e0508cde736b4bb7f0a56b9585329ebcbfed559346',
+  ]
+  addresses = [
+    '19VdGCFG8QH3CmYXjMXd3UQCK2HdC3UodP',
+    '1CTumCMjzBfccCJBTkHoPQmAwEqU9Uj2sQ',
+    '12RbVkKwHcwHbMZmnSVAyR4g88ZChpQD6f',
+    '1FJdRWN7tAd8rnivBm7yojppwvDmS7F55X',
+  ]
+  for workers in [None, 2]:
+    # A small batch_size checks that the records are yielded in order across batches.
+    records = list(code.basic.derive_addresses(private_keys_hex, workers=workers, batch_size=3))
+    assert [r['address'] for r in records] == addresses
+    for private_key_hex, record in zip(private_keys_hex, records):
+      assert record['private_key_hex'] == format_private_key_hex(private_key_hex)
+      assert record['public_key_hex'] == code.basic.private_key_hex_to_public_key_hex(private_key_hex)
+      assert record['private_key_wif'] == code.basic.private_key_hex_to_wif(private_key_hex)
+
+
+
+
+def test_derive_addresses_single_executor(monkeypatch):
+  # With workers, one executor is used for all the rounds, and it is shut down at the end.
+  import concurrent.futures
+  executors = []
+
+  class Executor(concurrent.futures.ThreadPoolExecutor):
+
+    def __init__(self, max_workers):
+      super().__init__(max_workers=max_workers)
+      executors.append(self)
+
+  monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', Executor)
+  private_keys_hex = ['{:064x}'.format(i) for i in range(1, 41)]
+  # 40 keys in batches of 2, with 8 batches per round: 3 rounds.
+  records = list(code.basic.derive_addresses(private_keys_hex, workers=2, batch_size=2))
+  assert [r['private_key_hex'] for r in records] == private_keys_hex
+  assert len(executors) == 1
+  with pytest.raises(RuntimeError):
+    executors[0].submit(len, 'abc')
+
+
+
+
+def test_derive_address_range():
+  start = 0xb675ceedba0843d19934d1e0508cde736b4bb7f0a56b9585329ebcbfed559346 - 3
+  results = list(code.basic.derive_address_range('{:064x}'.format(start), 7, batch_size=3))
+  assert len(results) == 7
+  assert results[3][2] == '1FJdRWN7tAd8rnivBm7yojppwvDmS7F55X'
+  for i, (private_key_hex, public_key_hex, address) in enumerate(results):
+    assert private_key_hex == '{:064x}'.format(start + i)
+    assert public_key_hex == code.basic.private_key_hex_to_public_key_hex(private_key_hex)
+    assert address == private_key_hex_to_address(private_key_hex)
+  results = list(code.basic.derive_address_range('01', 3))
+  assert [x[2] for x in results] == [
+    '1EHNa6Q4Jz2uvNExL497mE43ikXhwF6kZm',
+    '1LagHJk2FyCV2VzrNHVqg3gYG4TSYwDV4m',
+    '1NZUP3JAc9JkmbvmoTv7nVgZGtyJjirKV1',
+  ]
+  # The range must not go past the last valid private key.
+  n = code.secp256k1.N
+  with pytest.raises(ValueError):
+    list(code.basic.derive_address_range('{:064x}'.format(n - 2), 3))
+
+
+
+
+def test_address_cache():
+  basic = code.basic
+  address = '1FJdRWN7tAd8rnivBm7yojppwvDmS7F55X'
+  basic.clear_address_cache()
+  script_pub_key, script_length = basic.address_to_script_pub_key(address)
+  hash_hex = basic.bitcoin_address_to_public_key_hash_hex(address)
+  assert script_pub_key == '76a914' + hash_hex + '88ac'
+  stats = basic.get_address_cache_stats()['address_cache']
+  assert (stats['size'], stats['hits'], stats['misses']) == (1, 1, 1)
+  assert basic.public_key_hash_hex_to_address(hash_hex) == address
+  # Invalid addresses are not cached.
+  with pytest.raises(ValueError):
+    basic.validate_bitcoin_address(address[:-1] + '1')
+  assert basic.get_address_cache_stats()['address_cache']['size'] == 1
+  # The cache can be resized and disabled.
+  try:
+    basic.configure_address_cache(enabled=False)
+    assert basic.bitcoin_address_to_public_key_hash_hex(address) == hash_hex
+    stats = basic.get_address_cache_stats()['address_cache']
+    assert (stats['size'], stats['hits'], stats['misses']) == (0, 0, 0)
+    basic.configure_address_cache(enabled=True, max_size=2)
+    for private_key_hex in ['01', '02', '03']:
+      basic.validate_bitcoin_address(private_key_hex_to_address(private_key_hex))
+    assert basic.get_address_cache_stats()['address_cache']['size'] == 2
+  finally:
+    basic.configure_address_cache(enabled=True, max_size=basic.default_address_cache_size)
+
+
+
@@ -0,0 +1,164 @@
+# Imports
+import pytest
+import copy
+import asyncio
+import threading
+import concurrent.futures
+from argparse import Namespace
+
+
+
+
+# Relative imports
+from .. import code
+from .. import util
+from .. import submodules
+from .test_create_transaction_batch import build_input_pool, build_design
+
+
+
+
+# Shortcuts
+aio = code.aio
+transaction = code.transaction
+
+
+
+
+# Setup for this file.
+@pytest.fixture(autouse=True, scope='module')
+def setup_module(pytestconfig):
+  # If log_level is supplied to pytest in the commandline args, then use it to set up the logging in the application code.
+  log_level = pytestconfig.getoption('log_cli_level')
+  if log_level is not None:
+    log_level = log_level.lower()
+    code.setup(log_level = log_level)
+    submodules.setup(log_level = log_level)
+
+
+
+
+private_key_hex = '1647a11df9b9785669d630fa90d6c8242a622a8fc077fb50fc4c52f8391c22ad'
+
+
+
+
+def run(coroutine):
+  # asyncio.run() isn't available in Python 3.6.
+  loop = asyncio.new_event_loop()
+  try:
+    return loop.run_until_complete(coroutine)
+  finally:
+    loop.close()
+
+
+
+
+def test_pipeline():
+  inputs = build_input_pool(["0.00300000", "0.00200000", "0.00400000"])
+  designs = [build_design("a", "0.00350000"), build_design("b", "0.00150000")]
+
+  async def pipeline(pool, design):
+    tx = await pool.create_transaction(inputs, design)
+    tx_signed = await pool.sign(tx, [private_key_hex])
+    tx_hex = tx_signed.to_hex_signed_form()
+    tx_decoded = await pool.from_hex_signed(tx_hex)
+    invalid_signatures = await pool.verify(tx_decoded)
+    return tx_hex, tx_decoded, invalid_signatures
+
+  async def main():
+    async with aio.AsyncPool(workers=2) as pool:
+      return await asyncio.gather(*[pipeline(pool, design) for design in designs])
+
+  results = run(main())
+  assert len(results) == 2
+  for tx_hex, tx_decoded, invalid_signatures in results:
+    assert invalid_signatures == 0
+    assert tx_decoded.to_hex_signed_form() == tx_hex
+  # The same result as the synchronous API.
+  a = Namespace(inputs=copy.deepcopy(inputs), design=copy.deepcopy(designs[0]))
+  tx = code.create_transaction.create_transaction(a)
+  assert tx.sign([private_key_hex]).to_hex_signed_form() == results[0][0]
+
+
+
+
+def test_concurrency_limit_and_cancellation():
+  # With max_concurrency = 1, the second job waits for the first. Cancelling it means that it never runs.
+  started = threading.Event()
+  release = threading.Event()
+  calls = []
+
+  def blocking_job(name):
+    calls.append(name)
+    started.set()
+    release.wait(5)
+    return name
+
+  async def main(pool):
+    loop = asyncio.get_event_loop()
+    task_1 = loop.create_task(pool.run(blocking_job, 'first'))
+    task_2 = loop.create_task(pool.run(blocking_job, 'second'))
+    while not started.is_set():
+      await asyncio.sleep(0.01)
+    task_2.cancel()
+    with pytest.raises(asyncio.CancelledError):
+      await task_2
+    release.set()
+    return await task_1
+
+  executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+  pool = aio.AsyncPool(max_concurrency=1, executor=executor)
+  assert run(main(pool)) == 'first'
+  assert calls == ['first']
+  pool.close()
+  # The supplied executor isn't shut down by the pool.
+  assert executor.submit(len, 'abc').result() == 3
+  executor.shutdown()
+
+
+
+
+def test_aexit_does_not_block_event_loop():
+  # While the pool waits for a running job to finish, other coroutines can still run.
+  started = threading.Event()
+  release = threading.Event()
+
+  def blocking_job(name):
+    started.set()
+    release.wait(5)
+    return name
+
+  async def main(pool):
+    loop = asyncio.get_event_loop()
+    job = loop.create_task(pool.run(blocking_job, 'first'))
+    while not started.is_set():
+      await asyncio.sleep(0.01)
+    exit_task = loop.create_task(pool.__aexit__(None, None, None))
+    await asyncio.sleep(0.05)
+    closing = not exit_task.done()
+    release.set()
+    await exit_task
+    return closing, await job
+
+  executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+  pool = aio.AsyncPool(executor=executor)
+  # Treat the supplied executor as the pool's own, so that it is shut down on exit.
+  pool.own_executor = True
+  assert run(main(pool)) == (True, 'first')
+  assert pool.executor is None
+  with pytest.raises(RuntimeError):
+    executor.submit(len, 'abc')
+
+
+
+
+def test_invalid_arguments():
+  with pytest.raises(ValueError):
+    aio.AsyncPool(workers=0)
+  with pytest.raises(ValueError):
+    aio.AsyncPool(max_concurrency=0)
+
+
+
+
@@ -0,0 +1,74 @@
+# Imports
+import pytest
+
+
+
+
+# Relative imports
+from .. import code
+from .. import util
+from .. import submodules
+
+
+
+
+# Shortcuts
+base58 = code.base58
+basic = code.basic
+
+
+
+
+# Setup for this file.
+@pytest.fixture(autouse=True, scope='module')
+def setup_module(pytestconfig):
+  # If log_level is supplied to pytest in the commandline args, then use it to set up the logging in the application code.
+  log_level = pytestconfig.getoption('log_cli_level')
+  if log_level is not None:
+    log_level = log_level.lower()
+    code.setup(log_level = log_level)
+    submodules.setup(log_level = log_level)
+
+
+
+
+def test_encode_and_decode():
+  vectors = [
+    (b'', ''),
+    (b'\x00', '1'),
+    (b'\x00\x00\x01', '112'),
+    (b'hello world', 'StV1DL6CwTryKyV'),
+    (bytes.fromhex('00eb15231dfceb60925886b67d065299925915aeb172c06647'), '1NS17iag9jJgTHD1VXjvLCEnZuQ3rJDE9L'),
+  ]
+  for b, s in vectors:
+    assert base58.encode(b) == s
+    assert base58.decode(s) == b
+  assert base58.encode_many([x[0] for x in vectors]) == [x[1] for x in vectors]
+  assert base58.decode_many([x[1] for x in vectors]) == [x[0] for x in vectors]
+  # '0', 'O', 'I', and 'l' are not in the base58 alphabet.
+  for s in ['0', 'O', 'I', 'l', '1NS17iag9jJgTHD1VXjvLCEnZuQ3rJDE9é']:
+    with pytest.raises(ValueError):
+      base58.decode(s)
+
+
+
+
+def test_encode_check_and_decode_check():
+  addresses = [
+    '1EHNa6Q4Jz2uvNExL497mE43ikXhwF6kZm',
+    '1FJdRWN7tAd8rnivBm7yojppwvDmS7F55X',
+  ]
+  payloads = base58.decode_check_many(addresses)
+  for address, payload in zip(addresses, payloads):
+    assert len(payload) == 21
+    assert payload.hex() == basic.base58check_to_hex(address)
+    assert base58.encode_check(payload) == address
+  assert base58.encode_check_many(payloads) == addresses
+  # Change one character, so that the checksum no longer matches.
+  with pytest.raises(ValueError):
+    base58.decode_check(addresses[0][:-1] + 'n')
+  with pytest.raises(ValueError):
+    base58.decode_check('1')
+
+
+
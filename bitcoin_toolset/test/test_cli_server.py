@@ -0,0 +1,188 @@
+# Imports
+import pytest
+import os
+import sys
+import json
+import importlib.util
+
+
+
+
+# Relative imports
+from .. import code
+from .. import util
+from .. import submodules
+
+
+
+
+# Setup for this file.
+@pytest.fixture(autouse=True, scope='module')
+def setup_module(pytestconfig):
+  # If log_level is supplied to pytest in the commandline args, then use it to set up the logging in the application code.
+  log_level = pytestconfig.getoption('log_cli_level')
+  if log_level is not None:
+    log_level = log_level.lower()
+    code.setup(log_level = log_level)
+    submodules.setup(log_level = log_level)
+
+
+
+
+# Notes:
+# - cli.py is a top-level script, not part of the package, so it is loaded from its file.
+# - These tests call cli.handle_request directly, without starting a server.
+
+
+
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+
+
+def load_cli():
+  spec = importlib.util.spec_from_file_location('cli', os.path.join(repo_dir, 'cli.py'))
+  cli = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(cli)
+  return cli
+
+
+
+
+cli = load_cli()
+parser = cli.build_parser()
+
+
+
+
+def request(args, allowed_dirs=None, **kwargs):
+  line = json.dumps(dict(args=args, **kwargs))
+  return cli.handle_request(line, parser, allowed_dirs)
+
+
+
+
+def test_task():
+  response = request(['--task', 'get_address', '--private-key-hex', '01'])
+  assert response == {'ok': True, 'output': '1EHNa6Q4Jz2uvNExL497mE43ikXhwF6kZm\n'}
+
+
+
+
+def test_task_with_stdin():
+  response = request(['--task', 'derive_addresses'], stdin='01\n')
+  assert response['ok'] is True
+  assert '1EHNa6Q4Jz2uvNExL497mE43ikXhwF6kZm' in response['output']
+
+
+
+
+def test_argparse_error():
+  response = request(['--task', 'get_address', '--no-such-argument'])
+  assert response['ok'] is False
+  assert response['error_type'] == 'SystemExit'
+  assert 'unrecognized arguments' in response['error']
+
+
+
+
+def test_request_not_an_object():
+  response = cli.handle_request('["--task", "hello"]', parser)
+  assert response['ok'] is False
+  assert response['error_type'] == 'ValueError'
+  assert response['error'] == 'Request must be a JSON object.'
+
+
+
+
+def test_request_invalid_json():
+  response = cli.handle_request('{"args": ', parser)
+  assert response['ok'] is False
+  assert 'error' in response
+
+
+
+
+def test_nested_serve_rejected():
+  response = request(['--serve', '--socket', 'another.sock'])
+  assert response['ok'] is False
+  assert response['error'] == "A request can't start another server."
+
+
+
+
+def test_allowed_dir_rejected():
+  response = request(['--task', 'hello', '--allowed-dir', '/'])
+  assert response['ok'] is False
+  assert response['error'] == "A request can't change the allowed directories."
+
+
+
+
+def test_streams_restored_after_exception():
+  stdout = sys.stdout
+  stderr = sys.stderr
+  stdin = sys.stdin
+  response = request(['--task', 'get_address', '--private-key-hex', 'zz'])
+  assert response['ok'] is False
+  assert response['error_type'] == 'ValueError'
+  assert sys.stdout is stdout
+  assert sys.stderr is stderr
+  assert sys.stdin is stdin
+
+
+
+
+def test_private_key_file_in_allowed_dir(tmp_path):
+  key_file = tmp_path / 'key.txt'
+  key_file.write_text('01\n')
+  allowed_dirs = [os.path.realpath(str(tmp_path))]
+  response = request(['--task', 'get_address', '--private-key-file', str(key_file)], allowed_dirs)
+  assert response == {'ok': True, 'output': '1EHNa6Q4Jz2uvNExL497mE43ikXhwF6kZm\n'}
+
+
+
+
+def test_private_key_file_outside_allowed_dir(tmp_path):
+  allowed_dir = tmp_path / 'allowed'
+  allowed_dir.mkdir()
+  key_file = tmp_path / 'key.txt'
+  key_file.write_text('01\n')
+  allowed_dirs = [os.path.realpath(str(allowed_dir))]
+  response = request(['--task', 'get_private_key_wif', '--private-key-file', str(key_file)], allowed_dirs)
+  assert response['ok'] is False
+  assert response['error'].startswith('Path is not inside an allowed directory')
+  assert response['output'] == ''
+  # A path that leaves the allowed directory with '..' is also rejected.
+  path = os.path.join(str(allowed_dir), '..', 'key.txt')
+  response = request(['--task', 'get_private_key_wif', '--private-key-file', path], allowed_dirs)
+  assert response['ok'] is False
+
+
+
+
+def test_symlink_outside_allowed_dir(tmp_path):
+  allowed_dir = tmp_path / 'allowed'
+  allowed_dir.mkdir()
+  key_file = tmp_path / 'key.txt'
+  key_file.write_text('01\n')
+  link = allowed_dir / 'key.txt'
+  os.symlink(str(key_file), str(link))
+  allowed_dirs = [os.path.realpath(str(allowed_dir))]
+  response = request(['--task', 'get_private_key_wif', '--private-key-file', str(link)], allowed_dirs)
+  assert response['ok'] is False
+
+
+
+
+def test_no_paths_without_allowed_dirs(tmp_path):
+  data_file = tmp_path / 'data.txt'
+  data_file.write_text('hello')
+  response = request(['--task', 'hello', '--data-file', str(data_file)])
+  assert response['ok'] is False
+  assert response['error'].startswith('Path is not inside an allowed directory')
+
+
+
+
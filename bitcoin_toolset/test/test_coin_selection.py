@@ -0,0 +1,142 @@
+# Imports
+import pytest
+import random
+import time
+from argparse import Namespace
+
+
+
+
+# Relative imports
+from .. import code
+from .. import util
+from .. import submodules
+
+
+
+
+# Shortcuts
+basic = code.basic
+coin_selection = code.coin_selection
+create_transaction = code.create_transaction
+
+
+
+
+# Setup for this file.
+@pytest.fixture(autouse=True, scope='module')
+def setup_module(pytestconfig):
+  # If log_level is supplied to pytest in the commandline args, then use it to set up the logging in the application code.
+  log_level = pytestconfig.getoption('log_cli_level')
+  if log_level is not None:
+    log_level = log_level.lower()
+    code.setup(log_level = log_level)
+    submodules.setup(log_level = log_level)
+
+
+
+
+def select(name, amounts, target, **kwargs):
+  options = coin_selection.build_options(**kwargs)
+  return coin_selection.select(name, amounts, target, options)
+
+
+
+
+def test_greedy_strategies():
+  amounts = [1, 5, 3]
+  assert select('largest_first', amounts, 6) == [1, 2]
+  assert select('smallest_first', amounts, 3) == [0, 2]
+  assert select('all', amounts, 6) == [1, 2, 0]
+  assert select('largest_first', amounts, 10) is None
+  with pytest.raises(NotImplementedError):
+    select('one_address_at_a_time', amounts, 6)
+
+
+
+
+def test_branch_and_bound():
+  assert select('branch_and_bound', [5, 3, 8, 2], 10) == [2, 3]
+  assert select('branch_and_bound', [7, 7], 10) is None
+  assert select('branch_and_bound', [7, 7], 10, cost_window=4) == [0, 1]
+  # Inputs with no positive value are never selected.
+  assert select('branch_and_bound', [0, -5, 10], 10) == [2]
+
+
+
+
+def test_branch_and_bound_limits():
+  rng = random.Random(1)
+  amounts = [rng.randint(1000, 10 ** 8) for i in range(100000)]
+  start = time.monotonic()
+  indices = select('branch_and_bound', amounts, 10 ** 9 + 7, cost_window=500, max_iterations=20000, max_seconds=2.0)
+  assert time.monotonic() - start < 5
+  if indices is not None:
+    total = sum(amounts[i] for i in indices)
+    assert 10 ** 9 + 7 <= total <= 10 ** 9 + 7 + 500
+
+
+
+
+def test_knapsack():
+  assert select('knapsack', [10, 7, 5, 3], 12) == [1, 2]
+  assert select('knapsack', [10, 7, 5, 3], 7) == [1]
+  # The smaller inputs can't reach the target, so the smallest larger input is used.
+  assert select('knapsack', [20, 30, 3, 2], 10) == [0]
+  assert select('knapsack', [3, 2], 10) is None
+  # The result doesn't change between runs with the same seed.
+  rng = random.Random(2)
+  amounts = [rng.randint(1, 1000) for i in range(200)]
+  assert select('knapsack', amounts, 5001) == select('knapsack', amounts, 5001)
+
+
+
+
+def test_select_inputs():
+  # At 1 satoshi/byte, each input costs 179 satoshi, and a transaction with 1 output and no inputs is 44 bytes.
+  assert coin_selection.estimate_input_size() == 179
+  assert basic.estimate_transaction_size(0, 1) == 44
+  amounts = [200000, 60000, 40402]
+  selection = coin_selection.select_inputs('branch_and_bound', amounts, total_output=100000, n_outputs=1, fee_rate=1.0)
+  assert selection['indices'] == [1, 2]
+  assert selection['fee'] == basic.estimate_transaction_size(2, 1)
+  assert selection['change'] == 0
+  # No changeless match: fall back to knapsack, which returns change.
+  selection = coin_selection.select_inputs('branch_and_bound', amounts, total_output=150000, n_outputs=1, fee_rate=1.0)
+  assert selection['indices'] == [0]
+  assert selection['fee'] == basic.estimate_transaction_size(1, 2)
+  assert selection['change'] == 200000 - 150000 - selection['fee']
+  assert coin_selection.select_inputs('knapsack', amounts, total_output=300200, n_outputs=1, fee=225) is None
+
+
+
+
+def test_create_transaction_branch_and_bound():
+  address = "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX"
+  txid = "10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411"
+  inputs = [
+    {"address": address, "transaction_id": txid, "previous_output_index": i, "bitcoin_amount": basic.satoshi_to_bitcoin(x)}
+    for i, x in enumerate([200000, 60000, 40402])
+  ]
+  design = {
+    "change_address": address,
+    "fee_rate": "1",
+    "max_fee": 1000,
+    "max_spend_percentage": "100.00",
+    "input_selection_approaches": ["branch_and_bound"],
+    "coin_selection": {"max_iterations": 1000, "seed": 3},
+    "outputs": [
+      {"address": "12RbVkKwHcwHbMZmnSVAyR4g88ZChpQD6f", "bitcoin_amount": "0.00100000"},
+    ]
+  }
+  tx = create_transaction.create_transaction(Namespace(inputs=inputs, design=design))
+  assert [x.previous_output_index_int for x in tx.inputs] == [1, 2]
+  assert len(tx.outputs) == 1
+  assert tx.fee == 402
+  design['coin_selection'] = {"unknown_setting": 1}
+  with pytest.raises(ValueError):
+    create_transaction.validate_design(design)
+
+
+
+
@@ -0,0 +1,117 @@
+# Imports
+import pytest
+import copy
+
+
+
+
+# Relative imports
+from .. import code
+from .. import util
+from .. import submodules
+
+
+
+
+# Shortcuts
+transaction = code.transaction
+create_transaction_batch = code.create_transaction_batch
+
+
+
+
+# Setup for this file.
+@pytest.fixture(autouse=True, scope='module')
+def setup_module(pytestconfig):
+  # If log_level is supplied to pytest in the commandline args, then use it to set up the logging in the application code.
+  log_level = pytestconfig.getoption('log_cli_level')
+  if log_level is not None:
+    log_level = log_level.lower()
+    code.setup(log_level = log_level)
+    submodules.setup(log_level = log_level)
+
+
+
+
+def build_input_pool(bitcoin_amounts):
+  txid = "10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411"
+  return [
+    {
+      "address": "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX",
+      "transaction_id": txid,
+      "previous_output_index": i,
+      "bitcoin_amount": amount,
+    } for i, amount in enumerate(bitcoin_amounts)
+  ]
+
+
+
+
+def build_design(name, bitcoin_amount):
+  return {
+    "name": name,
+    "change_address": "1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP",
+    "fee": 225,
+    "max_fee": 250,
+    "max_spend_percentage": "100.00",
+    "input_selection_approaches": ["largest_first"],
+    "outputs": [
+      {
+        "address": "12RbVkKwHcwHbMZmnSVAyR4g88ZChpQD6f",
+        "bitcoin_amount": bitcoin_amount,
+      },
+    ]
+  }
+
+
+
+
+def test_create_transactions():
+  private_keys_hex = [
+    '1647a11df9b9785669d630fa90d6c8242a622a8fc077fb50fc4c52f8391c22ad',
+  ]
+  inputs = build_input_pool(["0.00300000", "0.00200000", "0.00400000", "0.00100000"])
+  designs = [
+    build_design("a", "0.00350000"),
+    build_design("b", "0.00450000"),
+    # Only the 0.001 input remains, so this design can't be fulfilled.
+    build_design("c", "0.00200000"),
+    build_design("d", "0.00090000"),
+  ]
+  inputs_original = copy.deepcopy(inputs)
+  designs_original = copy.deepcopy(designs)
+  results = list(create_transaction_batch.create_transactions(inputs, designs, private_keys_hex))
+  assert [x['name'] for x in results] == ['a', 'b', 'c', 'd']
+  assert [x['valid'] for x in results] == [True, True, False, True]
+  assert 'OutputValueNotCovered' in results[2]['error']
+  txid = inputs[0]['transaction_id']
+  assert results[0]['inputs'] == [txid + ':2']
+  assert results[1]['inputs'] == [txid + ':0', txid + ':1']
+  assert results[3]['inputs'] == [txid + ':3']
+  for result in [results[0], results[1], results[3]]:
+    assert result['fee'] == 225
+    tx = transaction.Transaction.from_hex_signed(result['transaction_hex'])
+    assert tx.calculate_txid() == result['txid']
+    assert tx.verify() == 0
+  # The supplied data is not modified.
+  assert inputs == inputs_original
+  assert designs == designs_original
+
+
+
+
+def test_create_transactions_errors():
+  inputs = build_input_pool(["0.00300000", "0.00300000"])
+  inputs[1]['previous_output_index'] = 0
+  designs = [build_design("a", "0.00100000")]
+  with pytest.raises(ValueError):
+    list(create_transaction_batch.create_transactions(inputs, designs, []))
+  # Missing private key.
+  inputs = build_input_pool(["0.00300000"])
+  results = list(create_transaction_batch.create_transactions(inputs, designs, []))
+  assert results[0]['valid'] is False
+  assert 'No private key' in results[0]['error']
+
+
+
+
@@ -0,0 +1,98 @@
+# Imports
+import pytest
+
+
+
+
+# Relative imports
+from .. import code
+from .. import util
+from .. import submodules
+
+
+
+
+# Shortcuts
+hashing = code.hashing
+basic = code.basic
+
+
+
+
+# Setup for this file.
+@pytest.fixture(autouse=True, scope='module')
+def setup_module(pytestconfig):
+  # If log_level is supplied to pytest in the commandline args, then use it to set up the logging in the application code.
+  log_level = pytestconfig.getoption('log_cli_level')
+  if log_level is not None:
+    log_level = log_level.lower()
+    code.setup(log_level = log_level)
+    submodules.setup(log_level = log_level)
+
+
+
+
+# Restore the default backend after each test, so that the choice of backend doesn't leak into other test files.
+@pytest.fixture(autouse=True)
+def restore_backend():
+  yield
+  hashing.set_backend(hashing.default_backend_name)
+
+
+
+
+def test_default_backend():
+  assert hashing.get_backend_name() == 'hashlib'
+
+
+
+
+@pytest.mark.parametrize('backend_name', ['hashlib', 'python', 'cross_check'])
+def test_sha256(backend_name):
+  hashing.set_backend(backend_name)
+  x = hashing.sha256(b'hello world').hex()
+  assert x == 'b94d27b9934d3e08a52e52d7da7dabfac484efe37a5380ee9088f7ace2efcde9'
+  x = hashing.sha256(b'').hex()
+  assert x == 'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855'
+
+
+
+
+@pytest.mark.parametrize('backend_name', ['hashlib', 'python', 'cross_check'])
+def test_ripemd160(backend_name):
+  hashing.set_backend(backend_name)
+  x = hashing.ripemd160(b'').hex()
+  assert x == '9c1185a5c5e9fc54612808977ee8f548b2258d31'
+  x = hashing.ripemd160(b'abc').hex()
+  assert x == '8eb208f7e05d987a9b044a8e98c6b087f15a0bfc'
+
+
+
+
+@pytest.mark.parametrize('backend_name', ['hashlib', 'python', 'cross_check'])
+def test_address_derivation(backend_name):
+  # Address derivation uses both SHA256 (public key hash, checksum) and RIPEMD160 (public key hash).
+  hashing.set_backend(backend_name)
+  private_key_hex = 'b675ceedba0843d19934d1e0508cde736b4bb7f0a56b9585329ebcbfed559346'
+  x = basic.private_key_hex_to_address(private_key_hex)
+  assert x == '1FJdRWN7tAd8rnivBm7yojppwvDmS7F55X'
+
+
+
+
+def test_cross_check_detects_mismatch():
+  def bad_sha256(b):
+    return b'\x00' * 32
+  cross_check = hashing.build_cross_check_function('sha256', hashing.hashlib_sha256, bad_sha256)
+  with pytest.raises(ValueError):
+    cross_check(b'hello world')
+
+
+
+
+def test_unknown_backend():
+  with pytest.raises(ValueError):
+    hashing.set_backend('no_such_backend')
+
+
+
@@ -0,0 +1,109 @@
+# Imports
+import pytest
+
+
+
+
+# Relative imports
+from .. import code
+from .. import util
+from .. import submodules
+
+
+
+
+# Shortcuts
+input_pool = code.input_pool
+
+
+
+
+# Setup for this file.
+@pytest.fixture(autouse=True, scope='module')
+def setup_module(pytestconfig):
+  # If log_level is supplied to pytest in the commandline args, then use it to set up the logging in the application code.
+  log_level = pytestconfig.getoption('log_cli_level')
+  if log_level is not None:
+    log_level = log_level.lower()
+    code.setup(log_level = log_level)
+    submodules.setup(log_level = log_level)
+
+
+
+
+address = "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX"
+address2 = "12RbVkKwHcwHbMZmnSVAyR4g88ZChpQD6f"
+txid = "10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411"
+txid2 = "8482e48391425d88fe30bd4066957000335f58e83f854f997146f41b9493b4ce"
+
+
+
+
+def build_inputs():
+  inputs = [
+    {'address': address, 'transaction_id': txid, 'previous_output_index': 0, 'satoshi_amount': 2000},
+    {'address': address2, 'transaction_id': txid2, 'previous_output_index': 3, 'satoshi_amount': 5000},
+    {'address': address, 'transaction_id': txid2, 'previous_output_index': 1, 'satoshi_amount': 2000},
+  ]
+  return inputs
+
+
+
+
+def test_pool_columns():
+  pool = input_pool.InputPool.from_inputs(build_inputs())
+  assert len(pool) == 3
+  assert pool.total() == 9000
+  assert len(pool.txids) == 3 * 32
+  assert pool.addresses == [address, address2]
+  assert list(pool.address_ids) == [0, 1, 0]
+  assert pool.get_txid(1) == txid2
+  assert pool.get_previous_output_index(1) == 3
+  assert pool.get_address(2) == address
+  assert pool.address_totals() == {address: [4000, 2], address2: [5000, 1]}
+
+
+
+
+def test_sort_positions():
+  # Inputs with equal amounts stay in the order in which they were added.
+  pool = input_pool.InputPool.from_inputs(build_inputs())
+  assert pool.sort_positions() == [1, 0, 2]
+  assert pool.sort_positions(descending=False) == [0, 2, 1]
+
+
+
+
+def test_spent_inputs():
+  pool = input_pool.InputPool.from_inputs(build_inputs())
+  sorted_positions = pool.sort_positions()
+  pool.mark_spent([1])
+  pool.mark_spent([1])
+  assert pool.n_spent == 1
+  assert pool.n_unspent() == 2
+  assert pool.total() == 4000
+  assert pool.sort_positions() == [0, 2]
+  assert pool.sort_positions(descending=False) == [0, 2]
+  assert pool.address_totals() == {address: [4000, 2]}
+  # The sorted order of all the inputs is cached, and isn't changed by marking inputs as spent.
+  assert pool.sorted_positions[True] == sorted_positions
+
+
+
+
+def test_to_transaction_inputs():
+  inputs = build_inputs()
+  pool = input_pool.InputPool.from_inputs(inputs)
+  selected = pool.to_transaction_inputs([1, 2])
+  assert len(selected) == 2
+  for x, d in zip(selected, [inputs[1], inputs[2]]):
+    assert x.address == d['address']
+    assert x.txid == d['transaction_id']
+    assert x.previous_output_index_int == d['previous_output_index']
+    assert x.satoshi_amount == d['satoshi_amount']
+  expected = code.transaction_input.TransactionInput.create(address2, txid2, 3, 5000)
+  assert selected[0].to_dict() == expected.to_dict()
+
+
+
+
@@ -0,0 +1,87 @@
+# Imports
+import pytest
+import os
+import sys
+import subprocess
+
+
+
+
+# Relative imports
+from .. import code
+from .. import util
+from .. import submodules
+
+
+
+
+# Setup for this file.
+@pytest.fixture(autouse=True, scope='module')
+def setup_module(pytestconfig):
+  # If log_level is supplied to pytest in the commandline args, then use it to set up the logging in the application code.
+  log_level = pytestconfig.getoption('log_cli_level')
+  if log_level is not None:
+    log_level = log_level.lower()
+    code.setup(log_level = log_level)
+    submodules.setup(log_level = log_level)
+
+
+
+
+def run_python(script):
+  # Run a script in a new Python process, so that no modules have been imported yet.
+  repo_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+  result = subprocess.run(
+    [sys.executable, '-c', script],
+    cwd = repo_dir,
+    stdout = subprocess.PIPE,
+    stderr = subprocess.PIPE,
+    universal_newlines = True,
+  )
+  assert result.returncode == 0, result.stderr
+  return result.stdout.split()
+
+
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="Lazy imports require Python 3.7.")
+def test_modules_are_imported_when_used():
+  script = '''
+import sys
+import bitcoin_toolset
+print('bitcoin_toolset.code.transaction' in sys.modules)
+bitcoin_toolset.code.basic
+print('bitcoin_toolset.code.basic' in sys.modules, 'bitcoin_toolset.code.transaction' in sys.modules)
+from bitcoin_toolset.code import transaction
+print('bitcoin_toolset.code.transaction' in sys.modules)
+'''
+  assert run_python(script) == ['False', 'True', 'False', 'True']
+
+
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason="Lazy imports require Python 3.7.")
+def test_deferred_logger_configuration():
+  # A module that is imported after setup() is configured when it is imported.
+  script = '''
+import sys
+import bitcoin_toolset
+bitcoin_toolset.setup(log_level='info')
+print('bitcoin_toolset.code.create_transaction' in sys.modules)
+logger = bitcoin_toolset.code.create_transaction.logger
+print(logger.level_str, logger.propagate)
+'''
+  assert run_python(script) == ['False', 'info', 'False']
+
+
+
+
+def test_unknown_module():
+  lazy = util.lazy_import.LazyPackage(code.__name__, code.module_names)
+  with pytest.raises(AttributeError):
+    lazy.load('no_such_module')
+  assert code.basic is lazy.load('basic')
+
+
+
+
@@ -0,0 +1,126 @@
+# Imports
+import pytest
+import logging
+
+
+
+
+# Relative imports
+from .. import code
+from .. import util
+from .. import submodules
+
+
+
+
+# Shortcuts
+module_logger = util.module_logger
+LazyMessage = module_logger.LazyMessage
+
+
+
+
+# Setup for this file.
+@pytest.fixture(autouse=True, scope='module')
+def setup_module(pytestconfig):
+  # If log_level is supplied to pytest in the commandline args, then use it to set up the logging in the application code.
+  log_level = pytestconfig.getoption('log_cli_level')
+  if log_level is not None:
+    log_level = log_level.lower()
+    code.setup(log_level = log_level)
+    submodules.setup(log_level = log_level)
+
+
+
+
+class ListHandler(logging.Handler):
+
+
+  def __init__(self):
+    logging.Handler.__init__(self)
+    self.messages = []
+
+
+  def emit(self, record):
+    self.messages.append(record.getMessage())
+
+
+
+
+def test_lazy_message():
+  calls = []
+
+  def build(x):
+    calls.append(x)
+    return 'built {}'.format(x)
+
+  logger = logging.getLogger('bitcoin_toolset.test.test_module_logger')
+  logger.propagate = False
+  handler = ListHandler()
+  logger.addHandler(handler)
+  try:
+    # Disabled level: the message is never built.
+    logger.setLevel(logging.ERROR)
+    assert not module_logger.debug_enabled(logger)
+    assert not module_logger.info_enabled(logger)
+    logger.debug(LazyMessage(build, 1))
+    logger.info(LazyMessage("{} of {}", 1, 2))
+    assert calls == []
+    assert handler.messages == []
+    # Enabled level: the message is built when it is output.
+    logger.setLevel(logging.DEBUG)
+    assert module_logger.debug_enabled(logger)
+    logger.debug(LazyMessage(build, 2))
+    logger.info(LazyMessage("{} of {n}", 1, n=2))
+    assert calls == [2]
+    assert handler.messages == ['built 2', '1 of 2']
+  finally:
+    logger.removeHandler(handler)
+
+
+
+
+def test_debug_logging_does_not_change_signatures():
+  private_keys_hex = [
+    '1647a11df9b9785669d630fa90d6c8242a622a8fc077fb50fc4c52f8391c22ad',
+  ]
+  inputs = [
+    code.transaction_input.TransactionInput.create(
+      address = '1AppardGrpGdddB2HUTLRd2GGWaYAWDByX',
+      txid = '10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411',
+      previous_output_index_int = i,
+      satoshi_amount = 300000,
+    ) for i in range(2)
+  ]
+  outputs = [
+    code.transaction_output.TransactionOutput.create(
+      address = '1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP',
+      satoshi_amount = 590000,
+    )
+  ]
+  loggers = [code.basic.logger, code.transaction.logger]
+  results = []
+  for level in [logging.ERROR, logging.DEBUG]:
+    old_levels = [x.level for x in loggers]
+    handler = ListHandler()
+    for x in loggers:
+      x.setLevel(level)
+      x.addHandler(handler)
+    try:
+      tx = code.transaction.Transaction.create(inputs, outputs).sign(private_keys_hex)
+      tx_hex = tx.to_hex_signed_form()
+      tx_2 = code.transaction.Transaction.from_hex_signed(tx_hex)
+      assert tx_2.verify() == 0
+      results.append(tx_hex)
+    finally:
+      for x, old_level in zip(loggers, old_levels):
+        x.setLevel(old_level)
+        x.removeHandler(handler)
+    if level == logging.DEBUG:
+      assert any(x.startswith('script_sig (') for x in handler.messages)
+    else:
+      assert handler.messages == []
+  assert results[0] == results[1]
+
+
+
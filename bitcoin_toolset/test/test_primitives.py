@@ -0,0 +1,107 @@
+# Imports
+import pytest
+
+
+
+
+# Relative imports
+from .. import code
+from .. import util
+from .. import submodules
+
+
+
+
+# Shortcuts
+primitives = util.primitives
+v = util.validate
+
+
+
+
+# Setup for this file.
+@pytest.fixture(autouse=True, scope='module')
+def setup_module(pytestconfig):
+  # If log_level is supplied to pytest in the commandline args, then use it to set up the logging in the application code.
+  log_level = pytestconfig.getoption('log_cli_level')
+  if log_level is not None:
+    log_level = log_level.lower()
+    code.setup(log_level = log_level)
+    submodules.setup(log_level = log_level)
+
+
+
+
+def error_message(f, *args):
+  with pytest.raises((TypeError, ValueError)) as e:
+    f(*args)
+  return str(e.value)
+
+
+
+
+def test_validate_hex():
+  for s in ['', '00', 'ffffffff', '0123456789abcdef']:
+    assert primitives.is_hex(s)
+    primitives.validate_hex(s)
+  # Invalid values produce the same errors as validate.validate_hex.
+  for s in ['0', 'FF', 'ag', '0x00', 'ab\n', 'é0', 12, None]:
+    assert not primitives.is_hex(s)
+    assert error_message(primitives.validate_hex, s) == error_message(v.validate_hex, s)
+  primitives.validate_hex_length('00' * 32, 32)
+  for s, n in [('00' * 31, 32), ('0G' * 32, 32), ('00', 1.0)]:
+    assert error_message(primitives.validate_hex_length, s, n) == error_message(v.validate_hex_length, s, n)
+
+
+
+
+def test_validate_hex_lists():
+  txid = '10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411'
+  primitives.validate_hex_list([])
+  primitives.validate_hex_list(['00', 'ff', ''])
+  primitives.validate_hex_length_list([txid] * 3, 32)
+  # Two odd-length items can join to make valid hex.
+  with pytest.raises(ValueError) as e:
+    primitives.validate_hex_list(['abc', 'd'])
+  assert "'items[0]'" in str(e.value)
+  with pytest.raises(ValueError) as e:
+    primitives.validate_hex_list(['00', '0g'], 'script_sig')
+  assert "'script_sig[1]'" in str(e.value)
+  with pytest.raises(TypeError):
+    primitives.validate_hex_list(['00', None])
+  with pytest.raises(ValueError) as e:
+    primitives.validate_hex_length_list([txid, txid[:-2]], 32, 'transaction_id')
+  assert "'transaction_id[1]'" in str(e.value)
+
+
+
+
+def test_conversions():
+  assert primitives.hex_len('') == 0
+  assert primitives.hex_len('0a0b0c') == 3
+  assert primitives.hex_to_bytes('0a0b') == b'\x0a\x0b'
+  assert primitives.bytes_to_hex(b'\x0a\x0b') == '0a0b'
+  assert primitives.reverse_hex_order('') == ''
+  assert primitives.reverse_hex_order('0a0b0c') == '0c0b0a'
+  for n, x, x_le in [(0, '00', '00'), (15, '0f', '0f'), (256, '0100', '0001'), (2 ** 64 - 1, 'ff' * 8, 'ff' * 8)]:
+    assert primitives.int_to_hex(n) == x
+    assert primitives.int_to_hex_le(n) == x_le
+    assert primitives.hex_to_int(x) == n
+    assert primitives.hex_le_to_int(x_le) == n
+  assert primitives.pad_hex('01', 4) == '00000001'
+  assert primitives.pad_hex_le('01', 4) == '01000000'
+  invalid_calls = [
+    (primitives.int_to_hex, [-1]),
+    (primitives.int_to_hex, ['1']),
+    (primitives.hex_le_to_int, ['']),
+    (primitives.reverse_hex_order, ['abc']),
+    (primitives.pad_hex, ['000000', 2]),
+  ]
+  for f, args in invalid_calls:
+    with pytest.raises((TypeError, ValueError)):
+      f(*args)
+  # basic uses these functions.
+  assert code.basic.int_to_hex_le(256) == '0001'
+
+
+
@@ -0,0 +1,119 @@
+# Imports
+import pytest
+import os
+
+
+
+
+# Relative imports
+from .. import code
+from .. import util
+from .. import submodules
+
+
+
+
+# Shortcuts
+secp256k1 = code.secp256k1
+ecdsa = submodules.ecdsa_python3
+
+
+
+
+# Setup for this file.
+@pytest.fixture(autouse=True, scope='module')
+def setup_module(pytestconfig):
+  # If log_level is supplied to pytest in the commandline args, then use it to set up the logging in the application code.
+  log_level = pytestconfig.getoption('log_cli_level')
+  if log_level is not None:
+    log_level = log_level.lower()
+    code.setup(log_level = log_level)
+    submodules.setup(log_level = log_level)
+
+
+
+
+# Restore the default generator table settings after each test.
+@pytest.fixture(autouse=True)
+def restore_generator_table():
+  yield
+  secp256k1.configure_generator_table(window_bits=secp256k1.default_window_bits)
+
+
+
+
+def test_generator_multiply():
+  assert secp256k1.generator_multiply(1) == secp256k1.G
+  x, y = secp256k1.generator_multiply(2)
+  assert x == 0xc6047f9441ed7d6d3045406e95c07cd85c778e4b8cef3ca7abac09b95c709ee5
+  assert y == 0x1ae168fea63dc339a3c58419466ceaeef7f632653266d0e1236431a950cfe52a
+  # (N - 1) * G = -G
+  x, y = secp256k1.generator_multiply(secp256k1.N - 1)
+  assert x == secp256k1.Gx
+  assert y == secp256k1.P - secp256k1.Gy
+  for k in [0, secp256k1.N]:
+    with pytest.raises(ValueError):
+      secp256k1.generator_multiply(k)
+
+
+
+
+def test_generator_multiply_matches_point_multiply():
+  # The window table must give the same result for every window size.
+  scalars = [3, 255, 256, 2**128 + 1, secp256k1.N // 3, secp256k1.N - 2]
+  expected = [secp256k1.point_multiply(k, secp256k1.G) for k in scalars]
+  for window_bits in [1, 4, 5, 8]:
+    secp256k1.configure_generator_table(window_bits=window_bits)
+    # Build the table now, so that it is used for every multiplication (see table_build_threshold).
+    secp256k1.get_generator_table()
+    assert [secp256k1.generator_multiply(k) for k in scalars] == expected
+
+
+
+
+def test_generator_table_build_threshold():
+  # The first few multiplications use double-and-add. After that, the table is built and used.
+  secp256k1.configure_generator_table(window_bits=4)
+  n = secp256k1.table_build_threshold
+  scalars = list(range(1000, 1000 + n + 2))
+  expected = [secp256k1.point_multiply(k, secp256k1.G) for k in scalars]
+  assert [secp256k1.generator_multiply(k) for k in scalars[:n]] == expected[:n]
+  assert secp256k1.table is None
+  assert [secp256k1.generator_multiply(k) for k in scalars[n:]] == expected[n:]
+  assert secp256k1.table is not None
+
+
+
+
+def test_public_key_matches_ecdsa_submodule():
+  private_keys_hex = [
+    '0000000000000000000000000000000000000000000000000000000000000001',
+    '1647a11df9b9785669d630fa90d6c8242a622a8fc077fb50fc4c52f8391c22ad',
+    'ec30b469f5e9b16d565168fbf4c9a60050feab0349ac03ff7611a3a76f2bcd4a',
+  ]
+  for private_key_hex in private_keys_hex:
+    public_key_hex = secp256k1.private_key_hex_to_public_key_hex(private_key_hex)
+    assert public_key_hex == ecdsa.private_key_hex_to_public_key_hex(private_key_hex)
+
+
+
+
+def test_generator_table_cache_file(tmp_path):
+  cache_file = str(tmp_path / 'table.bin')
+  secp256k1.configure_generator_table(window_bits=4, cache_file=cache_file)
+  expected = secp256k1.generator_multiply(12345)
+  assert os.path.isfile(cache_file)
+  # Load the table from the cache file.
+  secp256k1.configure_generator_table(window_bits=4, cache_file=cache_file)
+  assert secp256k1.generator_multiply(12345) == expected
+  # A corrupted cache file is detected, and the table is rebuilt.
+  data = bytearray(open(cache_file, 'rb').read())
+  data[-1] ^= 1
+  open(cache_file, 'wb').write(data)
+  assert secp256k1.load_table_from_file(cache_file, 4) is None
+  secp256k1.configure_generator_table(window_bits=4, cache_file=cache_file)
+  assert secp256k1.generator_multiply(12345) == expected
+  assert secp256k1.load_table_from_file(cache_file, 4) is not None
+
+
+
@@ -1,5 +1,6 @@
 # Imports
 import pytest
+import json
 from argparse import Namespace
 
 
@@ -1517,3 +1518,402 @@ def test_tx16():
 
 
 
+
+def join_dict_form_hex(d):
+  # Concatenate the hex values of a signable-form or signed-form dict, in order.
+  s = ''
+  for k, v in d.items():
+    if k in 'inputs outputs'.split():
+      for x in v:
+        s += ''.join(x.values())
+    else:
+      s += v
+  return s
+
+
+
+
+def test_serialization_matches_dict_form():
+  # The bytes serializer must produce exactly the same data as the dict forms of the transaction.
+  private_keys_hex = [
+    '1647a11df9b9785669d630fa90d6c8242a622a8fc077fb50fc4c52f8391c22ad',
+    'ec30b469f5e9b16d565168fbf4c9a60050feab0349ac03ff7611a3a76f2bcd4a',
+  ]
+  inputs_data = [
+    {
+      "address": "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX",
+      "transaction_id": "10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411",
+      "previous_output_index": 0,
+      "bitcoin_amount": "0.00300000",
+    },
+    {
+      "address": "1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP",
+      "transaction_id": "10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411",
+      "previous_output_index": 1,
+      "bitcoin_amount": "0.00639620",
+    },
+  ]
+  outputs_data = [
+    {
+      "address": "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX",
+      "bitcoin_amount": "0.00937208",
+    },
+  ]
+  inputs, outputs = build_tx_inputs_and_outputs(inputs_data, outputs_data)
+  tx_unsigned = transaction.Transaction.create(inputs, outputs)
+  for i in range(len(inputs)):
+    expected = join_dict_form_hex(tx_unsigned.to_dict_signable_form(i))
+    assert tx_unsigned.to_hex_signable_form(i) == expected
+    assert tx_unsigned.to_bytes_signable_form(i) == bytes.fromhex(expected)
+  tx_signed = tx_unsigned.sign(private_keys_hex)
+  expected = join_dict_form_hex(tx_signed.to_dict_signed_form())
+  assert tx_signed.to_hex_signed_form() == expected
+  tx_signed_2 = transaction.Transaction.from_hex_signed(expected)
+  assert tx_signed_2.to_hex_signed_form() == expected
+
+
+
+
+def test_signable_forms_match_serialization():
+  # The precomputed signable forms must be identical to the forms built from scratch for each input.
+  inputs_data = [
+    {
+      "address": "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX",
+      "transaction_id": "10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411",
+      "previous_output_index": i,
+      "bitcoin_amount": "0.00300000",
+    } for i in range(5)
+  ]
+  outputs_data = [
+    {
+      "address": "1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP",
+      "bitcoin_amount": "0.01400000",
+    },
+    {
+      "address": "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX",
+      "bitcoin_amount": "0.00090000",
+    },
+  ]
+  inputs, outputs = build_tx_inputs_and_outputs(inputs_data, outputs_data)
+  tx_unsigned = transaction.Transaction.create(inputs, outputs)
+  signable_forms = code.sighash.SignableForms(tx_unsigned)
+  for i in range(len(inputs)):
+    expected = code.serialization.transaction_to_bytes_signable(tx_unsigned, i)
+    assert signable_forms.to_bytes(i) == expected
+    assert signable_forms.digest_hex(i) == basic.get_double_sha256(expected.hex())
+  with pytest.raises(ValueError):
+    signable_forms.to_bytes(len(inputs))
+
+
+
+
+def test_sign_parallel_matches_serial():
+  # Signing on multiple worker processes must produce exactly the same transaction as signing serially.
+  private_keys_hex = [
+    '1647a11df9b9785669d630fa90d6c8242a622a8fc077fb50fc4c52f8391c22ad',
+    'ec30b469f5e9b16d565168fbf4c9a60050feab0349ac03ff7611a3a76f2bcd4a',
+  ]
+  addresses = [
+    "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX",
+    "1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP",
+  ]
+  inputs_data = [
+    {
+      "address": addresses[i % 2],
+      "transaction_id": "10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411",
+      "previous_output_index": i,
+      "bitcoin_amount": "0.00300000",
+    } for i in range(5)
+  ]
+  outputs_data = [
+    {
+      "address": "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX",
+      "bitcoin_amount": "0.01490000",
+    },
+  ]
+  inputs, outputs = build_tx_inputs_and_outputs(inputs_data, outputs_data)
+  tx_serial = transaction.Transaction.create(inputs, outputs).sign(private_keys_hex)
+  inputs, outputs = build_tx_inputs_and_outputs(inputs_data, outputs_data)
+  tx_parallel = transaction.Transaction.create(inputs, outputs).sign(private_keys_hex, workers=2)
+  assert tx_parallel.to_hex_signed_form() == tx_serial.to_hex_signed_form()
+  assert tx_parallel.verify() == 0
+  assert tx_parallel.verify(workers=2) == 0
+  with pytest.raises(ValueError):
+    tx_serial.sign(private_keys_hex, workers=0)
+
+
+
+
+def test_verify_inputs():
+  private_keys_hex = [
+    '1647a11df9b9785669d630fa90d6c8242a622a8fc077fb50fc4c52f8391c22ad',
+  ]
+  inputs_data = [
+    {
+      "address": "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX",
+      "transaction_id": "10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411",
+      "previous_output_index": i,
+      "bitcoin_amount": "0.00300000",
+    } for i in range(4)
+  ]
+  outputs_data = [
+    {
+      "address": "1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP",
+      "bitcoin_amount": "0.01190000",
+    },
+  ]
+  inputs, outputs = build_tx_inputs_and_outputs(inputs_data, outputs_data)
+  tx_signed = transaction.Transaction.create(inputs, outputs).sign(private_keys_hex)
+  results = tx_signed.verify_inputs()
+  assert [x['valid'] for x in results] == [True] * 4
+  assert [x['input_index'] for x in results] == [0, 1, 2, 3]
+  # Copy the scriptSig of input 0 into input 1. The signature for input 1 is now invalid.
+  tx_signed.inputs[1].script_sig = tx_signed.inputs[0].script_sig
+  for workers in [None, 2]:
+    results = tx_signed.verify_inputs(workers=workers)
+    assert [x['valid'] for x in results] == [True, False, True, True]
+    results = tx_signed.verify_inputs(workers=workers, fail_fast=True)
+    assert [x['valid'] for x in results] == [True, False, None, None]
+    assert tx_signed.verify(workers=workers) == 1
+
+
+
+
+def test_var_int():
+  vectors = [
+    (0, '00'),
+    (252, 'fc'),
+    (253, 'fdfd00'),
+    (515, 'fd0302'),
+    (0xffff, 'fdffff'),
+    (0x10000, 'fe00000100'),
+    (0xffffffff, 'feffffffff'),
+    (0x100000000, 'ff0000000001000000'),
+  ]
+  for n, x in vectors:
+    assert basic.int_to_var_int(n) == x
+    assert basic.var_int_to_int(x) == n
+    assert basic.var_int_size(n) == len(x) // 2
+  # Non-canonical, incomplete, and overlong encodings are rejected.
+  for x in ['fdfc00', 'feffff0000', 'fd03', 'ff00', '0000', '']:
+    with pytest.raises(ValueError):
+      basic.var_int_to_int(x)
+  with pytest.raises(ValueError):
+    basic.int_to_var_int(-1)
+  assert basic.estimate_transaction_size(253, 1) == basic.estimate_transaction_size(252, 1) + 179 + 2
+
+
+
+
+def test_more_than_252_inputs_and_outputs():
+  private_keys_hex = [
+    '1647a11df9b9785669d630fa90d6c8242a622a8fc077fb50fc4c52f8391c22ad',
+  ]
+  n = 253
+  inputs_data = [
+    {
+      "address": "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX",
+      "transaction_id": "10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411",
+      "previous_output_index": i,
+      "bitcoin_amount": "0.00010000",
+    } for i in range(n)
+  ]
+  outputs_data = [
+    {
+      "address": "1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP",
+      "bitcoin_amount": "0.00009000",
+    } for i in range(n)
+  ]
+  inputs, outputs = build_tx_inputs_and_outputs(inputs_data, outputs_data)
+  tx_unsigned = transaction.Transaction.create(inputs, outputs)
+  assert tx_unsigned.input_count == 'fdfd00'
+  assert tx_unsigned.output_count == 'fdfd00'
+  tx_unsigned_2 = transaction.Transaction.from_json(tx_unsigned.to_json())
+  assert tx_unsigned_2.to_json() == tx_unsigned.to_json()
+  # Signing 253 inputs is slow, and this test is about the format. So: sign a single-input tx, and copy its scriptSig into every input. The signatures are invalid, but the structure is correct.
+  transaction.Transaction.create(inputs[:1], outputs[:1]).sign(private_keys_hex)
+  for input_ in inputs[1:]:
+    for k in 'public_key_hex script_length script_length_int script_sig'.split():
+      setattr(input_, k, getattr(inputs[0], k))
+  tx_signed_hex = tx_unsigned.to_hex_signed_form()
+  assert tx_signed_hex[8:14] == 'fdfd00'
+  tx_signed_2 = transaction.Transaction.from_hex_signed(tx_signed_hex)
+  assert tx_signed_2.to_hex_signed_form() == tx_signed_hex
+  assert len(tx_signed_2.inputs) == n
+  assert len(tx_signed_2.outputs) == n
+
+
+
+
+def test_from_bytes_signed():
+  private_keys_hex = [
+    '1647a11df9b9785669d630fa90d6c8242a622a8fc077fb50fc4c52f8391c22ad',
+  ]
+  inputs_data = [
+    {
+      "address": "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX",
+      "transaction_id": "10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411",
+      "previous_output_index": i,
+      "bitcoin_amount": "0.00300000",
+    } for i in range(2)
+  ]
+  outputs_data = [
+    {
+      "address": "1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP",
+      "bitcoin_amount": "0.00590000",
+    },
+  ]
+  inputs, outputs = build_tx_inputs_and_outputs(inputs_data, outputs_data)
+  tx_signed = transaction.Transaction.create(inputs, outputs).sign(private_keys_hex)
+  b = tx_signed.to_bytes_signed_form()
+  x = b.hex()
+  # Raw bytes, hex, and hex as ASCII bytes (e.g. read from a file in binary mode) are all accepted.
+  for data in [b, bytearray(b), memoryview(b), x, x + '\n', x.encode('ascii')]:
+    tx = transaction.Transaction.from_bytes_signed(data)
+    assert tx.to_hex_signed_form() == x
+  # Parse from a cursor, which reads one transaction at a time.
+  cursor = code.serialization.Cursor(b + b)
+  for i in range(2):
+    d = code.serialization.read_transaction_signed(cursor)
+    assert d['offset'] == i * len(b)
+    assert d['size'] == len(b)
+    assert bytes(d['inputs'][1]['script_sig']) == bytes.fromhex(tx_signed.inputs[1].script_sig)
+  assert cursor.at_end()
+  # Truncated data.
+  with pytest.raises(code.serialization.IncompleteDataError) as e:
+    transaction.Transaction.from_bytes_signed(b[:100])
+  assert 'scriptSig at byte offset 42' in str(e.value)
+  # Trailing data.
+  with pytest.raises(ValueError) as e:
+    transaction.Transaction.from_bytes_signed(b + b'\x00')
+  assert 'byte offset {}'.format(len(b)) in str(e.value)
+  # Unsupported sequence in the first input.
+  i = 4 + 1 + 32 + 4 + 1 + tx_signed.inputs[0].script_length_int
+  b2 = b[:i] + b'\x00' + b[i + 1:]
+  with pytest.raises(ValueError) as e:
+    transaction.Transaction.from_bytes_signed(b2)
+  assert 'sequence' in str(e.value) and 'byte offset {}'.format(i) in str(e.value)
+  # An output value that is greater than the maximum supply.
+  i = code.serialization.read_transaction_signed(code.serialization.Cursor(b))['outputs'][0]['offset']
+  value = (basic.max_satoshi_amount + 1).to_bytes(8, 'little')
+  b3 = b[:i] + value + b[i + 8:]
+  with pytest.raises(ValueError) as e:
+    transaction.Transaction.from_bytes_signed(b3)
+  assert 'Invalid output 0 at byte offset {}'.format(i) in str(e.value)
+
+
+
+def test_validation_levels():
+  private_keys_hex = [
+    '1647a11df9b9785669d630fa90d6c8242a622a8fc077fb50fc4c52f8391c22ad',
+  ]
+  inputs_data = [
+    {
+      "address": "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX",
+      "transaction_id": "10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411",
+      "previous_output_index": i,
+      "bitcoin_amount": "0.00300000",
+    } for i in range(2)
+  ]
+  outputs_data = [
+    {
+      "address": "1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP",
+      "bitcoin_amount": "0.00590000",
+    },
+  ]
+  validation = code.validation
+  inputs, outputs = build_tx_inputs_and_outputs(inputs_data, outputs_data)
+  tx = transaction.Transaction.create(inputs, outputs).sign(private_keys_hex)
+  assert tx.validated is True
+  assert validation.needs_check(tx) is False
+  assert validation.needs_check(tx, 'strict') is True
+  tx_json = tx.to_json()
+  # All levels load the same transaction from valid data.
+  for level in validation.levels:
+    tx_2 = transaction.Transaction.from_json(tx_json, validation_level=level)
+    assert tx_2.to_hex_signed_form() == tx.to_hex_signed_form()
+    assert tx_2.validated is (level != 'trusted')
+  # The 'trusted' level skips the per-value checks. They can be run later.
+  d = tx.to_dict()
+  d['inputs'][0]['script_sig'] = 'zz' + d['inputs'][0]['script_sig'][2:]
+  bad_json = json.dumps(d)
+  with pytest.raises(ValueError):
+    transaction.Transaction.from_json(bad_json)
+  tx_3 = transaction.Transaction.from_json(bad_json, validation_level='trusted')
+  assert tx_3.validated is False
+  with pytest.raises(ValueError):
+    tx_3.validate()
+  tx_4 = transaction.Transaction.from_json(tx_json, validation_level='trusted')
+  assert tx_4.validate().validated is True
+  assert tx_4.validate('strict').to_hex_signed_form() == tx.to_hex_signed_form()
+  # The 'strict' level checks that the scriptPubKey matches the address.
+  d = tx.to_dict()
+  script_pub_key, _ = basic.address_to_script_pub_key(outputs_data[0]['address'])
+  d['inputs'][1]['script_pub_key'] = script_pub_key
+  mismatch_json = json.dumps(d)
+  transaction.Transaction.from_json(mismatch_json)
+  with pytest.raises(ValueError) as e:
+    transaction.Transaction.from_json(mismatch_json, validation_level='strict')
+  assert "doesn't match address" in str(e.value)
+  with pytest.raises(ValueError):
+    transaction.Transaction.from_json(tx_json, validation_level='paranoid')
+  # The package-wide level is used when no level is supplied.
+  validation.set_level('trusted')
+  try:
+    assert transaction.Transaction.from_json(bad_json).validated is False
+  finally:
+    validation.set_level(validation.default_level)
+  # validate_hex still reports the position of every non-hex character.
+  with pytest.raises(ValueError) as e:
+    util.validate.validate_hex('ab1Z\nf')
+  assert 'indices [3, 4]' in str(e.value)
+
+
+
+
+def test_input_and_output_derived_fields():
+  txid = '10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411'
+  input_ = transaction_input.TransactionInput.create('1AppardGrpGdddB2HUTLRd2GGWaYAWDByX', txid, 258, 300000)
+  output = transaction_output.TransactionOutput.create('1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP', 590000)
+  # The instances have no __dict__, so new attributes can't be added by mistake.
+  for x in [input_, output]:
+    assert not hasattr(x, '__dict__')
+    with pytest.raises(AttributeError):
+      x.foo = 1
+  # Derived fields are calculated from the core fields.
+  assert input_.txid == txid
+  assert input_.previous_output_hash == basic.reverse_hex_order(txid)
+  assert input_.previous_output_index == '02010000'
+  assert input_.script_pub_key_length == '19'
+  assert input_.script_pub_key_length_int == 25
+  assert input_.bitcoin_amount == '0.00300000'
+  assert output.value == basic.pad_hex_le(basic.int_to_hex_le(590000), n_bytes=8)
+  assert output.script_length == '19'
+  assert output.script_length_int == 25
+  output.set_satoshi_amount(1000)
+  assert output.value == 'e803000000000000'
+  assert output.bitcoin_amount == '0.00001000'
+  with pytest.raises(AttributeError):
+    output.value = 'e803000000000000'
+  # to_dict() contains every field, and from_dict() rebuilds the same instance.
+  for cls, x in [(transaction_input.TransactionInput, input_), (transaction_output.TransactionOutput, output)]:
+    d = x.to_dict()
+    assert cls.from_dict(d).to_dict() == d
+  # Values that don't fit into the fixed-width fields are rejected.
+  with pytest.raises(ValueError):
+    transaction_input.TransactionInput.create('1AppardGrpGdddB2HUTLRd2GGWaYAWDByX', txid, 2 ** 32, 300000)
+  with pytest.raises(ValueError):
+    transaction_output.TransactionOutput.create('1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP', 2 ** 64)
+  # Amounts must be integers between 0 and the maximum supply (21 million bitcoin).
+  too_large = basic.max_satoshi_amount + 1
+  for satoshi_amount in ['notanumber', 300000.0, -5, too_large, 3000000000000000]:
+    with pytest.raises((TypeError, ValueError)):
+      transaction_input.TransactionInput.create('1AppardGrpGdddB2HUTLRd2GGWaYAWDByX', txid, 0, satoshi_amount)
+    with pytest.raises((TypeError, ValueError)):
+      transaction_output.TransactionOutput.create('1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP', satoshi_amount)
+  with pytest.raises(ValueError):
+    output.set_satoshi_amount(too_large)
+  assert transaction_output.TransactionOutput.create('1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP', basic.max_satoshi_amount).bitcoin_amount == '21000000.00000000'
+
+
+
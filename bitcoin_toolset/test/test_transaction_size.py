@@ -0,0 +1,119 @@
+# Imports
+import pytest
+import copy
+from argparse import Namespace
+
+
+
+
+# Relative imports
+from .. import code
+from .. import util
+from .. import submodules
+from .test_transaction import build_tx_inputs_and_outputs
+
+
+
+
+# Shortcuts
+basic = code.basic
+transaction = code.transaction
+transaction_size = code.transaction_size
+create_transaction = code.create_transaction
+
+
+
+
+# Setup for this file.
+@pytest.fixture(autouse=True, scope='module')
+def setup_module(pytestconfig):
+  # If log_level is supplied to pytest in the commandline args, then use it to set up the logging in the application code.
+  log_level = pytestconfig.getoption('log_cli_level')
+  if log_level is not None:
+    log_level = log_level.lower()
+    code.setup(log_level = log_level)
+    submodules.setup(log_level = log_level)
+
+
+
+
+address = "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX"
+txid = "10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411"
+private_key_hex = '1647a11df9b9785669d630fa90d6c8242a622a8fc077fb50fc4c52f8391c22ad'
+
+
+
+
+def test_sizes():
+  assert transaction_size.max_der_signature_length == 71
+  assert transaction_size.script_sig_size() == 139
+  assert transaction_size.script_sig_size('compressed') == 107
+  assert transaction_size.input_size() == 180
+  assert transaction_size.output_size() == 34
+  assert transaction_size.signed_transaction_size(1, 1) == 10 + 180 + 34
+  # The input count needs a 3-byte var_int above 252 inputs.
+  size_252 = transaction_size.signed_transaction_size(252, 1)
+  assert transaction_size.signed_transaction_size(253, 1) == size_252 + 180 + 2
+  with pytest.raises(ValueError):
+    transaction_size.script_sig_size('hybrid')
+
+
+
+
+def test_signed_size_is_an_upper_bound():
+  # Sign transactions with different outputs (so different signatures), and check that none is larger than the calculated size, and that none is more than 2 bytes per input smaller.
+  for i in range(8):
+    inputs_data = [
+      {"address": address, "transaction_id": txid, "previous_output_index": j, "bitcoin_amount": "0.00300000"}
+      for j in range(2)
+    ]
+    outputs_data = [
+      {"address": "1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP", "bitcoin_amount": basic.satoshi_to_bitcoin(590000 - i)},
+    ]
+    inputs, outputs = build_tx_inputs_and_outputs(inputs_data, outputs_data)
+    tx = transaction.Transaction.create(inputs, outputs).sign([private_key_hex])
+    size = len(tx.to_bytes_signed_form())
+    max_size = transaction_size.signed_transaction_size(2, 1)
+    assert max_size - 2 * 2 <= size <= max_size
+
+
+
+
+def test_create_transaction_exact_fee():
+  satoshi_amounts = [100000, 300000, 200000, 50000]
+  # Note: create_transaction adds data to the inputs and the design, so each call receives new copies.
+
+  def build_inputs():
+    return [
+      {"address": address, "transaction_id": txid, "previous_output_index": i, "bitcoin_amount": basic.satoshi_to_bitcoin(x)}
+      for i, x in enumerate(satoshi_amounts)
+    ]
+  design = {
+    "change_address": address,
+    "fee_rate": "2",
+    "fee_calculation": "exact",
+    "max_fee": 2000,
+    "max_spend_percentage": "100.00",
+    "outputs": [
+      {"address": "1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP", "bitcoin_amount": "0.00450000"},
+    ]
+  }
+  tx = create_transaction.create_transaction(Namespace(inputs=build_inputs(), design=copy.deepcopy(design)))
+  # The fee is calculated for the 2 selected inputs and the 2 outputs (including change), not for all 4 available inputs.
+  assert [x.previous_output_index_int for x in tx.inputs] == [1, 2]
+  assert len(tx.outputs) == 2
+  assert tx.fee == 2 * transaction_size.signed_transaction_size(2, 2)
+  tx.sign([private_key_hex])
+  assert tx.fee >= 2 * len(tx.to_bytes_signed_form())
+  # The fee for one more input would be needed: the selection grows until the fee converges.
+  design['outputs'][0]['bitcoin_amount'] = basic.satoshi_to_bitcoin(500000 - 2 * transaction_size.signed_transaction_size(2, 2) + 1)
+  tx = create_transaction.create_transaction(Namespace(inputs=build_inputs(), design=copy.deepcopy(design)))
+  assert len(tx.inputs) == 3
+  assert tx.fee == 2 * transaction_size.signed_transaction_size(3, 2)
+  design['fee_calculation'] = 'guess'
+  with pytest.raises(ValueError):
+    create_transaction.validate_design(design)
+
+
+
+
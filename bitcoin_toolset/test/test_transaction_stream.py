@@ -0,0 +1,116 @@
+# Imports
+import pytest
+import io
+import re
+
+
+
+
+# Relative imports
+from .. import code
+from .. import util
+from .. import submodules
+from .test_transaction import build_tx_inputs_and_outputs
+
+
+
+
+# Shortcuts
+transaction = code.transaction
+transaction_stream = code.transaction_stream
+
+
+
+
+# Setup for this file.
+@pytest.fixture(autouse=True, scope='module')
+def setup_module(pytestconfig):
+  # If log_level is supplied to pytest in the commandline args, then use it to set up the logging in the application code.
+  log_level = pytestconfig.getoption('log_cli_level')
+  if log_level is not None:
+    log_level = log_level.lower()
+    code.setup(log_level = log_level)
+    submodules.setup(log_level = log_level)
+
+
+
+
+def build_signed_transactions(n):
+  private_keys_hex = [
+    '1647a11df9b9785669d630fa90d6c8242a622a8fc077fb50fc4c52f8391c22ad',
+  ]
+  txs = []
+  for i in range(n):
+    inputs_data = [
+      {
+        "address": "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX",
+        "transaction_id": "10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411",
+        "previous_output_index": i,
+        "bitcoin_amount": "0.00300000",
+      },
+    ]
+    outputs_data = [
+      {
+        "address": "1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP",
+        "bitcoin_amount": "0.00290000",
+      },
+    ]
+    inputs, outputs = build_tx_inputs_and_outputs(inputs_data, outputs_data)
+    tx = transaction.Transaction.create(inputs, outputs).sign(private_keys_hex)
+    txs.append(tx)
+  return txs
+
+
+
+
+def sorted_results(stream, **kwargs):
+  results = transaction_stream.decode_and_verify_stream(stream, **kwargs)
+  return sorted(results, key=lambda x: x['index'])
+
+
+
+
+def test_hex_stream():
+  txs = build_signed_transactions(3)
+  lines = [tx.to_hex_signed_form() for tx in txs]
+  # Blank lines are ignored. Invalid lines produce an error result.
+  data = '\n'.join([lines[0], '', lines[1], 'abcd', lines[2]]) + '\n'
+  for workers in [None, 2]:
+    results = sorted_results(io.BytesIO(data.encode('ascii')), workers=workers, max_in_flight=2)
+    assert [x['index'] for x in results] == [0, 1, 2, 3]
+    assert [x['valid'] for x in results] == [True, True, False, True]
+    assert results[0]['txid'] == txs[0].calculate_txid()
+    assert results[3]['txid'] == txs[2].calculate_txid()
+    assert 'error' in results[2]
+  assert sorted_results(io.BytesIO(b'\n\n')) == []
+  # Lines that aren't valid hex are reported as such, rather than being parsed as raw bytes.
+  data = '\n'.join([lines[0], 'abc', 'xyz1', lines[1]]) + '\n'
+  results = sorted_results(io.BytesIO(data.encode('ascii')))
+  assert [x['valid'] for x in results] == [True, False, False, True]
+  assert results[1]['error'] == 'Invalid hex: the line contains an odd number of hex digits (3).'
+  assert results[2]['error'] == "Invalid hex: the line contains characters that aren't hex digits."
+
+
+
+
+def test_raw_stream():
+  txs = build_signed_transactions(3)
+  data = b''.join(tx.to_bytes_signed_form() for tx in txs)
+  # Use a small read size, so that transactions are split across reads.
+  read_size = transaction_stream.raw_read_size
+  transaction_stream.raw_read_size = 100
+  try:
+    results = sorted_results(io.BytesIO(data))
+    assert [x['txid'] for x in results] == [tx.calculate_txid() for tx in txs]
+    assert all(x['valid'] for x in results)
+    # A truncated final transaction produces an error result.
+    results = sorted_results(io.BytesIO(data[:-10]))
+    assert [x['valid'] for x in results] == [True, True, False]
+    assert 'Incomplete data' in results[2]['error']
+    # The error names the field, including the output number.
+    assert re.search(r'for output \d+ scriptPubKey at byte offset', results[2]['error'])
+  finally:
+    transaction_stream.raw_read_size = read_size
+
+
+
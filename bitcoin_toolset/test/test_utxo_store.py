@@ -0,0 +1,134 @@
+# Imports
+import pytest
+from argparse import Namespace
+
+
+
+
+# Relative imports
+from .. import code
+from .. import util
+from .. import submodules
+
+
+
+
+# Shortcuts
+basic = code.basic
+create_transaction = code.create_transaction
+utxo_store = code.utxo_store
+
+
+
+
+# Setup for this file.
+@pytest.fixture(autouse=True, scope='module')
+def setup_module(pytestconfig):
+  # If log_level is supplied to pytest in the commandline args, then use it to set up the logging in the application code.
+  log_level = pytestconfig.getoption('log_cli_level')
+  if log_level is not None:
+    log_level = log_level.lower()
+    code.setup(log_level = log_level)
+    submodules.setup(log_level = log_level)
+
+
+
+
+address_1 = "1AppardGrpGdddB2HUTLRd2GGWaYAWDByX"
+address_2 = "1DYKgP9cMG3wQhgowRJdrE4gRQvz6yMYEP"
+txid = "10f92ae76b7df85ca3a3dc14e9445e68461fe2d2efad28c91000eb0ac6053411"
+
+
+
+
+def build_inputs(satoshi_amounts, address=address_1, start_index=0):
+  return [
+    {
+      "address": address,
+      "transaction_id": txid,
+      "previous_output_index": start_index + i,
+      "bitcoin_amount": basic.satoshi_to_bitcoin(x),
+    } for i, x in enumerate(satoshi_amounts)
+  ]
+
+
+
+
+def test_build_add_spend(tmp_path):
+  path = str(tmp_path / 'utxos.sqlite')
+  with utxo_store.UTXOStore.build(path, build_inputs([1000, 3000, 2000])) as store:
+    assert store.count() == 3
+    assert store.total_value() == 6000
+    store.add_inputs(build_inputs([5000], address=address_2, start_index=3))
+    # Duplicate inputs are rejected, and nothing is added.
+    with pytest.raises(ValueError):
+      store.add_inputs(build_inputs([7000, 1000], start_index=3))
+    assert store.count() == 4
+  # The store persists.
+  with utxo_store.UTXOStore(path) as store:
+    assert store.count() == 4
+    store.spend_inputs([(txid, 0), (txid, 3)])
+    assert store.total_value() == 5000
+    # Nothing is spent if any input is missing.
+    with pytest.raises(ValueError):
+      store.spend_inputs([(txid, 1), (txid, 0)])
+    assert store.count() == 2
+    assert store.get_input(txid, 1)['bitcoin_amount'] == '0.00003000'
+    assert store.get_input(txid, 0) is None
+  # Inputs are validated when they are added.
+  inputs = build_inputs([1000])
+  inputs[0]['transaction_id'] = 'abcd'
+  with pytest.raises(ValueError):
+    utxo_store.UTXOStore.build(':memory:', inputs)
+
+
+
+
+def test_queries():
+  inputs = build_inputs([1000, 3000, 2000]) + build_inputs([5000], address=address_2, start_index=3)
+  store = utxo_store.UTXOStore.build(':memory:', inputs)
+  assert store.get_inputs_by_address(address_2) == [inputs[3]]
+  assert [x['previous_output_index'] for x in store.get_inputs_by_address(address_1)] == [1, 2, 0]
+  assert [x['previous_output_index'] for x in store.get_inputs_by_amount(1500, 3000)] == [1, 2]
+  assert [x['previous_output_index'] for x in store.get_inputs_by_amount(min_satoshi=2000, limit=2)] == [3, 1]
+  # Candidates.
+  assert [x['previous_output_index'] for x in store.get_candidates('largest_first', 6000)] == [3, 1]
+  assert [x['previous_output_index'] for x in store.get_candidates('smallest_first', 2500)] == [0, 2]
+  assert len(store.get_candidates('all', 1)) == 4
+  # Search strategies: the inputs smaller than the target, plus the smallest input that covers it.
+  assert [x['previous_output_index'] for x in store.get_candidates('branch_and_bound', 2500)] == [2, 0, 1]
+  assert [x['previous_output_index'] for x in store.get_candidates('knapsack', 2500, max_candidates=1)] == [2, 0, 1]
+  # With an input fee, the inputs are split by effective value (value - input fee). The 3000 input no longer covers the target on its own, so the 5000 input is the smallest larger one.
+  assert [x['previous_output_index'] for x in store.get_candidates('branch_and_bound', 2500, input_fee=600)] == [1, 2, 0, 3]
+  # An input whose effective value isn't positive is never selected, so it isn't a candidate.
+  assert [x['previous_output_index'] for x in store.get_candidates('branch_and_bound', 2500, input_fee=1000)] == [1, 2, 3]
+  store.close()
+
+
+
+
+def test_create_transaction_from_store():
+  store = utxo_store.UTXOStore.build(':memory:', build_inputs([100000, 300000, 200000, 50000]))
+  design = {
+    "change_address": address_1,
+    "fee": 225,
+    "max_fee": 250,
+    "max_spend_percentage": "50.00",
+    "outputs": [
+      {"address": address_2, "bitcoin_amount": "0.00250000"},
+    ]
+  }
+  inputs = store.get_candidates_for_design(design)
+  assert [x['previous_output_index'] for x in inputs] == [1]
+  # The spending limit applies to the value of the whole store, not just the candidates.
+  a = Namespace(inputs=inputs, design=design, total_available_input=store.total_value())
+  tx = create_transaction.create_transaction(a)
+  assert tx.fee == 225
+  assert [x.previous_output_index_int for x in tx.inputs] == [1]
+  a = Namespace(inputs=store.get_candidates_for_design(design), design=design)
+  with pytest.raises(ValueError):
+    create_transaction.create_transaction(a)
+
+
+
+
@@ -1,7 +1,10 @@
 # Relative imports
 from . import module_logger
 from . import validate
+from . import primitives
 from . import misc
+from . import lru_cache
+from . import lazy_import
 
 
 
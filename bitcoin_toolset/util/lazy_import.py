@@ -0,0 +1,62 @@
+# Imports
+import sys
+import importlib
+
+
+
+
+# Notes:
+# - A LazyPackage imports the modules of a package when they are first used, rather than when the package is imported. Short tasks (e.g. cli.py --task get_address) then only import the modules that they need.
+# - Usage, in the package's __init__.py:
+# -- lazy = LazyPackage(__name__, ['module_1', 'module_2'])
+# -- def __getattr__(name): return lazy.load(name)
+# - A module is loaded when it is accessed as an attribute of the package (e.g. package.module_1), or imported with "from package import module_1" or "from . import module_1".
+# - Deferred logger configuration: The package's setup() function calls lazy.setup(...) with the logger settings. The modules that have already been loaded are configured straight away. The others are configured when they are loaded.
+# - Module __getattr__ functions require Python 3.7. On Python 3.6, call lazy.load_all() in __init__.py, so that every module is imported straight away, as before.
+
+
+
+
+class LazyPackage:
+
+
+  def __init__(self, package_name, module_names):
+    self.package_name = package_name
+    self.module_names = list(module_names)
+    # The logger settings, stored by setup().
+    self.settings = None
+
+
+  def full_name(self, name):
+    return self.package_name + '.' + name
+
+
+  def load(self, name):
+    if name not in self.module_names:
+      msg = "module '{}' has no attribute '{}'".format(self.package_name, name)
+      raise AttributeError(msg)
+    full_name = self.full_name(name)
+    # If the module is already in sys.modules, it is still being imported (e.g. two modules import each other). It is configured by the call that started its import.
+    loading = full_name in sys.modules
+    module = importlib.import_module(full_name)
+    if not loading and self.settings is not None:
+      module.setup(**self.settings)
+    return module
+
+
+  def load_all(self):
+    for name in self.module_names:
+      self.load(name)
+
+
+  def loaded_modules(self):
+    # The modules that have been imported so far, in the order of module_names.
+    modules = [sys.modules.get(self.full_name(name)) for name in self.module_names]
+    return [x for x in modules if x is not None]
+
+
+  def setup(self, **settings):
+    # Configure the modules that have been loaded. The rest are configured when they are loaded.
+    self.settings = settings
+    for module in self.loaded_modules():
+      module.setup(**settings)
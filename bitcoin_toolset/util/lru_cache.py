@@ -0,0 +1,97 @@
+# Imports
+from collections import OrderedDict
+import threading
+
+
+
+
+# Relative imports
+from . import validate as v
+
+
+
+
+# Notes:
+# - A small bounded cache with least-recently-used (LRU) eviction.
+# - Unlike functools.lru_cache, it can be disabled, resized, and cleared at runtime, and it reports its hit and miss counts.
+# - Values must not be None. get() returns None to indicate a miss.
+# - A lock protects the underlying OrderedDict, so a cache can be shared between threads.
+
+
+
+
+class LRUCache:
+
+
+  def __init__(self, max_size=1024, enabled=True):
+    v.validate_positive_integer(max_size, 'max_size', 'LRUCache.__init__')
+    v.validate_boolean(enabled, 'enabled', 'LRUCache.__init__')
+    self.max_size = max_size
+    self.enabled = enabled
+    self.data = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.lock = threading.Lock()
+
+
+  def __len__(self):
+    return len(self.data)
+
+
+  def get(self, key):
+    if not self.enabled:
+      return None
+    with self.lock:
+      value = self.data.get(key)
+      if value is None:
+        self.misses += 1
+        return None
+      self.data.move_to_end(key)
+      self.hits += 1
+      return value
+
+
+  def put(self, key, value):
+    if not self.enabled:
+      return
+    if value is None:
+      raise ValueError("LRUCache: value must not be None.")
+    with self.lock:
+      self.data[key] = value
+      self.data.move_to_end(key)
+      while len(self.data) > self.max_size:
+        self.data.popitem(last=False)
+
+
+  def clear(self):
+    with self.lock:
+      self.data.clear()
+      self.hits = 0
+      self.misses = 0
+
+
+  def configure(self, enabled=None, max_size=None):
+    if enabled is not None:
+      v.validate_boolean(enabled, 'enabled', 'LRUCache.configure')
+      self.enabled = enabled
+      if not enabled:
+        self.clear()
+    if max_size is not None:
+      v.validate_positive_integer(max_size, 'max_size', 'LRUCache.configure')
+      with self.lock:
+        self.max_size = max_size
+        while len(self.data) > self.max_size:
+          self.data.popitem(last=False)
+
+
+  def stats(self):
+    d = OrderedDict()
+    d['enabled'] = self.enabled
+    d['size'] = len(self.data)
+    d['max_size'] = self.max_size
+    d['hits'] = self.hits
+    d['misses'] = self.misses
+    return d
+
+
+
@@ -26,6 +26,43 @@ except Exception as e:
 # - We generally create a logger for each module (i.e. each python file).
 # - Each logger has its own name (which is its namespaced path, not just its name), and can have its own specific log level if this is useful.
 # - This function is used to automatically configure a logger based on the supplied settings.
+# - By default, loggers only output errors, so most log messages are discarded. On hot paths, avoid building messages that will be discarded:
+# -- Wrap a single message in LazyMessage. It is only formatted if a handler actually outputs it.
+# -- Guard a block of messages (especially if their arguments need to be calculated, e.g. hex_len(x)) with debug_enabled(logger) or info_enabled(logger).
+
+
+
+
+class LazyMessage:
+
+
+  # A log message that is built only when it is output.
+  # - message: either a format string (which is formatted with args and kwargs), or a function (which is called with args and kwargs, and returns the message).
+  # - Example: deb(LazyMessage("Input {} of {}.", i, n))
+
+
+  def __init__(self, message, *args, **kwargs):
+    self.message = message
+    self.args = args
+    self.kwargs = kwargs
+
+
+  def __str__(self):
+    if callable(self.message):
+      return str(self.message(*self.args, **self.kwargs))
+    return self.message.format(*self.args, **self.kwargs)
+
+
+
+
+def debug_enabled(logger):
+  return logger.isEnabledFor(logging.DEBUG)
+
+
+
+
+def info_enabled(logger):
+  return logger.isEnabledFor(logging.INFO)
 
 
 
@@ -0,0 +1,188 @@
+# Relative imports
+from . import validate as v
+
+
+
+
+# Notes:
+# - Fast versions of the hex checks and conversions that every path in the package runs, many times per transaction field.
+# - Like validate.py, this module uses only the standard library.
+# - "Hex" means an even-length string of lowercase hex digits (see validate.hex_digits).
+# - When the data is valid, each function does its work in a few calls to built-in methods (str.translate, bytes.fromhex, bytes.hex, int.from_bytes), which loop in C rather than in Python.
+# - When the data is invalid, the corresponding function in validate.py is called to raise the error, so the error messages are unchanged.
+# - The bulk functions (validate_hex_list, validate_hex_length_list) check a whole list of values in one pass. If any of them is invalid, the values are checked one at a time, to find the first invalid one.
+
+
+
+
+hex_deletion_table = v.hex_deletion_table
+
+
+
+
+# ### SECTION
+# Validation
+
+
+
+
+def is_hex(s):
+  return isinstance(s, str) and not len(s) % 2 and not s.translate(hex_deletion_table)
+
+
+
+
+def validate_hex(s, name=None, location=None, kind='hex'):
+  if not is_hex(s):
+    v.validate_hex(s, name, location, kind)
+
+
+
+
+def validate_hex_length(s, n, name=None, location=None, kind=None):
+  if not (is_hex(s) and isinstance(n, int) and len(s) == n * 2):
+    v.validate_hex_length(s, n, name, location, kind)
+
+
+
+
+def validate_hex_list(items, name=None, location=None, kind='hex'):
+  v.validate_list(items, name, location)
+  if not all_hex(items):
+    for i, x in enumerate(items):
+      v.validate_hex(x, item_name(name, i), location, kind)
+
+
+
+
+def validate_hex_length_list(items, n, name=None, location=None, kind=None):
+  # Every item must be hex of length n bytes.
+  v.validate_integer(n, 'n (i.e. the hex length)', location)
+  v.validate_list(items, name, location)
+  if not all_hex(items) or any(len(x) != n * 2 for x in items):
+    for i, x in enumerate(items):
+      v.validate_hex_length(x, n, item_name(name, i), location, kind)
+
+
+
+
+def all_hex(items):
+  # Join the items and check them in one pass. Each item must also have an even length, as two odd-length items can join to make a valid string.
+  try:
+    joined = ''.join(items)
+  except TypeError:
+    return False
+  if joined.translate(hex_deletion_table):
+    return False
+  return not any(len(x) % 2 for x in items)
+
+
+
+
+def item_name(name, i):
+  if name is None:
+    name = 'items'
+  return '{}[{}]'.format(name, i)
+
+
+
+
+# ### SECTION
+# Conversion
+
+
+
+
+def hex_len(x):
+  # Length of a hex string in bytes.
+  validate_hex(x)
+  return len(x) // 2
+
+
+
+
+def hex_to_bytes(x):
+  validate_hex(x)
+  return bytes.fromhex(x)
+
+
+
+
+def bytes_to_hex(b):
+  # bytes.hex() always returns lowercase hex.
+  return bytes(b).hex()
+
+
+
+
+def reverse_hex_order(x):
+  # Reverse the byte order, e.g. to convert between big-endian and little-endian.
+  validate_hex(x)
+  return bytes.fromhex(x)[::-1].hex()
+
+
+
+
+def hex_to_int(x):
+  return int(x, 16)
+
+
+
+
+def int_to_hex(n):
+  # Accepts a non-negative integer, returns hex string with an even number of characters.
+  v.validate_integer(n)
+  if n < 0:
+    msg = "Can't convert a negative integer ({}) to hex.".format(n)
+    raise ValueError(msg)
+  x = '{:x}'.format(n)
+  if len(x) % 2 == 1:
+    x = '0' + x
+  return x
+
+
+
+
+def hex_le_to_int(x_le):
+  # Accepts hex string in little-endian format, returns integer.
+  validate_hex(x_le)
+  if not x_le:
+    msg = "Can't convert an empty hex string to an integer."
+    raise ValueError(msg)
+  return int.from_bytes(bytes.fromhex(x_le), 'little')
+
+
+
+
+def int_to_hex_le(n):
+  # Accepts integer, returns hex string in little-endian format.
+  x = int_to_hex(n)
+  return n.to_bytes(len(x) // 2, 'little').hex()
+
+
+
+
+def pad_hex(x, n_bytes):
+  # Add leading zero bytes at the left-hand side, up to a length of n_bytes.
+  n = check_pad_length(x, n_bytes)
+  return '00' * (n_bytes - n) + x
+
+
+
+
+def pad_hex_le(x, n_bytes):
+  # Used for padding hex in little-endian format. Add zero bytes at the right-hand side, up to a length of n_bytes.
+  n = check_pad_length(x, n_bytes)
+  return x + '00' * (n_bytes - n)
+
+
+
+
+def check_pad_length(x, n_bytes):
+  validate_hex(x)
+  v.validate_integer(n_bytes)
+  n = len(x) // 2
+  if n_bytes < n:
+    msg = "Hex value is already longer than desired padded length. Hex value: {}".format(x)
+    raise ValueError(msg)
+  return n
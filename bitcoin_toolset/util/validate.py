@@ -23,6 +23,8 @@ import re
 # https://stackoverflow.com/a/45598540
 date_pattern = re.compile(r'^\d{4}-\d{2}-\d{2}$')
 hex_digits = '0123456789abcdef'
+# Translation table that deletes the hex digits. A string is hex if nothing is left after it has been applied.
+hex_deletion_table = str.maketrans('', '', hex_digits)
 
 
 
@@ -307,9 +309,9 @@ def validate_hex(s, name=None, location=None, kind='hex'):
     msg = "whose length is not an even number ({} chars).".format(n)
     msg = build_error_msg(msg, s, name, location, kind)
     raise ValueError(msg)
-  # find indices of non-hex characters in the string.
-  indices = [i for i in range(len(s)) if s[i] not in hex_digits]
-  if len(indices) > 0:
+  # Check the whole string in one pass. Only find the indices of the non-hex characters (for the error message) if there are any.
+  if s.translate(hex_deletion_table):
+    indices = [i for i in range(len(s)) if s[i] not in hex_digits]
     non_hex_chars = []
     for i in indices:
       c = s[i]
@@ -6,6 +6,11 @@ import logging
 import binascii
 import json
 import itertools
+import io
+import stat
+import signal
+import time
+import contextlib
 
 
 
@@ -22,10 +27,8 @@ from os.path import isdir, isfile, join
 util = bitcoin_toolset.util
 v = util.validate
 hexlify = binascii.hexlify
-basic = bitcoin_toolset.code.basic
-hex_len = basic.hex_len
-transaction = bitcoin_toolset.code.transaction
 submodules = bitcoin_toolset.submodules
+# Note: The modules in bitcoin_toolset.code are imported when they are first used. To keep startup fast, each task function looks up the modules that it uses (e.g. basic = bitcoin_toolset.code.basic), so that it only imports what it needs.
 
 
 
@@ -40,11 +43,23 @@ deb = logger.debug
 
 
 
+tasks_that_sign_transactions = [
+  'create_unsigned_transaction_json',
+  'create_sign_and_verify_transaction_hex',
+  'create_transaction',
+  'create_transaction_batch',
+]
+
+
+
+
 def setup(
     log_level = 'error',
     debug = False,
     log_timestamp = False,
     log_file = None,
+    hash_backend = None,
+    validation_level = None,
     ):
   logger_name = 'cli'
   # Configure logger for this module.
@@ -65,6 +80,8 @@ def setup(
     debug = debug,
     log_timestamp = log_timestamp,
     log_file = log_file,
+    hash_backend = hash_backend,
+    validation_level = validation_level,
   )
 
 
@@ -73,6 +90,46 @@ def setup(
 def main():
 
   # Capture and parse command-line arguments.
+  parser = build_parser()
+  a = parser.parse_args()
+
+  print_args = 0
+  if print_args:
+    print()
+    for k in sorted(a.__dict__.keys()):
+      print(k, '=', a.__dict__[k])
+    print()
+
+  if a.serve:
+    setup(
+      log_level = a.log_level,
+      debug = a.debug,
+      log_timestamp = a.log_timestamp,
+      log_file = a.log_file if a.log_to_file else None,
+      hash_backend = a.hash_backend,
+      validation_level = a.validation_level,
+    )
+    serve(a, parser)
+    return
+
+  prepare_args(a)
+
+  # Setup
+  setup(
+    log_level = a.log_level,
+    debug = a.debug,
+    log_timestamp = a.log_timestamp,
+    log_file = a.log_file,
+    hash_backend = a.hash_backend,
+    validation_level = a.validation_level,
+  )
+
+  run_task(a)
+
+
+
+
+def build_parser():
 
   parser = argparse.ArgumentParser(
     description='Command-Line Interface (CLI) for using the bitcoin_toolset package.'
@@ -137,7 +194,69 @@ def main():
 
   parser.add_argument(
     '--design-file', dest='design_file', type=str,
-    help="Path to file that contains the available inputs for the transaction.",
+    help="Path to file that contains the design for the transaction (or, for the create_transaction_batch task, a list of designs).",
+  )
+
+  parser.add_argument(
+    '--utxo-store', dest='utxo_store', type=str,
+    help="Path to a UTXO store (an SQLite database) that contains the available inputs. When creating a transaction, it can be used instead of --input-file.",
+  )
+
+  parser.add_argument(
+    '--address', type=str,
+    help="A Bitcoin address (e.g. for the query_utxo_store task).",
+  )
+
+  parser.add_argument(
+    '--min-satoshi', dest='min_satoshi', type=int,
+    help="Minimum input value in satoshi (e.g. for the query_utxo_store task).",
+  )
+
+  parser.add_argument(
+    '--max-satoshi', dest='max_satoshi', type=int,
+    help="Maximum input value in satoshi (e.g. for the query_utxo_store task).",
+  )
+
+  parser.add_argument(
+    '--hash-backend', dest='hash_backend', type=str,
+    choices=['hashlib', 'python', 'cross_check'],
+    help="Choose the hash function implementation (default: '%(default)s'). 'python' uses the pure-Python submodules. 'cross_check' runs both and compares the results.",
+    default='hashlib',
+  )
+
+  parser.add_argument(
+    '--validation-level', dest='validation_level', type=str,
+    choices=['strict', 'standard', 'trusted'],
+    help="Choose how thoroughly transaction data is validated (default: '%(default)s'). 'strict' adds extra cross-checks and re-checks data that this tool created itself. 'trusted' skips the per-value checks on transaction JSON data, and should only be used for data that this tool produced.",
+    default='standard',
+  )
+
+  parser.add_argument(
+    '--workers', dest='workers', type=int,
+    help="Number of worker processes to use when signing or verifying a transaction with multiple inputs, or when deriving addresses for many private keys (default: sign serially in a single process).",
+  )
+
+  parser.add_argument(
+    '--fail-fast', dest='fail_fast',
+    action='store_true',
+    help="When verifying a signed transaction, stop at the first invalid signature.",
+  )
+
+  parser.add_argument(
+    '--serve',
+    action='store_true',
+    help="Run as a server that accepts task requests over a Unix domain socket (--socket), instead of performing a single task.",
+  )
+
+  parser.add_argument(
+    '--socket', dest='socket_path', type=str,
+    help="Path of the Unix domain socket that the server listens on.",
+  )
+
+  parser.add_argument(
+    '--allowed-dir', dest='allowed_dirs', type=str,
+    action='append',
+    help="In server mode, a directory that requests can read files from (and write UTXO stores to). Can be used more than once. Requests can't use any other paths.",
   )
 
   parser.add_argument(
@@ -171,21 +290,32 @@ def main():
     default='log_bitcoin_toolset.txt',
   )
 
-  a = parser.parse_args()
+  return parser
 
-  print_args = 0
-  if print_args:
-    print()
-    for k in sorted(a.__dict__.keys()):
-      print(k, '=', a.__dict__[k])
-    print()
 
+
+
+def prepare_args(a):
   # Check and analyse arguments
   if not a.log_to_file:
     a.log_file = None
 
-  if a.data_file:
-    a.data = open(a.data_file).read()
+  tasks_that_decode_transactions = [
+    'decode_signed_transaction_hex',
+    'verify_signed_transaction_hex',
+    'spend_from_utxo_store',
+  ]
+
+  tasks_that_read_streams = [
+    'decode_and_verify_transaction_stream',
+  ]
+
+  if a.data_file and a.task not in tasks_that_read_streams:
+    if a.task in tasks_that_decode_transactions:
+      # The file can contain either hex or raw transaction bytes.
+      a.data = open(a.data_file, 'rb').read()
+    else:
+      a.data = open(a.data_file).read()
 
   # Load the private key(s) from the provided source.
   # - Note: Only one source can be supplied.
@@ -196,12 +326,12 @@ def main():
 
   if a.private_key_file:
     a.private_key_files = list(itertools.chain(*a.private_key_file))
-    private_keys_hex = [open(x).read().strip() for x in a.private_key_files]
+    private_keys_hex = [read_private_key_file(x) for x in a.private_key_files]
     a.private_keys_hex.extend(private_keys_hex)
 
   if a.private_key_dir:
     a.private_key_files = [os.path.join(a.private_key_dir, x) for x in os.listdir(a.private_key_dir) if os.path.splitext(x)[1] == '.txt']
-    private_keys_hex = [open(x).read().strip() for x in a.private_key_files]
+    private_keys_hex = [read_private_key_file(x) for x in a.private_key_files]
     a.private_keys_hex.extend(private_keys_hex)
 
   tasks_single_private_key = [
@@ -225,43 +355,56 @@ def main():
       msg = 'One of these arguments must be supplied: {}'.format(z)
       raise ValueError(msg)
 
-  tasks_that_sign_transactions = [
-    'create_unsigned_transaction_json',
-    'create_sign_and_verify_transaction_hex',
-    'create_transaction',
+  tasks_that_use_utxo_stores = [
+    'build_utxo_store',
+    'add_to_utxo_store',
+    'spend_from_utxo_store',
+    'query_utxo_store',
+  ]
+
+  tasks_that_read_input_files = [
+    'build_utxo_store',
+    'add_to_utxo_store',
   ]
 
   a.inputs = None
   a.design = None
+  a.total_available_input = None
   if a.task in tasks_that_sign_transactions:
-    if not a.input_file:
-      z = "--input-file '<input_file>'"
-      msg = 'This argument must be supplied: {}'.format(z)
+    if not a.input_file and not a.utxo_store:
+      z = "--input-file '<input_file>' --utxo-store '<utxo_store>'"
+      msg = 'One of these arguments must be supplied: {}'.format(z)
       raise ValueError(msg)
     if not a.design_file:
       z = "--design-file '<design_file>'"
       msg = 'This argument must be supplied: {}'.format(z)
       raise ValueError(msg)
-    try:
-      a.inputs = json.load(open(a.input_file))
-    except Exception as e:
-      raise e
+    if a.input_file:
+      try:
+        a.inputs = json.load(open(a.input_file))
+      except Exception as e:
+        raise e
     try:
       a.design = json.load(open(a.design_file))
     except Exception as e:
       raise e
 
+  if a.task in tasks_that_use_utxo_stores and not a.utxo_store:
+    z = "--utxo-store '<utxo_store>'"
+    msg = 'This argument must be supplied: {}'.format(z)
+    raise ValueError(msg)
+
+  if a.task in tasks_that_read_input_files:
+    if not a.input_file:
+      z = "--input-file '<input_file>'"
+      msg = 'This argument must be supplied: {}'.format(z)
+      raise ValueError(msg)
+    a.inputs = json.load(open(a.input_file))
 
 
 
-  # Setup
-  setup(
-    log_level = a.log_level,
-    debug = a.debug,
-    log_timestamp = a.log_timestamp,
-    log_file = a.log_file,
-  )
 
+def run_task(a):
   # Note: If you add a new task function, then its name must be added to this list.
   tasks = """
 hello hello2 get_python_version
@@ -269,6 +412,7 @@ get_private_key_wif
 private_key_wif_to_hex
 get_public_key
 get_address
+derive_addresses
 sign_data
 verify_data_signature
 create_unsigned_transaction_json
@@ -278,8 +422,14 @@ verify_signed_transaction_json
 create_signed_transaction_hex
 verify_signed_transaction_hex
 decode_signed_transaction_hex
+decode_and_verify_transaction_stream
 create_sign_and_verify_transaction_hex
 create_transaction
+create_transaction_batch
+build_utxo_store
+add_to_utxo_store
+spend_from_utxo_store
+query_utxo_store
 """.split()
   if a.task not in tasks:
     msg = "Unrecognised task: {}".format(a.task)
@@ -289,12 +439,202 @@ create_transaction
     msg = "Task function '{}' not found.".format(a.task)
     raise NameError(msg)
 
+  # If a UTXO store is used instead of an input file, load the candidate inputs for the design from it.
+  if a.task in tasks_that_sign_transactions and a.inputs is None:
+    load_inputs_from_utxo_store(a)
+
   # Run top-level function (i.e. the appropriate task).
   globals()[a.task](a)
 
 
 
 
+def load_inputs_from_utxo_store(a):
+  # Note: The create_transaction_batch task needs the whole pool, as each design uses different inputs.
+  with bitcoin_toolset.code.utxo_store.UTXOStore(a.utxo_store) as store:
+    if a.task == 'create_transaction_batch':
+      a.inputs = store.get_inputs()
+    else:
+      a.inputs = store.get_candidates_for_design(a.design)
+      a.total_available_input = store.total_value()
+
+
+
+
+# Cache of private keys read from files: {file_path: (mtime_ns, size, private_key_hex)}.
+# - In server mode, the key files are read once, and again only if they change.
+private_key_file_cache = {}
+
+
+
+
+def read_private_key_file(file_path):
+  st = os.stat(file_path)
+  entry = private_key_file_cache.get(file_path)
+  if entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size):
+    return entry[2]
+  private_key_hex = open(file_path).read().strip()
+  private_key_file_cache[file_path] = (st.st_mtime_ns, st.st_size, private_key_hex)
+  return private_key_hex
+
+
+
+
+# Notes on server mode (--serve):
+# - The server runs in a single long-lived process, so the interpreter startup, the imports, and the package setup happen only once. The secp256k1 generator table, the address caches, and the private key files stay loaded between requests.
+# - It listens on a Unix domain socket (--socket). The socket file is created with permissions 0600 (via the umask, so that there is no moment when it is accessible to other users). Only the owner of the server process can connect to it. There is no other authentication, so the server doesn't listen on a TCP port.
+# - Allowed directories (--allowed-dir): The paths in a request (--private-key-file, --private-key-dir, --data-file, --input-file, --design-file, --utxo-store) must be inside one of these directories, after symlinks are resolved. They are fixed when the server starts. If none are given, requests can't use any paths.
+# - Each request is one line of JSON. Each response is one line of JSON.
+# - Request: {"args": [<command-line arguments>], "stdin": <optional string>}
+# -- args: The same arguments as for a single run of cli.py, e.g. ["--task", "get_address", "--private-key-hex", "01"]. Paths are relative to the server's working directory.
+# -- stdin: Data for tasks that read from stdin (e.g. derive_addresses).
+# - Response: {"ok": <boolean>, "output": <the text that the task printed>}
+# -- If the task fails, the response also contains "error" (the error message) and "error_type" (e.g. "ValueError").
+# - A connection can send many requests, one per line.
+# - The output of each task is captured by redirecting stdout. This affects the whole process, so requests are handled one at a time, in the order in which they arrive.
+# - The logging settings (--log-level, --debug, etc) are taken from the command that started the server. In requests, they are ignored. The other settings (e.g. --hash-backend, --validation-level) apply to each request separately.
+
+
+
+
+# The arguments that contain paths. In server mode, they are checked against the allowed directories.
+request_path_arguments = [
+  'private_key_file',
+  'private_key_dir',
+  'data_file',
+  'input_file',
+  'design_file',
+  'utxo_store',
+]
+
+
+
+
+def serve(a, parser):
+  # Note: socketserver is only imported in server mode, to keep the startup of single tasks fast.
+  import socketserver
+
+  class UnixServer(socketserver.UnixStreamServer):
+    pass
+
+  class RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+      for line in self.rfile:
+        if not line.strip():
+          continue
+        response = handle_request(line, self.server.parser, self.server.allowed_dirs)
+        self.wfile.write((json.dumps(response) + '\n').encode())
+        self.wfile.flush()
+
+  if not a.socket_path:
+    z = "--socket '<socket_path>'"
+    msg = 'This argument must be supplied: {}'.format(z)
+    raise ValueError(msg)
+  allowed_dirs = []
+  for x in a.allowed_dirs or []:
+    if not os.path.isdir(x):
+      msg = "Allowed directory not found: {}".format(x)
+      raise ValueError(msg)
+    allowed_dirs.append(os.path.realpath(x))
+  # Remove a socket file left behind by a previous server.
+  if os.path.exists(a.socket_path):
+    if not stat.S_ISSOCK(os.stat(a.socket_path).st_mode):
+      msg = "File exists and is not a socket: {}".format(a.socket_path)
+      raise ValueError(msg)
+    os.remove(a.socket_path)
+  # Create the socket file with permissions 0600.
+  umask = os.umask(0o177)
+  try:
+    server = UnixServer(a.socket_path, RequestHandler)
+  finally:
+    os.umask(umask)
+  server.parser = parser
+  server.allowed_dirs = allowed_dirs
+  # Import all the modules and build the secp256k1 generator table now, rather than during the first requests.
+  bitcoin_toolset.code.lazy.load_all()
+  bitcoin_toolset.code.secp256k1.get_generator_table()
+  # Stop cleanly (i.e. remove the socket file) on SIGTERM as well as on Ctrl-C.
+  signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+  print("Serving on {}".format(a.socket_path), flush=True)
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    if os.path.exists(a.socket_path):
+      os.remove(a.socket_path)
+
+
+
+
+def check_request_paths(a, allowed_dirs):
+  # allowed_dirs: a list of real paths (i.e. absolute, with symlinks resolved).
+  for name in request_path_arguments:
+    value = getattr(a, name)
+    if not value:
+      continue
+    paths = list(itertools.chain(*value)) if name == 'private_key_file' else [value]
+    for path in paths:
+      real_path = os.path.realpath(path)
+      if not any(os.path.commonpath([real_path, x]) == x for x in allowed_dirs):
+        msg = "Path is not inside an allowed directory: {}".format(path)
+        raise ValueError(msg)
+
+
+
+
+def handle_request(line, parser, allowed_dirs=None):
+  # Run one task, and return the response (a dict).
+  # allowed_dirs: the real paths of the directories that the request can use. If None, the request can't use any paths.
+  start = time.time()
+  output = io.StringIO()
+  errors = io.StringIO()
+  response = {'ok': False}
+  stdin = sys.stdin
+  try:
+    request = json.loads(line)
+    if not isinstance(request, dict):
+      raise ValueError("Request must be a JSON object.")
+    args = request.get('args')
+    v.validate_list(args, 'args', 'handle_request')
+    for x in args:
+      v.validate_string(x, 'args item', 'handle_request')
+    request_stdin = request.get('stdin', '')
+    v.validate_string(request_stdin, 'stdin', 'handle_request')
+    sys.stdin = io.TextIOWrapper(io.BytesIO(request_stdin.encode()))
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(errors):
+      a = parser.parse_args(args)
+      if a.serve:
+        raise ValueError("A request can't start another server.")
+      if a.allowed_dirs:
+        raise ValueError("A request can't change the allowed directories.")
+      check_request_paths(a, allowed_dirs or [])
+      prepare_args(a)
+      bitcoin_toolset.code.hashing.set_backend(a.hash_backend)
+      bitcoin_toolset.code.validation.set_level(a.validation_level)
+      run_task(a)
+    response['ok'] = True
+  except SystemExit as e:
+    # argparse exits after printing an error (or the help text), and stop() exits after an unrecognised task.
+    response['ok'] = e.code == 0
+    if not response['ok']:
+      response['error'] = errors.getvalue().strip() or output.getvalue().strip()
+      response['error_type'] = 'SystemExit'
+  except Exception as e:
+    response['error'] = str(e)
+    response['error_type'] = type(e).__name__
+  finally:
+    sys.stdin = stdin
+  response['output'] = output.getvalue()
+  msg = "Request handled in {:.3f} seconds (ok = {}).".format(time.time() - start, response['ok'])
+  log(msg)
+  return response
+
+
+
+
 def hello(a):
   # Confirm:
   # - that we can run a simple task.
@@ -334,6 +674,7 @@ def get_python_version(a):
 
 
 def get_private_key_wif(a):
+  basic = bitcoin_toolset.code.basic
   private_key_wif = basic.private_key_hex_to_wif(a.private_key_hex)
   print(private_key_wif)
 
@@ -341,6 +682,7 @@ def get_private_key_wif(a):
 
 
 def private_key_wif_to_hex(a):
+  basic = bitcoin_toolset.code.basic
   private_key_hex = basic.private_key_wif_to_hex(a.private_key_wif)
   print(private_key_hex)
 
@@ -348,6 +690,7 @@ def private_key_wif_to_hex(a):
 
 
 def get_public_key(a):
+  basic = bitcoin_toolset.code.basic
   public_key_hex = basic.private_key_hex_to_public_key_hex(a.private_key_hex)
   print(public_key_hex)
 
@@ -355,13 +698,34 @@ def get_public_key(a):
 
 
 def get_address(a):
+  basic = bitcoin_toolset.code.basic
   address = basic.private_key_hex_to_address(a.private_key_hex)
   print(address)
 
 
 
 
+def derive_addresses(a):
+  # Derive the public key, address, and WIF for each private key, and print one JSON record per line.
+  # Private key sources (in order of preference):
+  # - --private-key-hex, --private-key-file, --private-key-dir
+  # - --data or --data-file: private keys in hex, separated by whitespace (e.g. one per line).
+  # - Otherwise, private keys are read from stdin, one per line.
+  basic = bitcoin_toolset.code.basic
+  if a.private_keys_hex:
+    private_keys_hex = a.private_keys_hex
+  elif a.data:
+    private_keys_hex = a.data.split()
+  else:
+    private_keys_hex = (line.strip() for line in sys.stdin if line.strip())
+  for record in basic.derive_addresses(private_keys_hex, workers=a.workers):
+    print(json.dumps(record))
+
+
+
+
 def sign_data(a):
+  basic = bitcoin_toolset.code.basic
   data_ascii = a.data
   v.validate_string_is_printable_ascii(data_ascii)
   data_hex = hexlify(data_ascii.encode()).decode('ascii')
@@ -377,6 +741,7 @@ def sign_data(a):
 
 
 def verify_data_signature(a):
+  basic = bitcoin_toolset.code.basic
   data_ascii = a.data
   v.validate_string_is_printable_ascii(data_ascii)
   data_hex = hexlify(data_ascii.encode()).decode('ascii')
@@ -390,16 +755,19 @@ def verify_data_signature(a):
 
 
 def create_unsigned_transaction_json(a):
+  transaction = bitcoin_toolset.code.transaction
   tx_unsigned = bitcoin_toolset.code.create_transaction.create_transaction(a)
   tx_unsigned_json = tx_unsigned.to_json()
   print(tx_unsigned_json)
-  # Validate transaction by default by rebuilding it.
-  tx_unsigned_2 = transaction.Transaction.from_json(tx_unsigned_json)
+  # Validate transaction by rebuilding it. This isn't necessary if it was built from validated data, unless the validation level is 'strict'.
+  if bitcoin_toolset.code.validation.needs_check(tx_unsigned):
+    tx_unsigned_2 = transaction.Transaction.from_json(tx_unsigned_json)
 
 
 
 
 def validate_unsigned_transaction_json(a):
+  transaction = bitcoin_toolset.code.transaction
   tx_unsigned_json = a.data
   tx_unsigned = transaction.Transaction.from_json(tx_unsigned_json)
   print("Unsigned transaction data validated.")
@@ -409,13 +777,14 @@ def validate_unsigned_transaction_json(a):
 
 def create_signed_transaction_json(a):
   # Note: When the unsigned tx is built from the JSON data, it is validated.
+  transaction = bitcoin_toolset.code.transaction
   tx_unsigned_json = a.data
   tx_unsigned = transaction.Transaction.from_json(tx_unsigned_json)
   #deb(tx_unsigned)
-  tx_signed = tx_unsigned.sign(a.private_keys_hex)
+  tx_signed = tx_unsigned.sign(a.private_keys_hex, workers=a.workers)
   #deb(tx_signed.to_json())
   print(tx_signed.to_json())
-  invalid_signatures = tx_signed.verify()
+  invalid_signatures = tx_signed.verify(workers=a.workers, fail_fast=a.fail_fast)
   n_inputs = len(tx_signed.inputs)
   plural = 's' if n_inputs > 1 else ''
   if invalid_signatures:
@@ -426,9 +795,10 @@ def create_signed_transaction_json(a):
 
 
 def verify_signed_transaction_json(a):
+  transaction = bitcoin_toolset.code.transaction
   tx_signed_json = a.data
   tx_signed = transaction.Transaction.from_json(tx_signed_json)
-  invalid_signatures = tx_signed.verify()
+  invalid_signatures = tx_signed.verify(workers=a.workers, fail_fast=a.fail_fast)
   n_inputs = len(tx_signed.inputs)
   plural = 's' if n_inputs > 1 else ''
   if not invalid_signatures:
@@ -442,9 +812,10 @@ def verify_signed_transaction_json(a):
 
 
 def create_signed_transaction_hex(a):
+  transaction = bitcoin_toolset.code.transaction
   tx_signed_json = a.data
   tx_signed = transaction.Transaction.from_json(tx_signed_json)
-  valid_signatures = tx_signed.verify()
+  invalid_signatures = tx_signed.verify(workers=a.workers, fail_fast=a.fail_fast)
   print(tx_signed.to_hex_signed_form())
   n_inputs = len(tx_signed.inputs)
   plural = 's' if n_inputs > 1 else ''
@@ -456,9 +827,9 @@ def create_signed_transaction_hex(a):
 
 
 def decode_signed_transaction_hex(a):
-  tx_signed_hex = a.data.strip()
-  tx_signed = transaction.Transaction.from_hex_signed(tx_signed_hex)
-  invalid_signatures = tx_signed.verify()
+  transaction = bitcoin_toolset.code.transaction
+  tx_signed = transaction.Transaction.from_bytes_signed(a.data)
+  invalid_signatures = tx_signed.verify(workers=a.workers, fail_fast=a.fail_fast)
   print(tx_signed.to_json())
   n_inputs = len(tx_signed.inputs)
   plural = 's' if n_inputs > 1 else ''
@@ -470,9 +841,9 @@ def decode_signed_transaction_hex(a):
 
 
 def verify_signed_transaction_hex(a):
-  tx_signed_hex = a.data.strip()
-  tx_signed = transaction.Transaction.from_hex_signed(tx_signed_hex)
-  invalid_signatures = tx_signed.verify()
+  transaction = bitcoin_toolset.code.transaction
+  tx_signed = transaction.Transaction.from_bytes_signed(a.data)
+  invalid_signatures = tx_signed.verify(workers=a.workers, fail_fast=a.fail_fast)
   n_inputs = len(tx_signed.inputs)
   plural = 's' if n_inputs > 1 else ''
   if invalid_signatures:
@@ -484,29 +855,50 @@ def verify_signed_transaction_hex(a):
 
 
 
+def decode_and_verify_transaction_stream(a):
+  # Read signed transactions from --data-file (or stdin), either as newline-delimited hex or as concatenated raw bytes.
+  # Decode and verify each one, and print one JSON result per line as soon as it is complete.
+  # Note: The results may not be in the same order as the transactions. Each result includes the index of its transaction.
+  stream = open(a.data_file, 'rb') if a.data_file else sys.stdin.buffer
+  n_invalid = 0
+  try:
+    results = bitcoin_toolset.code.transaction_stream.decode_and_verify_stream(stream, workers=a.workers, fail_fast=a.fail_fast)
+    for result in results:
+      if not result['valid']:
+        n_invalid += 1
+      print(json.dumps(result), flush=True)
+  finally:
+    if a.data_file:
+      stream.close()
+  if n_invalid:
+    plural = 's' if n_invalid > 1 else ''
+    msg = "{} invalid transaction{} detected! Please re-run using the --debug flag.".format(n_invalid, plural)
+    raise ValueError(msg)
+
+
+
+
 def create_sign_and_verify_transaction_hex(a):
+  basic = bitcoin_toolset.code.basic
+  transaction = bitcoin_toolset.code.transaction
   # - Create tx
   tx_unsigned = bitcoin_toolset.code.create_transaction.create_transaction(a)
   tx_unsigned_json = tx_unsigned.to_json()
   #print(tx_unsigned_json)
-  # - Validate tx (by rebuilding it)
-  tx_unsigned_2 = transaction.Transaction.from_json(tx_unsigned_json)
+  # - Validate tx (by rebuilding it), unless it was built from validated data and the validation level isn't 'strict'.
+  if bitcoin_toolset.code.validation.needs_check(tx_unsigned):
+    tx_unsigned_2 = transaction.Transaction.from_json(tx_unsigned_json)
   # - Sign tx
-  tx_signed = tx_unsigned.sign(a.private_keys_hex)
+  tx_signed = tx_unsigned.sign(a.private_keys_hex, workers=a.workers)
   #deb(tx_signed.to_json())
-  # - Verify tx
-  invalid_signatures = tx_signed.verify()
-  plural = 's' if invalid_signatures > 1 else ''
-  if invalid_signatures:
-    msg = "Signed transaction: {} invalid signature{} detected! Please re-run using the --debug flag.".format(invalid_signatures, plural)
-    raise ValueError(msg)
   # - Get hex form of signed tx
   tx_signed_hex = tx_signed.to_hex_signed_form()
-  msg = "tx_signed_hex ({} bytes) = {}".format(hex_len(tx_signed_hex), tx_signed_hex)
+  msg = "tx_signed_hex ({} bytes) = {}".format(basic.hex_len(tx_signed_hex), tx_signed_hex)
   deb(msg)
   # - Decode and verify signed tx hex.
+  # -- Note: The signatures are verified once, on the decoded tx, as this is the data that will be broadcast.
   tx_signed_2 = transaction.Transaction.from_hex_signed(tx_signed_hex)
-  invalid_signatures_2 = tx_signed_2.verify()
+  invalid_signatures_2 = tx_signed_2.verify(workers=a.workers, fail_fast=a.fail_fast)
   plural_2 = 's' if len(tx_signed_2.inputs) > 1 else ''
   #print(tx_signed_2.to_json())
   if invalid_signatures_2:
@@ -524,6 +916,84 @@ def create_transaction(a):
 
 
 
+def create_transaction_batch(a):
+  # Create, sign, and verify one transaction for each design in the manifest (--design-file), using the shared pool of inputs in --input-file.
+  # - No input is used by more than one transaction.
+  # - One JSON result per design is printed per line, in manifest order.
+  n_invalid = 0
+  results = bitcoin_toolset.code.create_transaction_batch.create_transactions(
+    inputs = a.inputs,
+    designs = a.design,
+    private_keys_hex = a.private_keys_hex,
+    workers = a.workers,
+    fail_fast = a.fail_fast,
+  )
+  for result in results:
+    if not result['valid']:
+      n_invalid += 1
+    print(json.dumps(result), flush=True)
+  if n_invalid:
+    plural = 's' if n_invalid > 1 else ''
+    msg = "{} design{} could not be fulfilled! Please re-run using the --debug flag.".format(n_invalid, plural)
+    raise ValueError(msg)
+
+
+
+
+def build_utxo_store(a):
+  # Create a UTXO store from --input-file. If the store already exists, its contents are replaced.
+  with bitcoin_toolset.code.utxo_store.UTXOStore.build(a.utxo_store, a.inputs) as store:
+    print_utxo_store_summary(store)
+
+
+
+
+def add_to_utxo_store(a):
+  with bitcoin_toolset.code.utxo_store.UTXOStore(a.utxo_store) as store:
+    store.add_inputs(a.inputs)
+    print_utxo_store_summary(store)
+
+
+
+
+def spend_from_utxo_store(a):
+  # Remove the inputs spent by a signed transaction (--data or --data-file, in hex or raw bytes) from the UTXO store.
+  # Note: Do this after the transaction has been broadcast.
+  transaction = bitcoin_toolset.code.transaction
+  tx_signed = transaction.Transaction.from_bytes_signed(a.data)
+  with bitcoin_toolset.code.utxo_store.UTXOStore(a.utxo_store) as store:
+    store.spend_transaction(tx_signed)
+    print_utxo_store_summary(store)
+
+
+
+
+def query_utxo_store(a):
+  # Print the inputs in the UTXO store that match --address and/or --min-satoshi / --max-satoshi, as JSON.
+  basic = bitcoin_toolset.code.basic
+  with bitcoin_toolset.code.utxo_store.UTXOStore(a.utxo_store) as store:
+    if a.address:
+      inputs = store.get_inputs_by_address(a.address)
+      if a.min_satoshi is not None:
+        inputs = [x for x in inputs if basic.bitcoin_to_satoshi(x['bitcoin_amount']) >= a.min_satoshi]
+      if a.max_satoshi is not None:
+        inputs = [x for x in inputs if basic.bitcoin_to_satoshi(x['bitcoin_amount']) <= a.max_satoshi]
+    else:
+      inputs = store.get_inputs_by_amount(a.min_satoshi, a.max_satoshi)
+  print(json.dumps(inputs, indent=2))
+
+
+
+
+def print_utxo_store_summary(store):
+  basic = bitcoin_toolset.code.basic
+  total = store.total_value()
+  msg = "UTXO store: {} inputs, total value {} bitcoin ({} satoshi).".format(store.count(), basic.satoshi_to_bitcoin(total), total)
+  print(msg)
+
+
+
+
 def stop(msg=None):
   if msg is not None:
     print(msg)